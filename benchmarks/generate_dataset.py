@@ -0,0 +1,453 @@
+"""Generates a deterministic synthetic school dataset and bulk-loads it with COPY.
+
+Fills app.students, app.users (teachers, parents and admins),
+app.academic_records, app.attendance and app.behavior_records. Scale 1 is a
+school of 500 students in classes 1-12 with about 25 students per section;
+scale 10 and 100 multiply the students, sections and teachers. Every school
+day of `--years` school years gets an attendance row per student, and grades
+are recorded per subject at the end of each term. Each student's
+attendance, grade and behavior distributions come from an RNG seeded with
+`--seed` and the student id, so the same arguments always produce the same
+rows.
+
+After loading, every read-only tool is called once against the data (a smoke
+run), and the script exits non-zero if any of them fails. `--smoke-only`
+runs just these calls against an already loaded database.
+
+Usage:
+    DATABASE_URI=postgresql://postgres@localhost/student \
+        python benchmarks/generate_dataset.py --scale 10 --reset --create-schema
+"""
+
+import argparse
+import itertools
+import math
+import os
+import random
+import string
+import sys
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import server  # noqa: E402
+
+STUDENTS_PER_SCALE = 500
+STUDENTS_PER_SECTION = 25
+# Sections one teacher covers in their subject
+SECTIONS_PER_TEACHER = 6
+CLASSES = [str(class_number) for class_number in range(1, 13)]
+SUBJECTS = (
+    "Mathematics", "Science", "English", "History",
+    "Geography", "Computer Science", "Physical Education", "Art",
+)
+FIRST_NAMES = (
+    "Aarav", "Abigail", "Aditi", "Ahmed", "Aisha", "Alejandro", "Amara", "Ananya", "Arjun", "Ava",
+    "Benjamin", "Chen", "Chloe", "Daniel", "Diya", "Elena", "Emma", "Ethan", "Fatima", "Gabriel",
+    "Grace", "Hana", "Harper", "Isaac", "Isabella", "Ishaan", "James", "Kavya", "Kofi", "Leila",
+    "Liam", "Lucas", "Maya", "Mei", "Mia", "Mohammed", "Noah", "Nora", "Oliver", "Olivia",
+    "Omar", "Priya", "Rahul", "Riya", "Rohan", "Sara", "Sebastian", "Sofia", "Tariq", "Zara",
+)
+LAST_NAMES = (
+    "Adeyemi", "Ali", "Anderson", "Brown", "Chen", "Cohen", "Das", "Davis", "Fernandez", "Garcia",
+    "Gupta", "Hassan", "Ito", "Iyer", "Johnson", "Khan", "Kim", "Kumar", "Lee", "Lopez",
+    "Martin", "Mensah", "Menon", "Miller", "Moore", "Nair", "Nguyen", "Novak", "Okafor", "Patel",
+    "Pillai", "Reddy", "Rodriguez", "Rossi", "Sato", "Schmidt", "Shah", "Sharma", "Silva", "Singh",
+    "Smith", "Suzuki", "Taylor", "Thomas", "Varghese", "Wang", "Williams", "Wilson", "Yilmaz", "Zhang",
+)
+ABSENCE_NOTES = ("Sick", "Family event", "Doctor's appointment", "Travel", None, None)
+POSITIVE_BEHAVIOURS = ("participation", "helpfulness", "achievement", "leadership")
+NEGATIVE_BEHAVIOURS = ("disruption", "missing_homework", "tardiness", "conflict")
+BEHAVIOUR_COMMENTS = {
+    "participation": "Contributed actively to class discussion.",
+    "helpfulness": "Helped a classmate with their work.",
+    "achievement": "Produced excellent work this week.",
+    "leadership": "Led their group project well.",
+    "disruption": "Disrupted the lesson repeatedly.",
+    "missing_homework": "Homework not submitted.",
+    "tardiness": "Arrived late without a note.",
+    "conflict": "Argued with a classmate during break.",
+    "observation": "Quieter than usual today.",
+}
+# (minimum score, grade)
+GRADE_BANDS = ((90, "A+"), (85, "A"), (80, "B+"), (70, "B"), (65, "C+"), (55, "C"), (45, "D"), (0, "F"))
+
+SCHEMA_DDL = """
+CREATE SCHEMA IF NOT EXISTS app;
+CREATE TABLE IF NOT EXISTS app.students (
+    id SERIAL PRIMARY KEY,
+    student_id INTEGER UNIQUE NOT NULL,
+    student_name VARCHAR(255) NOT NULL,
+    parent_name VARCHAR(255),
+    parent_phone VARCHAR(20),
+    class_value VARCHAR(10),
+    section VARCHAR(10),
+    date_of_birth DATE,
+    gender VARCHAR(10),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS app.users (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    role VARCHAR(20) DEFAULT 'parent',
+    language VARCHAR(10) DEFAULT 'en',
+    phone VARCHAR(20),
+    student_id INTEGER REFERENCES app.students(student_id),
+    subject VARCHAR(100),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS app.academic_records (
+    id SERIAL PRIMARY KEY,
+    student_id INTEGER REFERENCES app.students(student_id),
+    subject VARCHAR(100),
+    grade VARCHAR(10),
+    record_date DATE,
+    teacher_id INTEGER REFERENCES app.users(id),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS app.attendance (
+    id SERIAL PRIMARY KEY,
+    student_id INTEGER REFERENCES app.students(student_id),
+    attendance_date DATE NOT NULL,
+    status VARCHAR(10) NOT NULL,
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE UNIQUE INDEX IF NOT EXISTS attendance_student_date_key
+    ON app.attendance (student_id, attendance_date);
+CREATE TABLE IF NOT EXISTS app.behavior_records (
+    id SERIAL PRIMARY KEY,
+    student_id INTEGER REFERENCES app.students(student_id),
+    logged_by INTEGER REFERENCES app.users(id),
+    source VARCHAR(50),
+    behaviour_type VARCHAR(50),
+    sentiment_score NUMERIC(4,3),
+    comment TEXT,
+    record_date DATE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+-- Schemas created before created_at was added
+ALTER TABLE app.behavior_records ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+"""
+DATA_TABLES = ("students", "users", "academic_records", "attendance", "behavior_records")
+ROLLUP_TABLES = ("attendance_monthly", "behavior_monthly")
+
+
+def section_label(index: int) -> str:
+    """A, B, ..., Z, AA, AB, ... for section `index`."""
+    label = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        label = string.ascii_uppercase[remainder] + label
+    return label
+
+
+def school_days(start_year: int, years: int) -> list:
+    """Weekdays from September to mid-June of each school year, without the winter and spring breaks."""
+    days = []
+    for year in range(start_year, start_year + years):
+        day = date(year, 9, 1)
+        while day <= date(year + 1, 6, 15):
+            winter_break = date(year, 12, 22) <= day <= date(year + 1, 1, 2)
+            spring_break = date(year + 1, 4, 1) <= day <= date(year + 1, 4, 7)
+            if day.weekday() < 5 and not winter_break and not spring_break:
+                days.append(day)
+            day += timedelta(days=1)
+    return days
+
+
+def term_ends(start_year: int, years: int) -> list:
+    """The dates grades are recorded: the end of each of the three terms per school year."""
+    return [
+        term_end
+        for year in range(start_year, start_year + years)
+        for term_end in (date(year, 12, 20), date(year + 1, 3, 28), date(year + 1, 6, 14))
+    ]
+
+
+class School:
+    """The shape of the generated school: students, sections, teachers and users at one scale."""
+
+    def __init__(self, scale: float, seed: int, start_year: int, years: int):
+        self.seed = seed
+        self.start_year = start_year
+        self.student_count = max(round(STUDENTS_PER_SCALE * scale), len(CLASSES))
+        self.sections_per_class = max(math.ceil(self.student_count / len(CLASSES) / STUDENTS_PER_SECTION), 1)
+        section_count = len(CLASSES) * self.sections_per_class
+        self.teachers_per_subject = math.ceil(section_count / SECTIONS_PER_TEACHER)
+        self.admin_count = max(round(2 * scale), 1)
+        self.days = school_days(start_year, years)
+        self.term_ends = term_ends(start_year, years)
+        # User ids are assigned explicitly: admins, then teachers, then one parent per student
+        self.first_teacher_id = self.admin_count + 1
+        self.first_parent_id = self.first_teacher_id + len(SUBJECTS) * self.teachers_per_subject
+
+    def rng(self, *key) -> random.Random:
+        """A generator seeded by the dataset seed and `key`, independent of generation order."""
+        return random.Random(":".join(str(part) for part in (self.seed, *key)))
+
+    def student_id(self, index: int) -> int:
+        return 100001 + index
+
+    def placement(self, index: int) -> tuple:
+        """(class index, section index) of student `index`, filling sections round-robin."""
+        section_number = index % (len(CLASSES) * self.sections_per_class)
+        return divmod(section_number, self.sections_per_class)
+
+    def teacher_id(self, subject_index: int, class_index: int, section_index: int) -> int:
+        section_number = class_index * self.sections_per_class + section_index
+        teacher_index = section_number // SECTIONS_PER_TEACHER
+        return self.first_teacher_id + subject_index * self.teachers_per_subject + teacher_index
+
+    def student_name(self, rng: random.Random) -> str:
+        return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+    def students(self):
+        for index in range(self.student_count):
+            rng = self.rng("student", index)
+            class_index, section_index = self.placement(index)
+            first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            age = 6 + class_index
+            birthday = date(self.start_year - age, 1, 1) + timedelta(days=rng.randrange(365))
+            yield (
+                self.student_id(index),
+                f"{first_name} {last_name}",
+                f"{rng.choice(FIRST_NAMES)} {last_name}",
+                f"+1555{rng.randrange(10 ** 7):07d}",
+                CLASSES[class_index],
+                section_label(section_index),
+                birthday,
+                rng.choice(("female", "male")),
+            )
+
+    def users(self):
+        user_id = 1
+        for admin_index in range(self.admin_count):
+            rng = self.rng("admin", admin_index)
+            yield (user_id, self.student_name(rng), f"admin{admin_index + 1}@school.example",
+                   "synthetic", "admin", "en", None, None, None)
+            user_id += 1
+        for subject in SUBJECTS:
+            for teacher_index in range(self.teachers_per_subject):
+                rng = self.rng("teacher", subject, teacher_index)
+                yield (user_id, self.student_name(rng), f"teacher{user_id}@school.example",
+                       "synthetic", "teacher", "en", f"+1555{rng.randrange(10 ** 7):07d}", None, subject)
+                user_id += 1
+        for index, student in enumerate(self.students()):
+            rng = self.rng("parent", index)
+            yield (user_id, student[2], f"parent{student[0]}@school.example", "synthetic", "parent",
+                   rng.choices(("en", "es", "hi", "zh"), weights=(80, 10, 6, 4))[0], student[3], student[0], None)
+            user_id += 1
+
+    def academic_records(self):
+        for index in range(self.student_count):
+            rng = self.rng("grades", index)
+            class_index, section_index = self.placement(index)
+            ability = rng.gauss(0, 1)
+            aptitudes = [rng.gauss(0, 1) for _ in SUBJECTS]
+            for term_end in self.term_ends:
+                for subject_index, subject in enumerate(SUBJECTS):
+                    score = 72 + 10 * ability + 5 * aptitudes[subject_index] + rng.gauss(0, 6)
+                    grade = next(grade for minimum, grade in GRADE_BANDS if score >= minimum)
+                    yield (self.student_id(index), subject, grade, term_end,
+                           self.teacher_id(subject_index, class_index, section_index))
+
+    def attendance(self):
+        for index in range(self.student_count):
+            rng = self.rng("attendance", index)
+            # Most students miss a few percent of days; the tail is chronically absent
+            absence_rate = rng.betavariate(1.2, 30)
+            late_rate = rng.betavariate(1.2, 40)
+            student_id = self.student_id(index)
+            for day in self.days:
+                # More absences in the January-February flu season
+                flu_season = 1.6 if day.month in (1, 2) else 1.0
+                draw = rng.random()
+                if draw < absence_rate * flu_season:
+                    yield (student_id, day, "absent", rng.choice(ABSENCE_NOTES))
+                elif draw < absence_rate * flu_season + late_rate:
+                    yield (student_id, day, "late", None)
+                else:
+                    yield (student_id, day, "present", None)
+
+    def behavior_records(self):
+        for index in range(self.student_count):
+            rng = self.rng("behavior", index)
+            class_index, section_index = self.placement(index)
+            disposition = rng.gauss(0.2, 0.3)
+            record_rate = rng.uniform(0.03, 0.09)
+            for day in self.days:
+                if rng.random() >= record_rate:
+                    continue
+                score = round(min(max(rng.gauss(disposition, 0.45), -1.0), 1.0), 3)
+                if abs(score) < 0.1:
+                    behaviour_type = "observation"
+                elif score > 0:
+                    behaviour_type = rng.choice(POSITIVE_BEHAVIOURS)
+                else:
+                    behaviour_type = rng.choice(NEGATIVE_BEHAVIOURS)
+                source = rng.choices(("teacher", "counselor", "parent"), weights=(80, 10, 10))[0]
+                if source == "teacher":
+                    logged_by = self.teacher_id(rng.randrange(len(SUBJECTS)), class_index, section_index)
+                elif source == "parent":
+                    logged_by = self.first_parent_id + index
+                else:
+                    logged_by = 1 + rng.randrange(self.admin_count)
+                yield (self.student_id(index), logged_by, source, behaviour_type, score,
+                       BEHAVIOUR_COMMENTS[behaviour_type], day)
+
+
+# Column order of each generator's tuples
+TABLE_COLUMNS = {
+    "students": ["student_id", "student_name", "parent_name", "parent_phone", "class_value", "section",
+                 "date_of_birth", "gender"],
+    "users": ["id", "name", "email", "password_hash", "role", "language", "phone", "student_id", "subject"],
+    "academic_records": ["student_id", "subject", "grade", "record_date", "teacher_id"],
+    "attendance": ["student_id", "attendance_date", "status", "notes"],
+    "behavior_records": ["student_id", "logged_by", "source", "behaviour_type", "sentiment_score", "comment",
+                         "record_date"],
+}
+
+
+def existing_tables(conn, table_names) -> list:
+    return [
+        table_name for table_name in table_names
+        if conn.execute(text("SELECT to_regclass(:name)"), {"name": f"app.{table_name}"}).scalar()
+    ]
+
+
+def load_table(conn, table_name: str, rows, chunk_size: int) -> int:
+    """COPYs the rows of one table in chunks and commits; returns the row count."""
+    loaded = 0
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        server.copy_chunk(conn, table_name, TABLE_COLUMNS[table_name], chunk)
+        loaded += len(chunk)
+    conn.commit()
+    return loaded
+
+
+def smoke_calls(conn) -> list:
+    """One (tool name, arguments) call per read-only tool, with filters that match the loaded data."""
+    student = conn.execute(text(
+        "SELECT student_id, student_name, class_value, section FROM app.students ORDER BY student_id LIMIT 1"
+    )).one()
+    teacher = conn.execute(text(
+        "SELECT id, subject FROM app.users WHERE role = 'teacher' ORDER BY id LIMIT 1"
+    )).one()
+    first_day, last_day = conn.execute(text(
+        "SELECT MIN(attendance_date)::text, MAX(attendance_date)::text FROM app.attendance"
+    )).one()
+    date_range = {"start_date": first_day, "end_date": last_day}
+    return [
+        ("list_db_tables", {"dummy_param": "smoke"}),
+        ("get_table_schema", {"table_name": "behavior_records"}),
+        ("query_db_table", {
+            "table_name": "behavior_records", "columns": "*", "condition": f"student_id = {student.student_id}",
+        }),
+        ("get_students", {"class_value": student.class_value, "section": student.section, "limit": 5}),
+        ("get_students_by_class", {"class_value": student.class_value, "section": student.section}),
+        ("get_users", {"role": "teacher", "limit": 5}),
+        ("get_users_by_role", {"role": "admin"}),
+        ("get_teachers_by_subject", {"subject": teacher.subject}),
+        ("get_academic_records", {"student_id": student.student_id, "limit": 5}),
+        ("get_attendance_records", {"student_id": student.student_id, "limit": 5}),
+        ("get_attendance_summary", {"student_id": student.student_id, **date_range}),
+        ("get_behavior_records", {"student_id": student.student_id, "limit": 5}),
+        ("get_behavior_summary", {"student_id": student.student_id, **date_range}),
+        ("search_students", {"name": student.student_name.split()[0]}),
+        ("search_users", {"subject": teacher.subject}),
+    ]
+
+
+def smoke_run(conn) -> bool:
+    """Calls every read-only tool once; prints each result and returns whether all succeeded."""
+    calls = smoke_calls(conn)
+    missing = server.READ_ONLY_TOOLS - {tool_name for tool_name, _ in calls}
+    if missing:
+        raise SystemExit(f"No smoke call for read tools: {', '.join(sorted(missing))}")
+
+    failed = 0
+    for tool_name, arguments in calls:
+        try:
+            response = server.DB_TOOL_FUNCTIONS[tool_name](**arguments)
+            error = response.get("message") if server.is_error_response(response) else None
+        except Exception as e:
+            response, error = None, str(e)
+        if error is None:
+            print(f"smoke {tool_name:<24} ok {server.count_response_rows(response):>6} rows")
+        else:
+            failed += 1
+            print(f"smoke {tool_name:<24} FAILED {error.splitlines()[0]}")
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1, help="1 = a 500-student school")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start-year", type=int, default=2022, help="First school year (September)")
+    parser.add_argument("--years", type=int, default=3, help="School years of attendance and grades")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Rows per COPY")
+    parser.add_argument("--create-schema", action="store_true", help="Create the app tables if missing")
+    parser.add_argument("--reset", action="store_true", help="Empty the app tables before loading")
+    parser.add_argument("--smoke-only", action="store_true", help="Only call each read tool once, loading nothing")
+    options = parser.parse_args()
+
+    if options.smoke_only:
+        with server.get_engine().connect() as conn:
+            if not smoke_run(conn):
+                raise SystemExit(1)
+        return
+
+    school = School(options.scale, options.seed, options.start_year, options.years)
+    print(
+        f"scale {options.scale}: {school.student_count} students, "
+        f"{len(CLASSES) * school.sections_per_class} sections, "
+        f"{len(SUBJECTS) * school.teachers_per_subject} teachers, {len(school.days)} school days"
+    )
+
+    started = time.perf_counter()
+    with server.get_engine().connect() as conn:
+        if options.create_schema:
+            conn.execute(text(SCHEMA_DDL))
+            conn.commit()
+        if options.reset:
+            tables = existing_tables(conn, DATA_TABLES + ROLLUP_TABLES)
+            # TRUNCATE does not fire the rollup triggers, so the rollups are emptied too
+            conn.execute(text(
+                f"TRUNCATE {', '.join(f'app.{table}' for table in tables)} RESTART IDENTITY CASCADE"
+            ))
+            conn.commit()
+        elif conn.execute(text("SELECT EXISTS (SELECT 1 FROM app.students)")).scalar():
+            raise SystemExit("app.students is not empty; pass --reset to replace its data.")
+
+        for table_name in DATA_TABLES:
+            table_started = time.perf_counter()
+            rows = load_table(conn, table_name, getattr(school, table_name)(), options.chunk_size)
+            elapsed = time.perf_counter() - table_started
+            print(f"{table_name:<18} {rows:>11,} rows {elapsed:>8.1f}s {rows / elapsed:>11,.0f} rows/s")
+
+        # Users were loaded with explicit ids; move the sequence past them
+        conn.execute(text("SELECT setval(pg_get_serial_sequence('app.users', 'id'), MAX(id)) FROM app.users"))
+        conn.commit()
+        conn.execute(text("ANALYZE " + ", ".join(f"app.{table}" for table in DATA_TABLES)))
+        conn.commit()
+        print(f"loaded in {time.perf_counter() - started:.1f}s")
+
+        if not smoke_run(conn):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
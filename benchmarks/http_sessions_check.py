@@ -0,0 +1,146 @@
+"""Checks that concurrent MCP sessions over HTTP share one server process and stay isolated.
+
+Connects --sessions clients to a running `python server.py --transport http`,
+half over streamable HTTP (/mcp) and half over SSE (/sse), or all over
+streamable HTTP with --no-sse (multi-worker servers serve no SSE), and has all of them
+run a transactional batch at the same time: each adds one behavior record, and
+every odd session then calls an unknown tool so its batch rolls back. The
+check passes when every even session's record is committed, no odd session's
+record is, each streamable HTTP session got its own session id, and (on a
+single-process server) its one connection pool served every session. The
+records it adds are deleted again at the end.
+
+Usage:
+    python server.py --transport http --port 8080 &
+    python benchmarks/http_sessions_check.py --url http://localhost:8080 --sessions 20
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import uuid
+from contextlib import AsyncExitStack
+from datetime import date
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+from mcp.client.streamable_http import streamable_http_client
+
+SOURCE = "http_sessions_check"
+
+
+async def call(session: ClientSession, tool_name: str, arguments: dict):
+    result = await session.call_tool(tool_name, arguments)
+    return json.loads(result.content[0].text)
+
+
+async def open_session(stack: AsyncExitStack, base_url: str, index: int, sse: bool):
+    """Opens client `index`: even clients over streamable HTTP, odd clients over SSE if `sse`."""
+    session_id = None
+    if index % 2 == 0 or not sse:
+        read_stream, write_stream, get_session_id = await stack.enter_async_context(
+            streamable_http_client(f"{base_url}/mcp")
+        )
+    else:
+        read_stream, write_stream = await stack.enter_async_context(sse_client(f"{base_url}/sse"))
+        get_session_id = None
+    session = await stack.enter_async_context(ClientSession(read_stream, write_stream))
+    await session.initialize()
+    if get_session_id is not None:
+        session_id = get_session_id()
+    return session, session_id
+
+
+def pool_checkouts(pool_stats: dict) -> int:
+    return sum(pool["checkouts"] for pool in pool_stats["pools"].values())
+
+
+async def run_client(session: ClientSession, index: int, student_id: int, tag: str) -> dict:
+    """Adds this client's behavior record in a transaction; odd clients then fail and roll back."""
+    operations = [
+        {
+            "tool": "add_behavior_record",
+            "arguments": {
+                "student_id": student_id,
+                "source": SOURCE,
+                "record_date": date.today().isoformat(),
+                "comment": f"{tag} {index}",
+            },
+        },
+        {"tool": "get_behavior_summary", "arguments": {"student_id": student_id}},
+    ]
+    if index % 2:
+        operations.append({"tool": "no_such_tool", "arguments": {}})
+    return await call(session, "batch", {"operations": operations, "transaction": True})
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8080", help="Base URL of the HTTP server")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--no-sse", dest="sse", action="store_false", help="Connect every client over /mcp")
+    options = parser.parse_args()
+    base_url = options.url.rstrip("/")
+    tag = f"check-{uuid.uuid4().hex[:8]}"
+    failures = []
+
+    async with AsyncExitStack() as stack:
+        clients = [await open_session(stack, base_url, index, options.sse) for index in range(options.sessions)]
+        sessions = [session for session, _ in clients]
+        # Stateless servers (e.g. several workers) issue no session ids
+        session_ids = [session_id for _, session_id in clients if session_id is not None]
+        if len(set(session_ids)) != len(session_ids):
+            failures.append("streamable HTTP sessions share a session id")
+
+        students = await call(sessions[0], "get_students", {"limit": 1})
+        if not students.get("students"):
+            raise SystemExit("app.students is empty; seed the database first.")
+        student_id = students["students"][0]["student_id"]
+        worker_count = len((await call(sessions[0], "get_worker_stats", {"dummy_param": "x"}))["workers"])
+        before = await call(sessions[0], "get_pool_stats", {"dummy_param": "x"})
+
+        results = await asyncio.gather(*(
+            run_client(session, index, student_id, tag) for index, session in enumerate(sessions)
+        ))
+
+        after = await call(sessions[-1], "get_pool_stats", {"dummy_param": "x"})
+        stored = await call(sessions[-1], "query_db_table", {
+            "table_name": "behavior_records",
+            "columns": "comment",
+            "condition": f"source = '{SOURCE}' AND comment LIKE '{tag} %'",
+        })
+        await call(sessions[0], "delete_data", {
+            "table_name": "behavior_records",
+            "condition": f"source = '{SOURCE}' AND comment LIKE '{tag} %'",
+        })
+
+    for index, result in enumerate(results):
+        expected = index % 2 == 0
+        if result.get("committed") is not expected:
+            failures.append(f"session {index}: committed={result.get('committed')}, expected {expected}")
+    stored_indexes = sorted(int(row["comment"].rsplit(" ", 1)[1]) for row in stored)
+    expected_indexes = list(range(0, options.sessions, 2))
+    if stored_indexes != expected_indexes:
+        failures.append(f"stored records from sessions {stored_indexes}, expected {expected_indexes}")
+    # Each worker has its own pool, and the two get_pool_stats calls may reach different workers
+    checkouts = pool_checkouts(after) - pool_checkouts(before)
+    if worker_count == 1 and checkouts < options.sessions:
+        failures.append(f"pool saw {checkouts} checkouts for {options.sessions} sessions")
+
+    pool_sizes = {name: pool["pool_size"] for name, pool in after["pools"].items()}
+    served_by = f"{checkouts} checkouts from pools {pool_sizes}" if worker_count == 1 else f"{worker_count} workers"
+    sse_sessions = options.sessions // 2 if options.sse else 0
+    print(
+        f"{options.sessions} sessions ({options.sessions - sse_sessions} streamable HTTP, "
+        f"{sse_sessions} SSE), {len(stored_indexes)} committed, "
+        f"{options.sessions - len(stored_indexes)} rolled back, served by {served_by}"
+    )
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print("FAIL" if failures else "OK")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
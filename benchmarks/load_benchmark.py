@@ -0,0 +1,349 @@
+"""Drives the MCP server end to end with scripted mixes of tool calls at several concurrency levels.
+
+The server's `app` runs in this process over in-memory MCP streams, as a
+`python server.py` stdio subprocess, or behind an already running
+`python server.py --transport http` at --url, and every call goes through an
+MCP ClientSession. Over HTTP each concurrent client opens its own session, as
+separate agents would. Tool arguments are drawn from the data already in the
+database (student ids, classes and sections, the attendance date range), so
+seed it first, e.g. with benchmarks/generate_dataset.py. Each concurrency level reports throughput, latency
+percentiles overall and per tool, errors and server memory; --output saves
+the run as JSON so runs can be compared over time.
+
+Usage:
+    DATABASE_URI=postgresql://postgres@localhost/student \
+        python benchmarks/load_benchmark.py --transport memory --mix school_day \
+        --concurrency 1 10 50 --requests 500 --output load.json
+    python benchmarks/load_benchmark.py --transport http --url http://localhost:8080/mcp --concurrency 1 10 50
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from contextlib import AsyncExitStack
+from datetime import date, datetime, timedelta, timezone
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamable_http_client
+from mcp.shared.memory import create_connected_server_and_client_session
+from sqlalchemy import text
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_PATH = os.path.join(REPO_PATH, "server.py")
+sys.path.insert(0, REPO_PATH)
+import server  # noqa: E402
+
+
+def roster(rng, sample):
+    class_value, section = rng.choice(sample["classes"])
+    return {"class_value": class_value, "section": section}
+
+
+def class_page(rng, sample):
+    return {"class_value": rng.choice(sample["classes"])[0], "limit": 100}
+
+
+def mark(rng, sample):
+    return {
+        "student_id": rng.choice(sample["student_ids"]),
+        "attendance_date": random_date(rng, sample).isoformat(),
+        "status": rng.choices(("present", "absent", "late"), weights=(90, 6, 4))[0],
+    }
+
+
+def student_attendance(rng, sample):
+    return {"student_id": rng.choice(sample["student_ids"]), "limit": 50}
+
+
+def student_month_summary(rng, sample):
+    start = random_date(rng, sample).replace(day=1)
+    end = (start + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+    return {
+        "student_id": rng.choice(sample["student_ids"]),
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+    }
+
+
+def student_behavior(rng, sample):
+    return {"student_id": rng.choice(sample["student_ids"])}
+
+
+def student_grades(rng, sample):
+    return {"student_id": rng.choice(sample["student_ids"])}
+
+
+def term_summary(rng, sample):
+    start = random_date(rng, sample).replace(day=1)
+    return {"start_date": start.isoformat(), "end_date": (start + timedelta(days=90)).isoformat()}
+
+
+def all_behavior(rng, sample):
+    return {}
+
+
+# Weighted (weight, tool, argument builder) operations per mix
+MIXES = {
+    # A teacher's day: rosters, marking attendance, looking up individual students
+    "school_day": [
+        (30, "get_students_by_class", roster),
+        (25, "mark_attendance", mark),
+        (15, "get_attendance_records", student_attendance),
+        (10, "get_attendance_summary", student_month_summary),
+        (10, "get_behavior_summary", student_behavior),
+        (5, "get_students", class_page),
+        (5, "get_academic_records", student_grades),
+    ],
+    # The same lookups without writes
+    "read_only": [
+        (35, "get_students_by_class", roster),
+        (20, "get_attendance_records", student_attendance),
+        (15, "get_attendance_summary", student_month_summary),
+        (15, "get_behavior_summary", student_behavior),
+        (10, "get_students", class_page),
+        (5, "get_academic_records", student_grades),
+    ],
+    # School-wide reports over whole terms
+    "reporting": [
+        (40, "get_attendance_summary", term_summary),
+        (30, "get_behavior_summary", all_behavior),
+        (30, "get_attendance_summary", student_month_summary),
+    ],
+}
+
+
+def random_date(rng, sample) -> date:
+    first_date, last_date = sample["date_range"]
+    return first_date + timedelta(days=rng.randrange((last_date - first_date).days + 1))
+
+
+def load_sample() -> dict:
+    """Reads the student ids, classes and attendance dates the tool arguments are drawn from."""
+    with server.get_engine().connect() as conn:
+        students = conn.execute(text(
+            "SELECT student_id, class_value, section FROM app.students ORDER BY student_id"
+        )).fetchall()
+        date_range = conn.execute(text(
+            "SELECT MIN(attendance_date), MAX(attendance_date) FROM app.attendance"
+        )).fetchone()
+    if not students:
+        raise SystemExit("app.students is empty; seed the database before benchmarking.")
+    today = date.today()
+    return {
+        "student_ids": [student.student_id for student in students],
+        "classes": sorted({(student.class_value, student.section) for student in students}),
+        "date_range": (date_range[0] or today, date_range[1] or today),
+    }
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+
+def latency_summary(latencies: list) -> dict:
+    latencies = sorted(latencies)
+    if not latencies:
+        return {}
+    return {
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+    }
+
+
+def is_error(result) -> bool:
+    """True if a call_tool result is an MCP error or a tool response with success=false."""
+    if result.isError or not result.content:
+        return True
+    # NDJSON responses start with a JSON header line
+    response = json.loads(result.content[0].text.split("\n", 1)[0] or "{}")
+    return isinstance(response, dict) and (response.get("success") is False or "error" in response)
+
+
+def rss_mb(pid: int):
+    """Current resident memory of a process in MiB, or None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/status") as status_file:
+            for line in status_file:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+def child_server_pid():
+    """The pid of the stdio server subprocess, found through /proc."""
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat_file:
+                parent_pid = int(stat_file.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if parent_pid == os.getpid():
+            return int(entry)
+    return None
+
+
+def peak_rss_mb(transport: str):
+    """Peak resident memory of the server: this process, the finished stdio subprocess, or None over HTTP."""
+    if transport == "http":
+        return None
+    who = resource.RUSAGE_SELF if transport == "memory" else resource.RUSAGE_CHILDREN
+    peak_kib = resource.getrusage(who).ru_maxrss
+    return round(peak_kib / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def run_level(sessions: list, mix: list, sample: dict, clients: int, requests: int, seed: int) -> dict:
+    """Runs `requests` calls drawn from `mix`, spread over `clients` concurrent workers.
+
+    Worker i calls through sessions[i % len(sessions)], so a single session is
+    shared by every worker and one session per client gives each its own.
+    """
+    rng = random.Random(seed)
+    weights = [weight for weight, _, _ in mix]
+    calls = [
+        (tool_name, build_arguments(rng, sample))
+        for _, tool_name, build_arguments in rng.choices(mix, weights=weights, k=requests)
+    ]
+    latencies = []
+    per_tool = {}
+    pending = iter(calls)
+
+    async def worker(session):
+        for tool_name, arguments in pending:
+            started = time.perf_counter()
+            result = await session.call_tool(tool_name, arguments)
+            latency = time.perf_counter() - started
+            latencies.append(latency)
+            tool = per_tool.setdefault(tool_name, {"calls": 0, "errors": 0, "latencies": []})
+            tool["calls"] += 1
+            tool["errors"] += is_error(result)
+            tool["latencies"].append(latency)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(sessions[index % len(sessions)]) for index in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": sum(tool["errors"] for tool in per_tool.values()),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        **latency_summary(latencies),
+        "tools": {
+            tool_name: {
+                "calls": tool["calls"],
+                "errors": tool["errors"],
+                **latency_summary(tool["latencies"]),
+            }
+            for tool_name, tool in sorted(per_tool.items())
+        },
+    }
+
+
+async def run_benchmark(sessions: list, options, sample: dict, server_pid) -> list:
+    mix = MIXES[options.mix]
+    await run_level(sessions, mix, sample, 1, options.warmup, options.seed - 1)
+    levels = []
+    for clients in options.concurrency:
+        level = await run_level(sessions, mix, sample, clients, options.requests, options.seed + clients)
+        level["rss_mb"] = rss_mb(server_pid) if server_pid else None
+        levels.append(level)
+        print(
+            f"{clients:>7} {level['throughput_rps']:>9} {level['p50_ms']:>9} {level['p95_ms']:>9} "
+            f"{level['p99_ms']:>9} {level['errors']:>7} {level['rss_mb'] or '-':>8}"
+        )
+    return levels
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_PATH, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transport", choices=("memory", "stdio", "http"), default="memory")
+    parser.add_argument("--url", default="http://localhost:8080/mcp", help="Streamable HTTP endpoint for --transport http")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="school_day")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=500, help="Calls per concurrency level")
+    parser.add_argument("--warmup", type=int, default=50, help="Calls before the first level")
+    parser.add_argument("--mode", default=server.DB_EXECUTION_MODE, help="DB_EXECUTION_MODE of the server")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the call sequence")
+    parser.add_argument("--output", help="Optional path to write JSON results")
+    options = parser.parse_args()
+
+    sample = load_sample()
+    print(
+        f"{options.transport} transport, {options.mix} mix, {options.mode} mode, "
+        f"{len(sample['student_ids'])} students"
+    )
+    print(f"{'clients':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'RSS MiB':>8}")
+    if options.transport == "memory":
+        server.DB_EXECUTION_MODE = options.mode
+        async with create_connected_server_and_client_session(server.app) as session:
+            levels = await run_benchmark([session], options, sample, os.getpid())
+    elif options.transport == "http":
+        # The server was started separately, so its execution mode is whatever it was started with
+        async with AsyncExitStack() as stack:
+            sessions = []
+            for _ in range(max(options.concurrency)):
+                read_stream, write_stream, _ = await stack.enter_async_context(streamable_http_client(options.url))
+                session = await stack.enter_async_context(ClientSession(read_stream, write_stream))
+                await session.initialize()
+                sessions.append(session)
+            levels = await run_benchmark(sessions, options, sample, None)
+    else:
+        env = {**os.environ, "DB_EXECUTION_MODE": options.mode}
+        params = StdioServerParameters(command=sys.executable, args=[SERVER_PATH], env=env)
+        async with stdio_client(params) as (read_stream, write_stream):
+            async with ClientSession(read_stream, write_stream) as session:
+                await session.initialize()
+                levels = await run_benchmark([session], options, sample, child_server_pid())
+
+    # Read before any other subprocess runs, so the stdio server is the largest child
+    peak_rss = peak_rss_mb(options.transport)
+    results = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "transport": options.transport,
+        "mix": options.mix,
+        "execution_mode": options.mode,
+        "seed": options.seed,
+        "students": len(sample["student_ids"]),
+        "peak_rss_mb": peak_rss,
+        "levels": levels,
+    }
+    print(f"peak server RSS {results['peak_rss_mb']} MiB")
+
+    if options.output:
+        with open(options.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+
+    if server.async_engine is not None:
+        await server.async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
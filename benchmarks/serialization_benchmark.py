@@ -0,0 +1,139 @@
+"""Compares JSON serializers on realistic 10k-row attendance tool responses.
+
+Builds a get_attendance_records response (ints, names, dates, timestamps) and
+a get_attendance_summary response (with Decimal percentages), then times the
+previous pretty-printed json.dumps against the compact and pretty outputs of
+server.dumps_json with the json module and with orjson (when installed).
+
+Usage:
+    python benchmarks/serialization_benchmark.py --rows 10000 --repeats 20 --output serialization.json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import server  # noqa: E402
+
+
+def attendance_records_response(rows: int) -> dict:
+    """A get_attendance_records response with `rows` records."""
+    rng = random.Random(42)
+    start = date(2024, 1, 1)
+    records = [
+        {
+            "id": index + 1,
+            "student_id": 10000 + index % 500,
+            "student_name": f"Student {index % 500:03d}",
+            "attendance_date": start + timedelta(days=index // 500),
+            "status": rng.choice(("present", "present", "present", "absent", "late")),
+            "notes": "Doctor's appointment" if index % 37 == 0 else None,
+            "created_at": datetime(2024, 1, 1, 8, 0) + timedelta(days=index // 500, seconds=index % 500),
+        }
+        for index in range(rows)
+    ]
+    return {
+        "success": True,
+        "message": f"Retrieved {rows} attendance records.",
+        "records": records,
+        "next_cursor": None,
+    }
+
+
+def attendance_summary_response(rows: int) -> dict:
+    """A get_attendance_summary response with `rows` students."""
+    rng = random.Random(7)
+    summary = []
+    for index in range(rows):
+        present, absent, late = rng.randint(120, 180), rng.randint(0, 20), rng.randint(0, 15)
+        total = present + absent + late
+        summary.append({
+            "student_id": 10000 + index,
+            "student_name": f"Student {index:05d}",
+            "total_days": total,
+            "present_days": present,
+            "absent_days": absent,
+            "late_days": late,
+            "attendance_percentage": Decimal(present * 100 / total).quantize(Decimal("0.01")),
+        })
+    return {
+        "success": True,
+        "message": f"Retrieved attendance summary for {rows} students.",
+        "summary": summary,
+    }
+
+
+def serializers() -> dict:
+    """The serializers to compare, by label."""
+    variants = {
+        "json indent=2 (previous)": lambda obj: json.dumps(obj, indent=2, default=server.json_serializer),
+    }
+    for backend in ("json", "orjson"):
+        if backend == "orjson" and server.orjson is None:
+            continue
+
+        def compact(obj, backend=backend):
+            server.JSON_SERIALIZER = backend
+            return server.dumps_json(obj)
+
+        def pretty(obj, backend=backend):
+            server.JSON_SERIALIZER = backend
+            return server.dumps_json(obj, pretty=True)
+
+        variants[f"{backend} compact"] = compact
+        variants[f"{backend} pretty"] = pretty
+    return variants
+
+
+def time_serializer(serialize, response: dict, repeats: int) -> dict:
+    """Returns the median time and output size of serializing `response`."""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        text = serialize(response)
+        timings.append(time.perf_counter() - started)
+    return {"ms": round(statistics.median(timings) * 1000, 2), "bytes": len(text.encode())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", help="Optional path to write JSON results")
+    options = parser.parse_args()
+
+    responses = {
+        "attendance_records": attendance_records_response(options.rows),
+        "attendance_summary": attendance_summary_response(options.rows),
+    }
+    results = {}
+    for response_name, response in responses.items():
+        results[response_name] = {
+            label: time_serializer(serialize, response, options.repeats)
+            for label, serialize in serializers().items()
+        }
+
+    for response_name, variants in results.items():
+        baseline = variants["json indent=2 (previous)"]
+        print(f"\n{response_name} ({options.rows} rows)")
+        print(f"{'serializer':<26} {'ms':>9} {'speedup':>8} {'KiB':>9} {'size':>6}")
+        for label, result in variants.items():
+            print(
+                f"{label:<26} {result['ms']:>9} {baseline['ms'] / result['ms']:>7.1f}x "
+                f"{result['bytes'] / 1024:>9.0f} {result['bytes'] / baseline['bytes']:>6.0%}"
+            )
+
+    if options.output:
+        with open(options.output, "w") as output_file:
+            json.dump({"rows": options.rows, "repeats": options.repeats, "results": results}, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Measures MCP server cold start: time to handshake, first list_tools and first tool call.
+
+Each trial launches `python server.py` as a stdio subprocess and drives it with
+the MCP client. Trials run with FAST_START=false (eager imports) and with
+FAST_START=true against a freshly generated tool manifest, and the medians of
+each phase are printed.
+
+Usage:
+    python benchmarks/startup_benchmark.py --trials 10 --output startup.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+SERVER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server.py")
+
+
+async def run_trial(env: dict, tool_name: str) -> dict:
+    """Starts one server process and times each startup phase from process launch."""
+    params = StdioServerParameters(command=sys.executable, args=[SERVER_PATH], env=env)
+    started = time.perf_counter()
+    async with stdio_client(params) as (read_stream, write_stream):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+            handshake = time.perf_counter() - started
+            await session.list_tools()
+            list_tools = time.perf_counter() - started
+            await session.call_tool(tool_name, {"dummy_param": "benchmark"})
+            first_call = time.perf_counter() - started
+    return {
+        "handshake_ms": handshake * 1000,
+        "list_tools_ms": list_tools * 1000,
+        "first_call_ms": first_call * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument(
+        "--tool", default="get_executor_stats", help="Tool for the first call (takes dummy_param)"
+    )
+    parser.add_argument("--output", help="Optional path to write JSON results")
+    options = parser.parse_args()
+
+    manifest_path = os.path.join(tempfile.mkdtemp(), "tool_manifest.json")
+    base_env = {**os.environ, "TOOL_MANIFEST_PATH": manifest_path}
+    subprocess.run(
+        [sys.executable, SERVER_PATH, "--generate-manifest"], env=base_env, check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+    results = {}
+    for label, fast_start in (("eager", "false"), ("fast_start", "true")):
+        env = {**base_env, "FAST_START": fast_start}
+        trials = [await run_trial(env, options.tool) for _ in range(options.trials)]
+        results[label] = {
+            phase: round(statistics.median(trial[phase] for trial in trials), 1)
+            for phase in trials[0]
+        }
+
+    print(f"{'mode':<12} {'handshake ms':>13} {'list_tools ms':>14} {'first call ms':>14}")
+    for label, phases in results.items():
+        print(
+            f"{label:<12} {phases['handshake_ms']:>13} {phases['list_tools_ms']:>14} "
+            f"{phases['first_call_ms']:>14}"
+        )
+
+    if options.output:
+        with open(options.output, "w") as output_file:
+            json.dump({"trials": options.trials, "results": results}, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,11 +1,43 @@
+import argparse
 import asyncio
+import atexit
+import base64
+import bisect
+import collections
+import contextlib
+import contextvars
+import csv
+import functools
+import hashlib
+import inspect
+import io
+import itertools
 import json
 import logging  # Added logging
+import logging.handlers
+import math
 import os
-from datetime import date, datetime
+import queue
+import random
+import re
+import reprlib
+import resource
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 from typing import Optional
-from sqlalchemy import create_engine, MetaData, text
+from sqlalchemy import create_engine, event, MetaData, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DisconnectionError, InterfaceError, OperationalError
+from sqlalchemy.util import await_only
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session
 from urllib.parse import quote
@@ -13,10 +45,6 @@ from urllib.parse import quote
 import mcp.server.stdio  # For running as a stdio server
 from dotenv import load_dotenv
 
-# ADK Tool Imports
-from google.adk.tools.function_tool import FunctionTool
-from google.adk.tools.mcp_tool.conversion_utils import adk_to_mcp_tool_type
-
 # MCP Server Imports
 from mcp import types as mcp_types  # Use alias to avoid conflict
 from mcp.server.lowlevel import NotificationOptions, Server
@@ -24,15 +52,87 @@ from mcp.server.models import InitializationOptions
 
 load_dotenv()
 
+# Multi-worker HTTP mode runs this file in spawned processes: each imports it as
+# __mp_main__ and then uvicorn imports "server" for the app. Alias the two so a
+# worker loads the module, its engines and caches only once.
+if __name__ == "__mp_main__":
+    sys.modules.setdefault("server", sys.modules[__name__])
+
 # --- Logging Setup ---
 LOG_FILE_PATH = os.path.join(os.path.dirname(__file__), "mcp_server_activity.log")
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_FILE_PATH, mode="w"),
-    ],
-)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# The activity log rotates at LOG_MAX_BYTES, keeping LOG_BACKUP_COUNT old files
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# Tool responses are logged as their size plus at most LOG_RESPONSE_CHARS
+# characters, for a LOG_RESPONSE_SAMPLE_RATE fraction of calls
+LOG_RESPONSE_CHARS = int(os.getenv("LOG_RESPONSE_CHARS", "500"))
+LOG_RESPONSE_SAMPLE_RATE = float(os.getenv("LOG_RESPONSE_SAMPLE_RATE", "1.0"))
+
+
+def _parse_log_levels(value: str) -> dict:
+    """Parses "sqlalchemy.engine=INFO,mcp=DEBUG" into {logger name: level}."""
+    levels = {}
+    for item in value.split(","):
+        if "=" in item:
+            logger_name, level = item.split("=", 1)
+            levels[logger_name.strip()] = level.strip().upper()
+    return levels
+
+
+# Per-subsystem levels. SQL statement logging is off by default; set
+# LOG_LEVELS="sqlalchemy.engine=INFO" to log every statement.
+LOG_LEVELS = {
+    "sqlalchemy.engine": "WARNING",
+    "sqlalchemy.pool": "WARNING",
+    **_parse_log_levels(os.getenv("LOG_LEVELS", "")),
+}
+
+
+def setup_logging() -> Optional[logging.handlers.QueueListener]:
+    """Routes all logging through a queue to a rotating file.
+
+    Callers only enqueue the record; a listener thread formats it and writes
+    the file, so disk I/O never runs on the event loop. HTTP worker processes
+    get no listener: their records go to the supervisor process, which alone
+    writes and rotates the file (see run_mcp_http_server).
+    """
+    logging.getLogger().setLevel(LOG_LEVEL)
+    for logger_name, level in LOG_LEVELS.items():
+        logging.getLogger(logger_name).setLevel(level)
+    if __name__ == "__mp_main__":
+        # Until uvicorn applies the worker log_config; keeps logging.info() from
+        # installing a stderr handler of its own
+        logging.getLogger().handlers = [logging.NullHandler()]
+        # uvicorn re-raises SIGTERM after its graceful shutdown. Exit normally
+        # then, so the records still queued for the supervisor are flushed
+        # rather than cut off mid-write (which would leave the queue locked).
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        return None
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT
+    )
+    file_handler.setFormatter(logging.Formatter(
+        "%(asctime)s - %(levelname)s - %(name)s - [%(filename)s:%(lineno)d] - %(message)s"
+    ))
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    logging.getLogger().handlers = [logging.handlers.QueueHandler(log_queue)]
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+log_listener = setup_logging()
+# Tool requests and responses; its level can be set apart from the rest,
+# e.g. LOG_LEVELS="mcp_server.calls=WARNING" to stop logging every call
+call_logger = logging.getLogger("mcp_server.calls")
+# Tool arguments are logged through this, which caps long strings and
+# containers instead of formatting them in full
+_log_repr = reprlib.Repr()
+_log_repr.maxstring = 200
+_log_repr.maxother = 200
+_log_repr.maxlist = _log_repr.maxdict = 20
 # --- End Logging Setup ---
 
 # Database credentials
@@ -45,17 +145,177 @@ database = "student"
 # URL encode the password to handle special characters
 password = quote(password)
 
+
+
+def with_default_driver(uri: Optional[str]) -> Optional[str]:
+    """Names psycopg (v3) as the driver of a postgresql:// URI that names none.
+
+    SQLAlchemy may otherwise pick psycopg2, which has no server-side prepared
+    statements; a URI naming its driver is left as is.
+    """
+    if uri is not None and uri.startswith("postgresql://"):
+        return "postgresql+psycopg://" + uri[len("postgresql://"):]
+    return uri
+
+
 # Construct the database URI
-DATABASE_URI = f"postgresql://{username}:{password}@{host}:{port}/{database}"
+DATABASE_URI = with_default_driver(os.getenv(
+    "DATABASE_URI", f"postgresql://{username}:{password}@{host}:{port}/{database}"
+))
+
+# Optional read replica (a streaming standby of DATABASE_URI). Read-only tools
+# run there while its replication lag, measured every
+# DB_REPLICA_LAG_CHECK_INTERVAL seconds, is at most DB_REPLICA_MAX_LAG seconds,
+# and on the primary when it lags or cannot be reached. After a session writes,
+# its reads stay on the primary for DB_READ_YOUR_WRITES_SECONDS so it sees its
+# own changes.
+DATABASE_REPLICA_URI = with_default_driver(os.getenv("DATABASE_REPLICA_URI"))
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+DB_REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_LAG_CHECK_INTERVAL", "2"))
+DB_READ_YOUR_WRITES_SECONDS = float(
+    os.getenv("DB_READ_YOUR_WRITES_SECONDS", str(DB_REPLICA_MAX_LAG + DB_REPLICA_LAG_CHECK_INTERVAL))
+)
+
+# Async driver used by the non-blocking execution path. psycopg (v3) accepts the
+# ISO date strings the tools pass as parameters; asyncpg requires date objects.
+ASYNC_DB_DRIVER = os.getenv("ASYNC_DB_DRIVER", "psycopg")
+ASYNC_DATABASE_URI = make_url(DATABASE_URI).set(
+    drivername=f"postgresql+{ASYNC_DB_DRIVER}"
+)
+
+# How call_mcp_tool executes tools: "async" runs them on the async engine so
+# concurrent calls overlap their database latency, "threadpool" runs the sync
+# tools on a bounded thread pool, "sync" runs them inline.
+DB_EXECUTION_MODE = os.getenv("DB_EXECUTION_MODE", "async")
+
+
+def _parse_tool_limits(value: str, parse=int) -> dict:
+    """Parses "tool_a=2,tool_b=4" into {"tool_a": 2, "tool_b": 4}."""
+    limits = {}
+    for item in value.split(","):
+        if "=" in item:
+            tool_name, limit = item.split("=", 1)
+            limits[tool_name.strip()] = parse(limit)
+    return limits
+
+
+# Thread pool settings for the "threadpool" execution mode. Heavy readers are
+# capped so they cannot occupy every worker.
+TOOL_THREAD_POOL_SIZE = int(os.getenv("TOOL_THREAD_POOL_SIZE", "8"))
+TOOL_CONCURRENCY_LIMITS = {
+    "get_academic_records": 2,
+    "query_db_table": 2,
+    **_parse_tool_limits(os.getenv("TOOL_CONCURRENCY_LIMITS", "")),
+}
+
+# Seconds any one statement of a tool call may run before the server cancels
+# it (0 for no limit), so a careless condition or a summary over all history
+# cannot hold a connection for minutes. TOOL_STATEMENT_TIMEOUTS sets it per
+# tool; schema changes, rollup rebuilds and bulk loads are unlimited.
+DB_STATEMENT_TIMEOUT = float(os.getenv("DB_STATEMENT_TIMEOUT", "30"))
+TOOL_STATEMENT_TIMEOUTS = {
+    "bulk_insert_data": 0,
+    "setup_attendance_rollup": 0,
+    "setup_behavior_rollup": 0,
+    "check_behavior_rollup": 0,
+    "setup_search_indexes": 0,
+    "advise_indexes": 0,
+    **_parse_tool_limits(os.getenv("TOOL_STATEMENT_TIMEOUTS", ""), float),
+}
+
+# Connection pool settings, shared by the sync and async engines
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Number of connections opened at startup so the first tool calls skip the
+# TCP+TLS+auth handshake
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", str(DB_POOL_SIZE)))
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_timeout": DB_POOL_TIMEOUT,
+}
+# Pool size of the sync engines in async mode. Tool calls run on the async
+# engines there, but get_pool_stats still creates the sync one.
+DB_SECONDARY_POOL_SIZE = int(os.getenv("DB_SECONDARY_POOL_SIZE", str(DB_POOL_SIZE)))
+SYNC_POOL_OPTIONS = (
+    {**POOL_OPTIONS, "pool_size": DB_SECONDARY_POOL_SIZE} if DB_EXECUTION_MODE == "async" else POOL_OPTIONS
+)
+
+# Server-side prepared statements (psycopg 3 only): a query executed
+# PREPARE_THRESHOLD times on a pooled connection is prepared there and
+# reused; each connection keeps at most PREPARED_STATEMENTS_MAX of them.
+# Set PREPARE_THRESHOLD=none to disable, e.g. behind a transaction-mode pgbouncer.
+_prepare_threshold = os.getenv("PREPARE_THRESHOLD", "2").lower()
+PREPARE_THRESHOLD = None if _prepare_threshold == "none" else int(_prepare_threshold)
+PREPARED_STATEMENTS_MAX = int(os.getenv("PREPARED_STATEMENTS_MAX", "256"))
+
+# Fast-start mode defers the google.adk import until tools are first needed
+# and serves list_tools from the generated tool manifest when it is current.
+FAST_START = os.getenv("FAST_START", "true").lower() == "true"
+TOOL_MANIFEST_PATH = os.getenv(
+    "TOOL_MANIFEST_PATH", os.path.join(os.path.dirname(__file__), "tool_manifest.json")
+)
 
-# Create the SQLAlchemy engine
-engine = create_engine(DATABASE_URI, echo=True)
+# Transport for `python server.py`: "stdio" serves one client; "http" serves
+# streamable HTTP at /mcp and SSE at /sse with uvicorn, so many agents share
+# one process, connection pool and set of caches.
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "stdio")
+HTTP_HOST = os.getenv("HTTP_HOST", "0.0.0.0")
+HTTP_PORT = int(os.getenv("PORT", "8080"))
+# Stateless mode starts a fresh session per request; JSON responses replace SSE streams
+HTTP_STATELESS = os.getenv("HTTP_STATELESS", "false").lower() == "true"
+HTTP_JSON_RESPONSE = os.getenv("HTTP_JSON_RESPONSE", "false").lower() == "true"
+# Tool calls one HTTP session may run at once, so a single busy agent cannot
+# hold every pooled connection; defaults to DB_POOL_SIZE
+SESSION_CONCURRENCY_LIMIT = int(os.getenv("SESSION_CONCURRENCY_LIMIT", "0")) or DB_POOL_SIZE
+# Worker processes serving the HTTP transport on one listening socket. With
+# more than one, a client's requests may reach any worker, so streamable HTTP
+# runs stateless with JSON responses and SSE (which needs its session's
+# worker) is not served.
+HTTP_WORKERS = int(os.getenv("HTTP_WORKERS", "1"))
+# Database connections all workers may hold together, split evenly into fixed
+# per-worker pools; 0 gives every worker DB_POOL_SIZE + DB_MAX_OVERFLOW.
+DB_CONNECTION_BUDGET = int(os.getenv("DB_CONNECTION_BUDGET", "0"))
+# A worker is replaced after about HTTP_WORKER_MAX_REQUESTS requests (0 never),
+# plus a random 0..HTTP_WORKER_MAX_REQUESTS_JITTER so workers do not all
+# restart at once. It first drains for HTTP_WORKER_DRAIN_SECONDS, then finishes
+# in-flight requests for up to HTTP_GRACEFUL_TIMEOUT seconds.
+HTTP_WORKER_MAX_REQUESTS = int(os.getenv("HTTP_WORKER_MAX_REQUESTS", "0"))
+HTTP_WORKER_MAX_REQUESTS_JITTER = int(
+    os.getenv("HTTP_WORKER_MAX_REQUESTS_JITTER", str(HTTP_WORKER_MAX_REQUESTS // 10))
+)
+HTTP_WORKER_DRAIN_SECONDS = float(os.getenv("HTTP_WORKER_DRAIN_SECONDS", "10"))
+HTTP_GRACEFUL_TIMEOUT = int(os.getenv("HTTP_GRACEFUL_TIMEOUT", "30"))
+# Each worker writes its load to WORKER_STATUS_DIR every WORKER_STATUS_INTERVAL
+# seconds, for get_worker_stats; created by the supervisor when unset.
+WORKER_STATUS_DIR = os.getenv("WORKER_STATUS_DIR")
+WORKER_STATUS_INTERVAL = float(os.getenv("WORKER_STATUS_INTERVAL", "5"))
+
+# Per-tool metrics: latency percentiles cover each tool's last METRICS_WINDOW
+# calls. When METRICS_PROMETHEUS_FILE is set, the metrics are written there in
+# Prometheus text format every METRICS_DUMP_INTERVAL seconds.
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "1024"))
+METRICS_PROMETHEUS_FILE = os.getenv("METRICS_PROMETHEUS_FILE")
+METRICS_DUMP_INTERVAL = float(os.getenv("METRICS_DUMP_INTERVAL", "15"))
+
+# The engines are created on first use so importing the module never touches
+# the database drivers, and the sync mode never needs the async driver.
+engine = None
+async_engine = None
+replica_engine = None
+replica_async_engine = None
 
 # Create a declarative base class for your ORM models
 Base = declarative_base()
 
-# Create a session factory bound to the engine
-session_factory = sessionmaker(bind=engine)
+# Create a session factory; it is bound to the engine when the engine is created
+session_factory = sessionmaker()
 
 # Create a scoped session to handle thread-local sessions
 scoped_session_factory = scoped_session(session_factory)
@@ -63,7 +323,80 @@ scoped_session_factory = scoped_session(session_factory)
 # Optionally, specify the default schema here if you want all tables to use it
 metadata = MetaData(schema="app")
 
+# Seconds before the reflected schema in `metadata` is reloaded
+SCHEMA_CACHE_TTL = float(os.getenv("SCHEMA_CACHE_TTL", "300"))
+# A table name missing from the cache reloads it at most this often (seconds);
+# other unknown names are answered "not found" from the cache meanwhile
+SCHEMA_MISS_REFRESH_INTERVAL = float(os.getenv("SCHEMA_MISS_REFRESH_INTERVAL", "30"))
+
+
+def get_engine():
+    """Return the SQLAlchemy engine, creating it on first use."""
+    global engine
+    if engine is None:
+        engine = create_engine(DATABASE_URI, **SYNC_POOL_OPTIONS)
+        event.listen(engine, "connect", configure_prepared_statements)
+        event.listen(engine, "before_cursor_execute", count_prepared_statement)
+        event.listen(engine, "rollback", forget_prepared_statements)
+        event.listen(engine, "checkin", release_call_connection)
+        session_factory.configure(bind=engine)
+    return engine
+
+
+def get_async_engine():
+    """Return the async SQLAlchemy engine, creating it on first use."""
+    global async_engine
+    if async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        async_engine = create_async_engine(ASYNC_DATABASE_URI, **POOL_OPTIONS)
+        event.listen(async_engine.sync_engine, "connect", configure_prepared_statements)
+        event.listen(async_engine.sync_engine, "before_cursor_execute", count_prepared_statement)
+        event.listen(async_engine.sync_engine, "rollback", forget_prepared_statements)
+    return async_engine
+
+
+def get_replica_engine():
+    """Return the SQLAlchemy engine of the read replica, creating it on first use."""
+    global replica_engine
+    if replica_engine is None:
+        replica_engine = create_engine(DATABASE_REPLICA_URI, **SYNC_POOL_OPTIONS)
+        event.listen(replica_engine, "connect", configure_prepared_statements)
+        event.listen(replica_engine, "before_cursor_execute", count_prepared_statement)
+        event.listen(replica_engine, "rollback", forget_prepared_statements)
+        event.listen(replica_engine, "checkin", release_call_connection)
+        event.listen(replica_engine, "handle_error", note_replica_error)
+    return replica_engine
+
+
+def get_replica_async_engine():
+    """Return the async SQLAlchemy engine of the read replica, creating it on first use."""
+    global replica_async_engine
+    if replica_async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        replica_async_engine = create_async_engine(
+            make_url(DATABASE_REPLICA_URI).set(drivername=f"postgresql+{ASYNC_DB_DRIVER}"), **POOL_OPTIONS
+        )
+        event.listen(replica_async_engine.sync_engine, "connect", configure_prepared_statements)
+        event.listen(replica_async_engine.sync_engine, "before_cursor_execute", count_prepared_statement)
+        event.listen(replica_async_engine.sync_engine, "rollback", forget_prepared_statements)
+        event.listen(replica_async_engine.sync_engine, "handle_error", note_replica_error)
+    return replica_async_engine
+
 # --- JSON Serialization Helper ---
+try:
+    import orjson
+except ImportError:  # Optional: responses fall back to the json module
+    orjson = None
+
+# "auto" serializes responses with orjson when it is installed, "json" always
+# uses the standard library
+JSON_SERIALIZER = os.getenv("JSON_SERIALIZER", "auto").lower()
+# Indented responses are easier to read but 30-40% larger; compact by default
+JSON_PRETTY = os.getenv("JSON_PRETTY", "false").lower() == "true"
+
+
 def json_serializer(obj):
     """JSON serializer for objects not serializable by default json code"""
     if isinstance(obj, (datetime, date)):
@@ -72,17 +405,532 @@ def json_serializer(obj):
         return float(obj)
     raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
 
+
+def dumps_json(obj, pretty: bool = False) -> str:
+    """Serializes a tool response to JSON text, compact unless `pretty` is set.
+
+    orjson encodes datetimes and dates natively, so only Decimal values reach
+    json_serializer; the json module fallback calls it for all three.
+    """
+    if orjson is not None and JSON_SERIALIZER != "json":
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(obj, default=json_serializer, option=option).decode()
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=json_serializer)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=json_serializer)
+
+class NDJSONChunks(list):
+    """NDJSON text chunks produced by a streaming tool.
+
+    call_mcp_tool sends each chunk as its own TextContent block instead of
+    serialising the response as a single JSON document. `rows` is the number
+    of record lines, not counting any header line.
+    """
+
+    rows = 0
+
+
+# Values of the read tools' `format` argument
+RESPONSE_FORMATS = ("rows", "columnar", "ndjson")
+# Records per TextContent block in the ndjson format
+NDJSON_CHUNK_SIZE = 1000
+# The MCP response is sent as one message, so a streaming query_db_table
+# call stops reading after this many rows or bytes of NDJSON and reports the
+# result as truncated
+STREAM_MAX_ROWS = int(os.getenv("STREAM_MAX_ROWS", "100000"))
+STREAM_MAX_BYTES = int(os.getenv("STREAM_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def to_columnar(records: list[dict]) -> dict:
+    """Converts records to {column: [value, ...]}, naming each column once."""
+    if not records:
+        return {}
+    return {
+        column: list(values)
+        for column, values in zip(records[0], zip(*(record.values() for record in records)))
+    }
+
+
+def to_ndjson(records: list[dict], header: Optional[dict] = None) -> NDJSONChunks:
+    """Converts records to NDJSON blocks of NDJSON_CHUNK_SIZE lines, after an optional header line."""
+    lines = [dumps_json(header)] if header is not None else []
+    lines.extend(dumps_json(record) for record in records)
+    chunks = NDJSONChunks(
+        "".join(line + "\n" for line in lines[start:start + NDJSON_CHUNK_SIZE])
+        for start in range(0, len(lines), NDJSON_CHUNK_SIZE)
+    ) or NDJSONChunks([""])
+    chunks.rows = len(records)
+    return chunks
+
+
+def format_records(response: dict, records_key: str, format: str):
+    """Applies a read tool's `format` argument to its response.
+
+    'rows' returns the response as is. 'columnar' replaces response[records_key]
+    with per-column arrays. 'ndjson' returns NDJSON text: a header line with the
+    response's other keys, then one line per record.
+    """
+    if format not in RESPONSE_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(RESPONSE_FORMATS)}.")
+    if format == "columnar":
+        return {**response, records_key: to_columnar(response[records_key])}
+    if format == "ndjson":
+        header = {key: value for key, value in response.items() if key != records_key}
+        return to_ndjson(response[records_key], header)
+    return response
+
+
+# --- Pagination Helpers ---
+
+# Page size used by the paginated read tools when no limit is given, and the
+# largest page a caller may request
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+
+
+def encode_cursor(tool_name: str, values: list) -> str:
+    """Encodes the sort-key values of a page's last row as an opaque cursor."""
+    payload = json.dumps({"tool": tool_name, "after": values}, default=json_serializer)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(tool_name: str, cursor: str) -> list:
+    """Decodes a cursor produced by encode_cursor for the same tool."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor.")
+    if not isinstance(payload, dict) or payload.get("tool") != tool_name:
+        raise ValueError(f"Cursor was not issued by '{tool_name}'.")
+    return payload["after"]
+
+
+def _order_by(sort_keys: list) -> str:
+    """The ORDER BY list for `sort_keys`: NULLs sort as the largest value, PostgreSQL's default."""
+    return ", ".join(
+        f"{column} {direction} {'NULLS FIRST' if direction == 'DESC' else 'NULLS LAST'}"
+        for column, _, direction in sort_keys
+    )
+
+
+def _keyset_condition(sort_keys: list, values: list, params: dict) -> str:
+    """Builds a WHERE condition selecting rows that sort after `values` in _order_by(sort_keys).
+
+    Sort keys may be NULL (e.g. a student's section, or a name from a LEFT JOIN).
+    A comparison with NULL is never true, so a row comparison would drop those
+    rows; each key is compared with IS NULL / IS NOT NULL where NULLs are involved.
+    """
+    alternatives = []
+    equal_terms = []
+    for index, ((column, _, direction), value) in enumerate(zip(sort_keys, values)):
+        if value is None:
+            # Only non-NULL values follow a NULL in descending order, nothing in ascending
+            after = f"{column} IS NOT NULL" if direction == "DESC" else None
+            equal = f"{column} IS NULL"
+        else:
+            params[f"cursor_{index}"] = value
+            if direction == "DESC":
+                after = f"{column} < :cursor_{index}"
+            else:
+                after = f"({column} > :cursor_{index} OR {column} IS NULL)"
+            equal = f"{column} = :cursor_{index}"
+        if after is not None:
+            alternatives.append("(" + " AND ".join(equal_terms + [after]) + ")")
+        equal_terms.append(equal)
+    return "(" + " OR ".join(alternatives) + ")" if alternatives else "FALSE"
+
+
+def fetch_page(
+    conn,
+    query: str,
+    conditions: list,
+    params: dict,
+    sort_keys: list,
+    tool_name: str,
+    limit: Optional[int],
+    cursor: Optional[str],
+) -> tuple:
+    """Runs a read query one keyset page at a time.
+
+    Args:
+        conn: The database connection.
+        query: The SELECT ... FROM ... part of the query, without WHERE or ORDER BY.
+        conditions: WHERE conditions already built by the tool.
+        params: Bind parameters for `conditions`.
+        sort_keys: (column expression, result key, 'ASC' | 'DESC') tuples defining
+                   the ORDER BY; the last key must be unique.
+        tool_name: Name of the tool, embedded in the cursor.
+        limit: Maximum rows to return (defaults to DEFAULT_PAGE_SIZE).
+        cursor: Cursor returned with the previous page, if any.
+
+    Returns:
+        tuple: (records, next_cursor); next_cursor is None on the last page.
+    """
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be a positive integer.")
+    page_size = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+
+    conditions = list(conditions)
+    if cursor:
+        conditions.append(_keyset_condition(sort_keys, decode_cursor(tool_name, cursor), params))
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY " + _order_by(sort_keys)
+    query += " LIMIT :page_limit"
+    params["page_limit"] = page_size + 1
+
+    result = conn.execute(cached_statement(tool_name, query), params)
+    columns = result.keys()
+    records = [dict(zip(columns, row)) for row in result.fetchall()]
+
+    next_cursor = None
+    if len(records) > page_size:
+        records = records[:page_size]
+        next_cursor = encode_cursor(tool_name, [records[-1][key] for _, key, _ in sort_keys])
+    return records, next_cursor
+
+
 # --- Database Utility Functions ---
 
 
+# Connection owned by the async execution path (or any other caller managing
+# the connection lifecycle) for the tool currently running in this context.
+_bound_connection = contextvars.ContextVar("bound_connection", default=None)
+
+
+class BorrowedConnection:
+    """Proxy for a connection whose lifecycle is managed by the caller.
+
+    Tools close their connection when done; closing a borrowed connection is a
+    no-op so the owner can keep using it and return it to its pool.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def close(self):
+        pass
+
+
+# Checkout wait times per engine ("sync", "async", "replica", "replica_async"),
+# reported by get_pool_stats
+pool_checkout_stats = {}
+
+
+def _record_pool_checkout(engine_name: str, wait: float):
+    """Adds one connection checkout's wait time to pool_checkout_stats."""
+    stats = pool_checkout_stats.setdefault(engine_name, {
+        "checkouts": 0,
+        "wait_ms_total": 0.0,
+        "wait_ms_max": 0.0,
+    })
+    stats["checkouts"] += 1
+    stats["wait_ms_total"] += wait * 1000
+    stats["wait_ms_max"] = max(stats["wait_ms_max"], wait * 1000)
+
+
 def get_db_connection():
     """Get a connection to Google Cloud SQL PostgreSQL database using SQLAlchemy."""
+    bound_connection = _bound_connection.get()
+    if bound_connection is not None:
+        return BorrowedConnection(bound_connection)
     try:
-        connection = engine.connect()
-        return connection
+        started_at = time.perf_counter()
+        connection, engine_name = connect_for_call()
+        checkout_wait = time.perf_counter() - started_at
+        _record_pool_checkout(engine_name, checkout_wait)
+        add_queue_wait(checkout_wait)
     except Exception as e:
         logging.error(f"Error connecting to Google Cloud SQL PostgreSQL: {e}")
         raise
+    call_connections = _call_connections.get()
+    if call_connections is not None:
+        call_connections.add(connection)
+    if _autocommit_call.get():
+        connection.execution_options(isolation_level="AUTOCOMMIT")
+    try:
+        apply_statement_timeout(connection)
+    except Exception:
+        connection.close()
+        raise
+    return connection
+
+
+def unwrap_connection(conn):
+    """Returns the SQLAlchemy connection behind a possibly borrowed connection."""
+    if isinstance(conn, BorrowedConnection):
+        return conn._connection
+    return conn
+
+
+# --- Statement Timeouts and Cancellation ---
+
+# statement_timeout of the tool call running in this context, in seconds
+_statement_timeout = contextvars.ContextVar("statement_timeout", default=None)
+
+# PostgreSQL's message for a statement that ran past statement_timeout
+STATEMENT_TIMEOUT_MESSAGE = "canceling statement due to statement timeout"
+
+
+def statement_timeout_for(tool_name: str) -> float:
+    return TOOL_STATEMENT_TIMEOUTS.get(tool_name, DB_STATEMENT_TIMEOUT)
+
+
+def apply_statement_timeout(conn, timeout: Optional[float] = None):
+    """Sets the current call's statement_timeout (or `timeout`) on a connection it has just checked out.
+
+    The SET is committed, so the tool's own rollbacks keep it, and is sent only
+    when the pooled connection has a different timeout from its previous call.
+    """
+    if timeout is None:
+        timeout = _statement_timeout.get()
+    if timeout is None or conn.info.get("statement_timeout") == timeout:
+        return
+    conn.execute(text(f"SET statement_timeout = {int(timeout * 1000)}"))
+    conn.commit()
+    conn.info["statement_timeout"] = timeout
+
+
+class CallConnections:
+    """The connections a tool call on a worker thread has checked out, so it can be cancelled.
+
+    A connection is tracked until it is back in its pool (release_call_connection),
+    so a cancel never reaches a later call that reuses it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = set()
+        self.cancelled = False
+
+    def add(self, connection):
+        with self.lock:
+            if self.cancelled:
+                connection.close()
+                raise RuntimeError("The tool call was cancelled by the client.")
+            self.connections.add(connection.connection.dbapi_connection)
+            connection.info["call_connections"] = self
+
+    def discard(self, dbapi_connection):
+        with self.lock:
+            self.connections.discard(dbapi_connection)
+
+    def cancel(self):
+        """Asks the server to cancel the queries running on the call's connections."""
+        with self.lock:
+            self.cancelled = True
+            for dbapi_connection in self.connections:
+                try:
+                    # psycopg 3's cancel_safe() has a timeout and honours the connection's sslmode
+                    getattr(dbapi_connection, "cancel_safe", dbapi_connection.cancel)()
+                except Exception as e:
+                    logging.warning(f"Cancelling a query failed: {e}")
+
+
+# CallConnections of the tool call running in this context, in the threadpool mode
+_call_connections = contextvars.ContextVar("call_connections", default=None)
+
+
+def release_call_connection(dbapi_connection, connection_record):
+    """Pool "checkin" hook: stops tracking a connection for cancellation once its call returns it."""
+    call_connections = connection_record.info.pop("call_connections", None)
+    if call_connections is not None:
+        call_connections.discard(dbapi_connection)
+
+
+# --- Prepared Statement Cache ---
+
+# Per-tool executions that reused a server-side prepared statement (hits) or
+# were parsed and planned from scratch (misses)
+statement_cache_stats = {}
+
+# Whether the tool call running in this context uses its connections in
+# autocommit mode (see AUTOCOMMIT_TOOLS)
+_autocommit_call = contextvars.ContextVar("autocommit_call", default=False)
+
+# Statements after which psycopg 3 deallocates every prepared statement of the connection
+_CLEARS_PREPARED_STATEMENTS = re.compile(
+    r"(?:^|;)\s*(?:DROP|ALTER|ROLLBACK|DISCARD ALL|DEALLOCATE ALL)\b", re.IGNORECASE
+)
+
+
+class PreparedStatementMirror:
+    """Mirrors a psycopg 3 connection's prepared statement bookkeeping to tell hits from misses.
+
+    Like the driver, it counts executions of every statement not yet prepared,
+    and prepares a statement once it has run PREPARE_THRESHOLD times (at once
+    for executemany). Each list is evicted least recently used first beyond
+    PREPARED_STATEMENTS_MAX entries when a new statement is added, and both
+    are cleared by a rollback or DDL. The driver also keys on parameter types
+    and forgets a statement whose first execution fails, which is not mirrored.
+    """
+
+    def __init__(self):
+        self.counts = collections.OrderedDict()
+        self.prepared = collections.OrderedDict()
+
+    def execute(self, statement: str, prepare: bool = False) -> bool:
+        """Records one execution of `statement`; returns whether it reused a prepared statement."""
+        if statement in self.prepared:
+            self.prepared.move_to_end(statement)
+            return True
+        should_prepare = prepare or self.counts.get(statement, 0) >= PREPARE_THRESHOLD
+        if statement in self.counts:
+            if should_prepare:
+                del self.counts[statement]
+                self.prepared[statement] = True
+            else:
+                self.counts[statement] += 1
+                self.counts.move_to_end(statement)
+            return False
+        if should_prepare:
+            self.prepared[statement] = True
+        else:
+            self.counts[statement] = 1
+        if len(self.counts) > PREPARED_STATEMENTS_MAX:
+            self.counts.popitem(last=False)
+        if len(self.prepared) > PREPARED_STATEMENTS_MAX:
+            self.prepared.popitem(last=False)
+        return False
+
+    def clear(self):
+        self.counts.clear()
+        self.prepared.clear()
+
+
+def configure_prepared_statements(dbapi_connection, connection_record):
+    """Pool "connect" hook: enables server-side prepared statements on psycopg 3 connections."""
+    driver_connection = connection_record.driver_connection
+    if PREPARE_THRESHOLD is not None and hasattr(driver_connection, "prepare_threshold"):
+        driver_connection.prepare_threshold = PREPARE_THRESHOLD
+        driver_connection.prepared_max = PREPARED_STATEMENTS_MAX
+        connection_record.info["prepared_statements"] = PreparedStatementMirror()
+
+
+def count_prepared_statement(conn, cursor, statement, parameters, context, executemany):
+    """Engine "before_cursor_execute" hook: follows a statement through its
+    connection's mirror and counts a hit or miss for a fixed-shape tool query."""
+    prepared_statements = conn.info.get("prepared_statements")
+    hit = prepared_statements is not None and prepared_statements.execute(statement, prepare=executemany)
+    if prepared_statements is not None and _CLEARS_PREPARED_STATEMENTS.search(statement):
+        prepared_statements.clear()
+
+    tool_name = context.execution_options.get("statement_tool") if context is not None else None
+    if tool_name is not None:
+        stats = statement_cache_stats.setdefault(tool_name, {"hits": 0, "misses": 0})
+        stats["hits" if hit else "misses"] += 1
+
+
+def forget_prepared_statements(conn):
+    """Engine "rollback" hook: psycopg 3 deallocates a connection's prepared
+    statements when it rolls back an open transaction, so its mirror starts over."""
+    if conn.invalidated:
+        return
+    prepared_statements = conn.info.get("prepared_statements")
+    if prepared_statements is None:
+        return
+    from psycopg.pq import TransactionStatus
+
+    if conn.connection.driver_connection.info.transaction_status != TransactionStatus.IDLE:
+        prepared_statements.clear()
+
+
+@functools.lru_cache(maxsize=PREPARED_STATEMENTS_MAX)
+def cached_statement(tool_name: str, query: str):
+    """Returns the text() clause of a fixed-shape tool query, counted in
+    statement_cache_stats under `tool_name` when it runs.
+
+    The clauses of the most recently used queries are kept for reuse.
+    """
+    return text(query).execution_options(statement_tool=tool_name)
+
+
+def get_statement_cache_stats(dummy_param: str) -> dict:
+    """Reports prepared-statement hits and misses per tool.
+
+    Args:
+        dummy_param (str): This parameter is not used by the function
+                           but helps ensure schema generation. A non-empty string is expected.
+    Returns:
+        dict: A dictionary with keys 'success' (bool), 'message' (str), 'settings' (dict),
+              'cached_statements' (int) and 'tools' (dict) with per-tool hits, misses and hit rate.
+    """
+    tools = {
+        tool_name: {
+            **stats,
+            "hit_rate": round(stats["hits"] / (stats["hits"] + stats["misses"]), 3),
+        }
+        for tool_name, stats in statement_cache_stats.items()
+    }
+    return {
+        "success": True,
+        "message": f"Prepared statement statistics for {len(tools)} tools.",
+        "settings": {
+            "prepare_threshold": PREPARE_THRESHOLD,
+            "prepared_statements_max": PREPARED_STATEMENTS_MAX,
+        },
+        "cached_statements": cached_statement.cache_info().currsize,
+        "tools": tools,
+    }
+
+
+# --- Schema Cache ---
+
+_schema_cache_lock = threading.Lock()
+# {table_name: [{"name": column_name, "type": column_type}, ...]} built from
+# `metadata`; both are replaced as a whole on every refresh
+_schema_tables = None
+_schema_loaded_at = 0.0
+# When an unknown table name last reloaded the cache
+_schema_miss_refreshed_at = float("-inf")
+
+
+def refresh_schema_cache(conn) -> dict:
+    """Reflects the app schema into a new `metadata` and swaps in the rebuilt table lookup.
+
+    Reflection runs outside the lock: in the async mode it awaits the driver on
+    the event loop thread, and a second refresh blocking on the held lock there
+    would stall the loop for good.
+    """
+    global metadata, _schema_tables, _schema_loaded_at
+    reflected = MetaData(schema="app")
+    reflected.reflect(bind=unwrap_connection(conn), views=True)
+    tables = {
+        table.name: [{"name": column.name, "type": str(column.type)} for column in table.columns]
+        for table in reflected.tables.values()
+    }
+    with _schema_cache_lock:
+        metadata = reflected
+        _schema_tables = tables
+        _schema_loaded_at = time.monotonic()
+    return tables
+
+
+def get_schema_tables(force_refresh: bool = False) -> dict:
+    """Returns the cached table lookup, reflecting the schema if it is missing or expired."""
+    tables = _schema_tables
+    if force_refresh or tables is None or time.monotonic() - _schema_loaded_at > SCHEMA_CACHE_TTL:
+        conn = get_db_connection()
+        try:
+            tables = refresh_schema_cache(conn)
+        finally:
+            conn.close()
+    return tables
+
+
+def claim_schema_miss_refresh() -> bool:
+    """Whether an unknown table name may reload the schema now; at most one
+    caller per SCHEMA_MISS_REFRESH_INTERVAL, counted from the latest reload."""
+    global _schema_miss_refreshed_at
+    with _schema_cache_lock:
+        now = time.monotonic()
+        if now - max(_schema_loaded_at, _schema_miss_refreshed_at) < SCHEMA_MISS_REFRESH_INTERVAL:
+            return False
+        _schema_miss_refreshed_at = now
+        return True
 
 
 def list_db_tables(dummy_param: str) -> dict:
@@ -96,13 +944,7 @@ def list_db_tables(dummy_param: str) -> dict:
               and 'tables' (list[str]) containing the table names if successful.
     """
     try:
-        conn = get_db_connection()
-        result = conn.execute(text(
-            "SELECT table_name FROM information_schema.tables "
-            "WHERE table_schema = 'app';"
-        ))
-        tables = [row[0] for row in result.fetchall()]
-        conn.close()
+        tables = list(get_schema_tables())
         return {
             "success": True,
             "message": "Tables listed successfully.",
@@ -114,45 +956,87 @@ def list_db_tables(dummy_param: str) -> dict:
 
 def get_table_schema(table_name: str) -> dict:
     """Gets the schema (column names and types) of a specific table."""
-    conn = get_db_connection()
+    tables = get_schema_tables()
+    if table_name not in tables and claim_schema_miss_refresh():
+        # The table may have been created since the schema was last reflected
+        tables = get_schema_tables(force_refresh=True)
+    if table_name not in tables:
+        raise ValueError(f"Table '{table_name}' not found or no schema information.")
+
+    return {"table_name": table_name, "columns": tables[table_name]}
+
+
+def refresh_schema(dummy_param: str) -> dict:
+    """Reloads the cached database schema used by list_db_tables and get_table_schema.
+
+    Args:
+        dummy_param (str): This parameter is not used by the function
+                           but helps ensure schema generation. A non-empty string is expected.
+    Returns:
+        dict: A dictionary with keys 'success' (bool), 'message' (str),
+              and 'tables' (list[str]) containing the table names if successful.
+    """
     try:
-        result = conn.execute(text("""
-            SELECT column_name, data_type 
-            FROM information_schema.columns 
-            WHERE table_name = :table_name AND table_schema = 'app'
-            ORDER BY ordinal_position;
-        """), {"table_name": table_name})
-        schema_info = result.fetchall()
-        
-        if not schema_info:
-            raise ValueError(f"Table '{table_name}' not found or no schema information.")
-
-        columns = [{"name": row[0], "type": row[1]} for row in schema_info]
-        return {"table_name": table_name, "columns": columns}
-    finally:
-        conn.close()
+        tables = list(get_schema_tables(force_refresh=True))
+        return {
+            "success": True,
+            "message": f"Schema refreshed: {len(tables)} tables reflected.",
+            "tables": tables,
+        }
+    except Exception as e:
+        return {"success": False, "message": f"Error refreshing schema: {e}", "tables": []}
 
 
-def query_db_table(table_name: str, columns: str, condition: str) -> list[dict]:
+def query_db_table(
+    table_name: str,
+    columns: str,
+    condition: str,
+    stream: bool = False,
+    chunk_size: int = 1000,
+    format: str = "rows"
+) -> list[dict]:
     """Queries a table with an optional condition.
 
     Args:
         table_name: The name of the table to query.
         columns: Comma-separated list of columns to retrieve (e.g., "id, name"). Defaults to "*".
         condition: Optional SQL WHERE clause condition (e.g., "id = 1" or "completed = 0").
+        stream: If true, rows are read through a server-side cursor and returned as
+                NDJSON (one JSON object per line) in blocks of chunk_size rows. Use for large scans.
+                The first line reports 'rows' and whether the output was 'truncated' at the
+                server's row or size limit; narrow the condition to read the rest.
+        chunk_size: Rows fetched and emitted per block in streaming mode. Defaults to 1000.
+        format: 'rows' (a list of dictionaries, the default), 'columnar' (a dictionary of
+                one array per column) or 'ndjson' (one JSON object per line). Streaming
+                always returns NDJSON and only accepts the default.
     Returns:
-        A list of dictionaries, where each dictionary represents a row.
+        A list of dictionaries, where each dictionary represents a row, a dictionary
+        of column arrays in columnar format, or NDJSON text blocks.
     """
+    if format not in RESPONSE_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(RESPONSE_FORMATS)}.")
+    if stream and format != "rows":
+        raise ValueError("format cannot be used with stream, which always returns NDJSON.")
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer.")
+
     conn = get_db_connection()
     try:
         query = f"SELECT {columns} FROM app.{table_name}"
         if condition:
             query += f" WHERE {condition}"
         
+        if stream:
+            return _stream_ndjson(conn, query, chunk_size)
+        
         result = conn.execute(text(query))
         # Convert result to list of dictionaries
         columns_list = result.keys()
         results = [dict(zip(columns_list, row)) for row in result.fetchall()]
+        if format == "columnar":
+            return to_columnar(results)
+        if format == "ndjson":
+            return to_ndjson(results)
         return results
     except Exception as e:
         raise ValueError(f"Error querying table '{table_name}': {e}")
@@ -160,6 +1044,50 @@ def query_db_table(table_name: str, columns: str, condition: str) -> list[dict]:
         conn.close()
 
 
+def _stream_ndjson(conn, query: str, chunk_size: int) -> NDJSONChunks:
+    """Runs `query` on a server-side cursor, converting one chunk of rows at a time to NDJSON.
+
+    Reading stops at STREAM_MAX_ROWS rows or STREAM_MAX_BYTES of NDJSON. A
+    header line placed before the records says how many were read and
+    whether the result was truncated.
+    """
+    result = conn.execute(
+        text(query), execution_options={"stream_results": True, "yield_per": chunk_size}
+    )
+    columns_list = list(result.keys())
+    chunks = NDJSONChunks()
+    response_bytes = 0
+    truncated = False
+    for partition in result.partitions(chunk_size):
+        if chunks.rows >= STREAM_MAX_ROWS or response_bytes >= STREAM_MAX_BYTES:
+            truncated = True
+            break
+        if len(partition) > STREAM_MAX_ROWS - chunks.rows:
+            partition = partition[:STREAM_MAX_ROWS - chunks.rows]
+            truncated = True
+        chunk = "".join(
+            dumps_json(dict(zip(columns_list, row))) + "\n"
+            for row in partition
+        )
+        chunks.append(chunk)
+        chunks.rows += len(partition)
+        response_bytes += len(chunk.encode())
+        if truncated:
+            break
+    # Closes the server-side cursor without reading the rows left behind
+    result.close()
+
+    message = f"Streamed {chunks.rows} row(s)."
+    if truncated:
+        message += (
+            f" Stopped at the limit of {STREAM_MAX_ROWS} rows or {STREAM_MAX_BYTES} bytes;"
+            " narrow the condition to read the rest."
+        )
+    header = {"success": True, "message": message, "rows": chunks.rows, "truncated": truncated}
+    chunks.insert(0, dumps_json(header) + "\n")
+    return chunks
+
+
 def insert_data(table_name: str, data: dict) -> dict:
     """Inserts a new row of data into the specified table.
 
@@ -201,17 +1129,225 @@ def insert_data(table_name: str, data: dict) -> dict:
         conn.close()
 
 
-def delete_data(table_name: str, condition: str) -> dict:
-    """Deletes rows from a table based on a given SQL WHERE clause condition.
+@contextlib.contextmanager
+def _open_bulk_source(rows: Optional[list[dict]], file_path: Optional[str]):
+    """Yields an iterator of (columns, values) pairs for rows given inline or read lazily from a file.
+
+    Each row carries its own columns, so a column a row leaves out gets the
+    table default rather than NULL. CSV files must have a header row; empty
+    CSV fields load as NULL. Any other file is read as NDJSON.
+    """
+    if rows is not None:
+        yield ((tuple(row), tuple(row.values())) for row in rows)
+        return
+
+    if file_path.lower().endswith(".csv"):
+        with open(file_path, newline="") as source_file:
+            reader = csv.reader(source_file)
+            columns = tuple(next(reader, ()))
+            yield (
+                (columns, tuple(value if value != "" else None for value in record))
+                for record in reader if record
+            )
+        return
+
+    with open(file_path) as source_file:
+        objects = (json.loads(line) for line in source_file if line.strip())
+        yield ((tuple(obj), tuple(obj.values())) for obj in objects)
+
+
+def _group_by_columns(chunk: list) -> dict:
+    """Groups a chunk's (columns, values) pairs into {columns: [values, ...]}, keeping first-seen order."""
+    groups = {}
+    for columns, values in chunk:
+        groups.setdefault(columns, []).append(values)
+    return groups
+
+
+def _copy_text_value(value) -> str:
+    """Formats one value for PostgreSQL's COPY text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, default=json_serializer)
+    elif isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    return (
+        str(value).replace("\\", "\\\\").replace("\t", "\\t")
+        .replace("\n", "\\n").replace("\r", "\\r")
+    )
+
+
+async def _copy_rows_async(driver_connection, copy_sql: str, chunk: list):
+    """Writes a chunk through COPY on an async psycopg connection."""
+    async with driver_connection.cursor() as cursor:
+        async with cursor.copy(copy_sql) as copy:
+            for values in chunk:
+                await copy.write_row(values)
+
+
+def copy_chunk(conn, table_name: str, columns: list, chunk: list):
+    """Loads a chunk of value tuples with COPY ... FROM STDIN on the connection's driver.
+
+    Raises NotImplementedError for drivers without COPY support.
+    """
+    driver_connection = unwrap_connection(conn).connection.driver_connection
+    copy_sql = f"COPY app.{table_name} ({', '.join(columns)}) FROM STDIN"
+    driver_module = type(driver_connection).__module__
+
+    if driver_module.startswith("psycopg2"):
+        buffer = io.StringIO("".join(
+            "\t".join(_copy_text_value(value) for value in values) + "\n" for values in chunk
+        ))
+        with driver_connection.cursor() as cursor:
+            cursor.copy_expert(copy_sql, buffer)
+    elif driver_module.startswith("psycopg"):
+        import psycopg
+
+        if isinstance(driver_connection, psycopg.AsyncConnection):
+            # Running on the async engine inside run_sync: await the driver in place
+            await_only(_copy_rows_async(driver_connection, copy_sql, chunk))
+        else:
+            with driver_connection.cursor() as cursor:
+                with cursor.copy(copy_sql) as copy:
+                    for values in chunk:
+                        copy.write_row(values)
+    else:
+        raise NotImplementedError(f"COPY is not supported for driver '{driver_module}'.")
+
+
+def insert_chunk(conn, table_name: str, columns: list, chunk: list):
+    """Loads a chunk of value tuples with a multi-row executemany INSERT."""
+    placeholders = ", ".join(f":{column}" for column in columns)
+    query = f"INSERT INTO app.{table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+    conn.execute(text(query), [dict(zip(columns, values)) for values in chunk])
+
+
+def bulk_insert_data(
+    table_name: str,
+    rows: Optional[list[dict]] = None,
+    file_path: Optional[str] = None,
+    chunk_size: int = 5000,
+    method: str = "copy"
+) -> dict:
+    """Bulk-loads many rows into a table, e.g. a term's grades or a new intake of students.
+
+    Rows are loaded in chunks of chunk_size, each committed separately; a chunk
+    that fails is rolled back and reported while the remaining chunks still load.
+    Inside a transactional batch the first failure rolls back the whole load
+    and stops it. Rows may name different columns; columns a row leaves out get
+    their table defaults.
 
     Args:
-        table_name (str): The name of the table to delete data from.
-        condition (str): The SQL WHERE clause condition to specify which rows to delete.
-                         This condition MUST NOT be empty to prevent accidental mass deletion.
+        table_name (str): The name of the table to load into.
+        rows (list[dict], optional): Rows to insert, as dictionaries of column name to value.
+        file_path (str, optional): Path to a local file to load instead of rows: a CSV file
+                                   with a header row, or an NDJSON file (one JSON object per line).
+        chunk_size (int): Rows per chunk. Defaults to 5000.
+        method (str): 'copy' to load through PostgreSQL COPY (falls back to 'insert' if the
+                      database driver does not support COPY) or 'insert' for multi-row
+                      INSERT statements. Defaults to 'copy'.
 
     Returns:
-        dict: A dictionary with keys 'success' (bool) and 'message' (str).
-              If successful, 'message' includes the count of deleted rows.
+        dict: A dictionary with keys 'success' (bool, true if every chunk loaded), 'message' (str),
+              'rows_loaded' (int), 'rows_failed' (int), 'chunks' (int), 'method' (str),
+              'rows_per_second' (float), and 'errors' (list[dict]) describing each failed chunk.
+    """
+    if (rows is None) == (file_path is None):
+        return {"success": False, "message": "Provide exactly one of rows or file_path."}
+    if chunk_size < 1:
+        return {"success": False, "message": "chunk_size must be a positive integer."}
+    if method not in ("copy", "insert"):
+        return {"success": False, "message": "method must be 'copy' or 'insert'."}
+
+    loader = copy_chunk if method == "copy" else insert_chunk
+    rows_loaded = 0
+    rows_failed = 0
+    chunk_count = 0
+    errors = []
+    started_at = time.perf_counter()
+
+    conn = get_db_connection()
+    # Chunk commits are deferred to the end of a transactional batch, so a
+    # failed chunk rolls back every chunk loaded before it
+    in_transaction_batch = isinstance(unwrap_connection(conn), TransactionConnection)
+    try:
+        with _open_bulk_source(rows, file_path) as row_iter:
+            while True:
+                chunk = list(itertools.islice(row_iter, chunk_size))
+                if not chunk:
+                    break
+                try:
+                    if not conn.in_transaction():
+                        conn.begin()
+                    for columns, values in _group_by_columns(chunk).items():
+                        try:
+                            loader(conn, table_name, list(columns), values)
+                        except NotImplementedError:
+                            loader = insert_chunk
+                            loader(conn, table_name, list(columns), values)
+                    conn.commit()
+                    rows_loaded += len(chunk)
+                except Exception as e:
+                    conn.rollback()
+                    errors.append({
+                        "chunk": chunk_count,
+                        "first_row": chunk_count * chunk_size,
+                        "rows": len(chunk),
+                        "error": str(e)[:500],
+                    })
+                    chunk_count += 1
+                    if in_transaction_batch:
+                        rows_failed += rows_loaded + len(chunk)
+                        rows_loaded = 0
+                        break
+                    rows_failed += len(chunk)
+                    continue
+                chunk_count += 1
+    except Exception as e:
+        conn.rollback()
+        return {
+            "success": False,
+            "message": f"Error bulk loading data into table '{table_name}': {e}",
+            "rows_loaded": rows_loaded,
+            "errors": errors,
+        }
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - started_at
+    rows_per_second = round(rows_loaded / elapsed, 1) if elapsed > 0 else 0.0
+    if chunk_count == 0:
+        message = f"No rows to load into table '{table_name}'."
+    elif in_transaction_batch and errors:
+        message = (f"Load into table '{table_name}' rolled back at chunk {errors[0]['chunk']}; "
+                   f"no rows loaded, {rows_failed} row(s) failed.")
+    else:
+        message = (f"Loaded {rows_loaded} row(s) into table '{table_name}' in {chunk_count} chunk(s) "
+                   f"({rows_per_second} rows/s); {rows_failed} row(s) failed.")
+    return {
+        "success": not errors,
+        "message": message,
+        "rows_loaded": rows_loaded,
+        "rows_failed": rows_failed,
+        "chunks": chunk_count,
+        "method": "copy" if loader is copy_chunk else "insert",
+        "rows_per_second": rows_per_second,
+        "errors": errors,
+    }
+
+
+def delete_data(table_name: str, condition: str) -> dict:
+    """Deletes rows from a table based on a given SQL WHERE clause condition.
+
+    Args:
+        table_name (str): The name of the table to delete data from.
+        condition (str): The SQL WHERE clause condition to specify which rows to delete.
+                         This condition MUST NOT be empty to prevent accidental mass deletion.
+
+    Returns:
+        dict: A dictionary with keys 'success' (bool) and 'message' (str).
+              If successful, 'message' includes the count of deleted rows.
     """
     if not condition or not condition.strip():
         return {
@@ -241,17 +1377,29 @@ def delete_data(table_name: str, condition: str) -> dict:
         conn.close()
 
 
-def get_academic_records(student_id: Optional[int] = None, subject: Optional[str] = None, teacher_id: Optional[int] = None) -> dict:
+def get_academic_records(
+    student_id: Optional[int] = None,
+    subject: Optional[str] = None,
+    teacher_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    format: str = "rows"
+) -> dict:
     """Gets academic records with optional filtering by student_id, subject, or teacher_id.
 
     Args:
         student_id (int, optional): Filter by student ID.
         subject (str, optional): Filter by subject name.
         teacher_id (int, optional): Filter by teacher ID.
+        limit (int, optional): Maximum number of records to return (default 100).
+        cursor (str, optional): The 'next_cursor' returned by a previous call, to fetch the next page.
+        format (str): Response format: 'rows' (a list of records, the default), 'columnar'
+                      (one array per column) or 'ndjson' (a header line, then one line per record).
 
     Returns:
         dict: A dictionary with keys 'success' (bool), 'message' (str),
-              and 'records' (list[dict]) containing the academic records if successful.
+              'records' (list[dict]) containing the academic records if successful,
+              and 'next_cursor' (str) for the next page, or None on the last page.
     """
     conn = get_db_connection()
     try:
@@ -279,20 +1427,17 @@ def get_academic_records(student_id: Optional[int] = None, subject: Optional[str
             conditions.append("ar.teacher_id = :teacher_id")
             params["teacher_id"] = teacher_id
         
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-        
-        query += " ORDER BY ar.record_date DESC"
-        
-        result = conn.execute(text(query), params)
-        columns = result.keys()
-        records = [dict(zip(columns, row)) for row in result.fetchall()]
+        sort_keys = [("ar.record_date", "record_date", "DESC"), ("ar.id", "id", "DESC")]
+        records, next_cursor = fetch_page(
+            conn, query, conditions, params, sort_keys, "get_academic_records", limit, cursor
+        )
         
-        return {
+        return format_records({
             "success": True,
             "message": f"Retrieved {len(records)} academic records.",
             "records": records,
-        }
+            "next_cursor": next_cursor,
+        }, "records", format)
     except Exception as e:
         return {
             "success": False,
@@ -355,7 +1500,10 @@ def add_academic_record(student_id: int, subject: str, grade: str, record_date:
 def get_attendance_records(
     student_id: Optional[int] = None, 
     attendance_date: Optional[str] = None, 
-    status: Optional[str] = None
+    status: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    format: str = "rows"
 ) -> dict:
     """Gets attendance records with optional filtering by student_id, date, or status.
 
@@ -363,10 +1511,15 @@ def get_attendance_records(
         student_id (int, optional): Filter by student ID.
         attendance_date (str, optional): Filter by attendance date (YYYY-MM-DD format).
         status (str, optional): Filter by attendance status ('present', 'absent', 'late').
+        limit (int, optional): Maximum number of records to return (default 100).
+        cursor (str, optional): The 'next_cursor' returned by a previous call, to fetch the next page.
+        format (str): Response format: 'rows' (a list of records, the default), 'columnar'
+                      (one array per column) or 'ndjson' (a header line, then one line per record).
 
     Returns:
         dict: A dictionary with keys 'success' (bool), 'message' (str),
-              and 'records' (list[dict]) containing the attendance records if successful.
+              'records' (list[dict]) containing the attendance records if successful,
+              and 'next_cursor' (str) for the next page, or None on the last page.
     """
     conn = get_db_connection()
     try:
@@ -392,20 +1545,21 @@ def get_attendance_records(
             conditions.append("a.status = :status")
             params["status"] = status
         
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-        
-        query += " ORDER BY a.attendance_date DESC, s.student_name"
-        
-        result = conn.execute(text(query), params)
-        columns = result.keys()
-        records = [dict(zip(columns, row)) for row in result.fetchall()]
+        sort_keys = [
+            ("a.attendance_date", "attendance_date", "DESC"),
+            ("s.student_name", "student_name", "ASC"),
+            ("a.id", "id", "ASC"),
+        ]
+        records, next_cursor = fetch_page(
+            conn, query, conditions, params, sort_keys, "get_attendance_records", limit, cursor
+        )
         
-        return {
+        return format_records({
             "success": True,
             "message": f"Retrieved {len(records)} attendance records.",
             "records": records,
-        }
+            "next_cursor": next_cursor,
+        }, "records", format)
     except Exception as e:
         return {
             "success": False,
@@ -416,6 +1570,79 @@ def get_attendance_records(
         conn.close()
 
 
+# Inserts attendance rows from {source}, overwriting the status and notes of
+# rows that already exist for the same student and date. Requires a unique
+# index on app.attendance (student_id, attendance_date).
+ATTENDANCE_UPSERT = """
+    INSERT INTO app.attendance (student_id, attendance_date, status, notes)
+    {source}
+    ON CONFLICT (student_id, attendance_date)
+    DO UPDATE SET status = EXCLUDED.status, notes = EXCLUDED.notes
+    RETURNING id, student_id, (xmax = 0) AS inserted
+"""
+
+# The same write for databases without that unique index: rows that exist are
+# updated, the rest inserted. Concurrent marks for a new student and date can
+# both insert, so create the index where possible.
+ATTENDANCE_UPDATE_THEN_INSERT = """
+    WITH marks (student_id, attendance_date, status, notes) AS (
+        {source}
+    ),
+    updated AS (
+        UPDATE app.attendance a SET status = m.status, notes = m.notes
+        FROM marks m
+        WHERE a.student_id = m.student_id AND a.attendance_date = m.attendance_date
+        RETURNING a.id, a.student_id
+    ),
+    inserted AS (
+        INSERT INTO app.attendance (student_id, attendance_date, status, notes)
+        SELECT m.student_id, m.attendance_date, m.status, m.notes
+        FROM marks m
+        WHERE NOT EXISTS (SELECT 1 FROM updated u WHERE u.student_id = m.student_id)
+        RETURNING id, student_id
+    )
+    SELECT DISTINCT ON (student_id) id, student_id, false AS inserted FROM updated
+    UNION ALL
+    SELECT id, student_id, true AS inserted FROM inserted
+"""
+
+# Whether app.attendance has a unique index on (student_id, attendance_date);
+# checked on the first attendance write
+_attendance_unique_index = None
+
+
+def _has_attendance_unique_index(conn) -> bool:
+    """Returns whether ON CONFLICT can be used for attendance, checking the database once."""
+    global _attendance_unique_index
+    if _attendance_unique_index is None:
+        _attendance_unique_index = conn.execute(text("""
+            SELECT EXISTS (
+                SELECT 1
+                FROM pg_index i
+                WHERE i.indrelid = 'app.attendance'::regclass
+                  AND i.indisunique AND i.indisvalid
+                  AND i.indpred IS NULL AND i.indexprs IS NULL
+                  AND (SELECT array_agg(a.attname::text ORDER BY a.attname)
+                       FROM pg_attribute a
+                       WHERE a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey))
+                      = ARRAY['attendance_date', 'student_id']
+            )
+        """)).scalar()
+        if not _attendance_unique_index:
+            logging.warning(
+                "app.attendance has no unique index on (student_id, attendance_date); "
+                "attendance is marked with update-then-insert."
+            )
+    return _attendance_unique_index
+
+
+def attendance_upsert(conn, source: str) -> str:
+    """Returns the statement that marks attendance rows selected by source."""
+    if _has_attendance_unique_index(conn):
+        return ATTENDANCE_UPSERT.format(source=source)
+    return ATTENDANCE_UPDATE_THEN_INSERT.format(source=source)
+
+
 def mark_attendance(
     student_id: int, 
     attendance_date: str, 
@@ -436,76 +1663,359 @@ def mark_attendance(
     """
     conn = get_db_connection()
     try:
-        # Check if attendance already exists for this student and date
-        check_query = """
-            SELECT id FROM app.attendance 
-            WHERE student_id = :student_id AND attendance_date = :attendance_date
-        """
-        check_result = conn.execute(text(check_query), {
+        query = attendance_upsert(
+            conn, "VALUES (:student_id, CAST(:attendance_date AS DATE), :status, :notes)"
+        )
+        params = {
             "student_id": student_id,
-            "attendance_date": attendance_date
-        })
-        existing_record = check_result.fetchone()
-        
-        if existing_record:
-            # Update existing record
-            update_query = """
-                UPDATE app.attendance 
-                SET status = :status, notes = :notes
-                WHERE student_id = :student_id AND attendance_date = :attendance_date
-                RETURNING id
-            """
-            params = {
-                "student_id": student_id,
-                "attendance_date": attendance_date,
-                "status": status,
-                "notes": notes
-            }
-            result = conn.execute(text(update_query), params)
-            attendance_id = result.fetchone()[0]
-            conn.commit()
-            
+            "attendance_date": attendance_date,
+            "status": status,
+            "notes": notes
+        }
+        result = conn.execute(cached_statement("mark_attendance", query), params)
+        row = result.fetchone()
+        conn.commit()
+        
+        action = "marked" if row.inserted else "updated"
+        return {
+            "success": True,
+            "message": f"Attendance {action} successfully for student {student_id} on {attendance_date}.",
+            "attendance_id": row.id,
+        }
+    except Exception as e:
+        conn.rollback()
+        return {
+            "success": False,
+            "message": f"Error marking attendance: {e}",
+        }
+    finally:
+        conn.close()
+
+
+def mark_class_attendance(
+    attendance_date: str,
+    class_value: Optional[str] = None,
+    section: Optional[str] = None,
+    student_ids: Optional[list[int]] = None,
+    statuses: Optional[dict[str, str]] = None,
+    default_status: str = "present",
+    notes: Optional[dict[str, str]] = None
+) -> dict:
+    """Marks attendance for a whole class, or a list of students, on one date in a single statement.
+
+    Students are taken from the class (and optionally section) if class_value is
+    given, otherwise from student_ids, otherwise from the keys of statuses.
+
+    Args:
+        attendance_date (str): The date of attendance (YYYY-MM-DD format).
+        class_value (str, optional): Mark every student in this class.
+        section (str, optional): Restrict class_value to this section.
+        student_ids (list[int], optional): Mark these students. statuses and notes may only
+                                           name students in this list.
+        statuses (dict, optional): Status per student ID, e.g. {"12345": "absent", "12346": "late"}.
+                                   Students not listed get default_status.
+        default_status (str): Status for students not in statuses ('present', 'absent', 'late').
+                              Defaults to 'present'.
+        notes (dict, optional): Notes per student ID, e.g. {"12345": "Doctor's appointment"}.
+
+    Returns:
+        dict: A dictionary with keys 'success' (bool), 'message' (str),
+              'marked' (int) and 'updated' (int) counts, and 'unknown_student_ids'
+              (list[int]) for requested students that do not exist or, when
+              marking a class, are not in it.
+    """
+    statuses = {int(key): value for key, value in (statuses or {}).items()}
+    notes = {int(key): value for key, value in (notes or {}).items()}
+
+    if class_value is not None:
+        roster_condition = "s.class_value = :class_value"
+        params = {"class_value": class_value}
+        if section is not None:
+            roster_condition += " AND s.section = :section"
+            params["section"] = section
+        requested_ids = set(statuses) | set(notes)
+    else:
+        requested_ids = set(student_ids or statuses)
+        if not requested_ids:
             return {
-                "success": True,
-                "message": f"Attendance updated successfully for student {student_id} on {attendance_date}.",
-                "attendance_id": attendance_id,
-            }
-        else:
-            # Insert new record
-            insert_query = """
-                INSERT INTO app.attendance (student_id, attendance_date, status, notes)
-                VALUES (:student_id, :attendance_date, :status, :notes)
-                RETURNING id
-            """
-            params = {
-                "student_id": student_id,
-                "attendance_date": attendance_date,
-                "status": status,
-                "notes": notes
+                "success": False,
+                "message": "Provide class_value, student_ids or statuses to mark attendance.",
             }
-            result = conn.execute(text(insert_query), params)
-            attendance_id = result.fetchone()[0]
-            conn.commit()
-            
+        unlisted_ids = sorted((set(statuses) | set(notes)) - requested_ids)
+        if unlisted_ids:
             return {
-                "success": True,
-                "message": f"Attendance marked successfully for student {student_id} on {attendance_date}.",
-                "attendance_id": attendance_id,
+                "success": False,
+                "message": f"statuses and notes name students that are not being marked: {unlisted_ids}. "
+                           "Add them to student_ids or remove their entries.",
             }
+        roster_condition = "s.student_id = ANY(CAST(:roster_ids AS INTEGER[]))"
+        params = {"roster_ids": sorted(requested_ids)}
+
+    mark_ids = sorted(set(statuses) | set(notes))
+    params.update({
+        "attendance_date": attendance_date,
+        "default_status": default_status,
+        "mark_ids": mark_ids,
+        "mark_statuses": [statuses.get(student_id) for student_id in mark_ids],
+        "mark_notes": [notes.get(student_id) for student_id in mark_ids],
+    })
+    source = f"""
+        SELECT s.student_id, CAST(:attendance_date AS DATE),
+               COALESCE(m.status, :default_status), m.notes
+        FROM app.students s
+        LEFT JOIN unnest(
+            CAST(:mark_ids AS INTEGER[]), CAST(:mark_statuses AS TEXT[]), CAST(:mark_notes AS TEXT[])
+        ) AS m(student_id, status, notes) ON m.student_id = s.student_id
+        WHERE {roster_condition}
+    """
+
+    conn = get_db_connection()
+    try:
+        result = conn.execute(text(attendance_upsert(conn, source)), params)
+        rows = result.fetchall()
+        conn.commit()
+        
+        marked = sum(1 for row in rows if row.inserted)
+        unknown_student_ids = sorted(requested_ids - {row.student_id for row in rows})
+        target = f"class {class_value}-{section}" if section else (
+            f"class {class_value}" if class_value is not None else f"{len(rows)} student(s)"
+        )
+        return {
+            "success": True,
+            "message": f"Attendance recorded for {target} on {attendance_date}: "
+                       f"{marked} marked, {len(rows) - marked} updated.",
+            "marked": marked,
+            "updated": len(rows) - marked,
+            "unknown_student_ids": unknown_student_ids,
+        }
     except Exception as e:
         conn.rollback()
         return {
             "success": False,
-            "message": f"Error marking attendance: {e}",
+            "message": f"Error marking class attendance: {e}",
+        }
+    finally:
+        conn.close()
+
+
+# Monthly per-student attendance counts read by get_attendance_summary. The
+# statement-level triggers apply every insert, update and delete on
+# app.attendance (mark_attendance, mark_class_attendance, insert_data, COPY)
+# to the rollup as signed deltas, one upsert per affected student-month.
+# The triggers are dropped and created again, as CREATE OR REPLACE TRIGGER
+# needs PostgreSQL 14 (this needs 11); DROP TRIGGER's lock keeps attendance
+# writes out until the transaction that rebuilds the rollup commits.
+ATTENDANCE_ROLLUP_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS app.attendance_monthly (
+        student_id INTEGER NOT NULL,
+        month DATE NOT NULL,
+        present_days INTEGER NOT NULL DEFAULT 0,
+        absent_days INTEGER NOT NULL DEFAULT 0,
+        late_days INTEGER NOT NULL DEFAULT 0,
+        total_days INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (student_id, month)
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS attendance_date_idx ON app.attendance (attendance_date)
+    """,
+    """
+    CREATE OR REPLACE FUNCTION app.attendance_monthly_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            INSERT INTO app.attendance_monthly AS m
+                (student_id, month, present_days, absent_days, late_days, total_days)
+            SELECT student_id, CAST(date_trunc('month', attendance_date) AS DATE),
+                   -COUNT(*) FILTER (WHERE status = 'present'),
+                   -COUNT(*) FILTER (WHERE status = 'absent'),
+                   -COUNT(*) FILTER (WHERE status = 'late'),
+                   -COUNT(*)
+            FROM old_rows
+            WHERE student_id IS NOT NULL
+            GROUP BY 1, 2
+            ON CONFLICT (student_id, month) DO UPDATE SET
+                present_days = m.present_days + EXCLUDED.present_days,
+                absent_days = m.absent_days + EXCLUDED.absent_days,
+                late_days = m.late_days + EXCLUDED.late_days,
+                total_days = m.total_days + EXCLUDED.total_days;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO app.attendance_monthly AS m
+                (student_id, month, present_days, absent_days, late_days, total_days)
+            SELECT student_id, CAST(date_trunc('month', attendance_date) AS DATE),
+                   COUNT(*) FILTER (WHERE status = 'present'),
+                   COUNT(*) FILTER (WHERE status = 'absent'),
+                   COUNT(*) FILTER (WHERE status = 'late'),
+                   COUNT(*)
+            FROM new_rows
+            WHERE student_id IS NOT NULL
+            GROUP BY 1, 2
+            ON CONFLICT (student_id, month) DO UPDATE SET
+                present_days = m.present_days + EXCLUDED.present_days,
+                absent_days = m.absent_days + EXCLUDED.absent_days,
+                late_days = m.late_days + EXCLUDED.late_days,
+                total_days = m.total_days + EXCLUDED.total_days;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    DROP TRIGGER IF EXISTS attendance_monthly_insert ON app.attendance
+    """,
+    """
+    CREATE TRIGGER attendance_monthly_insert AFTER INSERT ON app.attendance
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION app.attendance_monthly_apply()
+    """,
+    """
+    DROP TRIGGER IF EXISTS attendance_monthly_update ON app.attendance
+    """,
+    """
+    CREATE TRIGGER attendance_monthly_update AFTER UPDATE ON app.attendance
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION app.attendance_monthly_apply()
+    """,
+    """
+    DROP TRIGGER IF EXISTS attendance_monthly_delete ON app.attendance
+    """,
+    """
+    CREATE TRIGGER attendance_monthly_delete AFTER DELETE ON app.attendance
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION app.attendance_monthly_apply()
+    """,
+)
+
+ATTENDANCE_ROLLUP_REBUILD = """
+    INSERT INTO app.attendance_monthly
+        (student_id, month, present_days, absent_days, late_days, total_days)
+    SELECT student_id, CAST(date_trunc('month', attendance_date) AS DATE),
+           COUNT(*) FILTER (WHERE status = 'present'),
+           COUNT(*) FILTER (WHERE status = 'absent'),
+           COUNT(*) FILTER (WHERE status = 'late'),
+           COUNT(*)
+    FROM app.attendance
+    WHERE student_id IS NOT NULL
+    GROUP BY 1, 2
+"""
+
+
+def setup_attendance_rollup(dummy_param: str) -> dict:
+    """Creates (if missing) and rebuilds the monthly attendance rollup used by get_attendance_summary.
+
+    Safe to run again at any time; the rollup is recomputed from app.attendance.
+
+    Args:
+        dummy_param (str): This parameter is not used by the function
+                           but helps ensure schema generation. A non-empty string is expected.
+    Returns:
+        dict: A dictionary with keys 'success' (bool), 'message' (str),
+              and 'rollup_rows' (int) with the number of student-months stored.
+    """
+    conn = get_db_connection()
+    try:
+        for statement in ATTENDANCE_ROLLUP_DDL:
+            conn.execute(text(statement))
+        # Block attendance writes while recomputing so no trigger delta is lost
+        conn.execute(text("LOCK TABLE app.attendance IN SHARE MODE"))
+        conn.execute(text("DELETE FROM app.attendance_monthly"))
+        rollup_rows = conn.execute(text(ATTENDANCE_ROLLUP_REBUILD)).rowcount
+        conn.commit()
+        get_schema_tables(force_refresh=True)
+
+        return {
+            "success": True,
+            "message": f"Attendance rollup rebuilt with {rollup_rows} student-month rows.",
+            "rollup_rows": rollup_rows,
+        }
+    except Exception as e:
+        conn.rollback()
+        return {
+            "success": False,
+            "message": f"Error setting up attendance rollup: {e}",
         }
     finally:
         conn.close()
 
 
+def _next_month(day: date) -> date:
+    """Returns the first day of the month after `day`."""
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def _split_rollup_range(start: Optional[date], end: Optional[date]):
+    """Splits an inclusive date range into whole months and the partial days around them.
+
+    Returns (months, partial_ranges): months is the half-open range
+    (months_from, months_to) of whole months, None-bounded where the range is
+    open, or None if the range covers no whole month; partial_ranges are
+    half-open (from, to) date ranges to count from app.attendance.
+    """
+    end_exclusive = end + timedelta(days=1) if end is not None else None
+    months_from = start if start is None or start.day == 1 else _next_month(start)
+    months_to = end_exclusive if end_exclusive is None or end_exclusive.day == 1 else end_exclusive.replace(day=1)
+
+    if months_from is not None and months_to is not None and months_from >= months_to:
+        return None, [(start, end_exclusive)]
+
+    partial_ranges = []
+    if start is not None and start != months_from:
+        partial_ranges.append((start, months_from))
+    if end_exclusive is not None and end_exclusive != months_to:
+        partial_ranges.append((months_to, end_exclusive))
+    return (months_from, months_to), partial_ranges
+
+
+def _rollup_range_conditions(
+    start_date: Optional[str],
+    end_date: Optional[str],
+    date_column: str,
+    params: dict
+):
+    """Builds the WHERE conditions that split a date range between a monthly rollup and its base table.
+
+    Returns (month_condition, row_condition) over the rollup's `month` column and
+    the base table's `date_column`; either is None when that side has nothing
+    to read. Bind values are added to params.
+    """
+    start = date.fromisoformat(start_date) if start_date is not None else None
+    end = date.fromisoformat(end_date) if end_date is not None else None
+    months, partial_ranges = _split_rollup_range(start, end)
+
+    month_condition = None
+    if months is not None:
+        months_from, months_to = months
+        month_conditions = ["TRUE"]
+        if months_from is not None:
+            month_conditions.append("month >= :months_from")
+            params["months_from"] = months_from
+        if months_to is not None:
+            month_conditions.append("month < :months_to")
+            params["months_to"] = months_to
+        month_condition = " AND ".join(month_conditions)
+
+    row_condition = None
+    if partial_ranges:
+        range_conditions = []
+        for index, (range_from, range_to) in enumerate(partial_ranges):
+            bounds = []
+            if range_from is not None:
+                bounds.append(f"{date_column} >= :range_from_{index}")
+                params[f"range_from_{index}"] = range_from
+            if range_to is not None:
+                bounds.append(f"{date_column} < :range_to_{index}")
+                params[f"range_to_{index}"] = range_to
+            range_conditions.append("(" + " AND ".join(bounds) + ")")
+        row_condition = "(" + " OR ".join(range_conditions) + ")"
+    return month_condition, row_condition
+
+
 def get_attendance_summary(
     student_id: Optional[int] = None, 
     start_date: Optional[str] = None, 
-    end_date: Optional[str] = None
+    end_date: Optional[str] = None,
+    format: str = "rows"
 ) -> dict:
     """Gets attendance summary statistics for students within a date range.
 
@@ -513,6 +2023,8 @@ def get_attendance_summary(
         student_id (int, optional): Filter by student ID.
         start_date (str, optional): Start date for the summary (YYYY-MM-DD format).
         end_date (str, optional): End date for the summary (YYYY-MM-DD format).
+        format (str): Response format: 'rows' (a list of records, the default), 'columnar'
+                      (one array per column) or 'ndjson' (a header line, then one line per record).
 
     Returns:
         dict: A dictionary with keys 'success' (bool), 'message' (str),
@@ -520,50 +2032,65 @@ def get_attendance_summary(
     """
     conn = get_db_connection()
     try:
-        query = """
-            SELECT 
-                a.student_id, 
-                s.student_name,
-                COUNT(*) as total_days,
-                COUNT(CASE WHEN a.status = 'present' THEN 1 END) as present_days,
-                COUNT(CASE WHEN a.status = 'absent' THEN 1 END) as absent_days,
-                COUNT(CASE WHEN a.status = 'late' THEN 1 END) as late_days,
-                ROUND(
-                    (COUNT(CASE WHEN a.status = 'present' THEN 1 END) * 100.0 / COUNT(*)), 2
-                ) as attendance_percentage
-            FROM app.attendance a
-            LEFT JOIN app.students s ON a.student_id = s.student_id
-        """
-        
-        conditions = []
+        if "attendance_monthly" not in get_schema_tables():
+            response = _summarize_attendance_rows(conn, student_id, start_date, end_date)
+            return format_records(response, "summary", format)
+
+        # Whole months come from the rollup; only the partial months at either
+        # end of the range are counted from app.attendance
+        parts = []
         params = {}
-        
+        student_condition = " AND student_id = :student_id" if student_id is not None else ""
         if student_id is not None:
-            conditions.append("a.student_id = :student_id")
             params["student_id"] = student_id
+        month_condition, row_condition = _rollup_range_conditions(
+            start_date, end_date, "attendance_date", params
+        )
+
+        if month_condition is not None:
+            parts.append(f"""
+                SELECT student_id, present_days, absent_days, late_days, total_days
+                FROM app.attendance_monthly
+                WHERE {month_condition}{student_condition}
+            """)
+
+        if row_condition is not None:
+            parts.append(f"""
+                SELECT student_id,
+                       COUNT(*) FILTER (WHERE status = 'present'),
+                       COUNT(*) FILTER (WHERE status = 'absent'),
+                       COUNT(*) FILTER (WHERE status = 'late'),
+                       COUNT(*)
+                FROM app.attendance
+                WHERE student_id IS NOT NULL AND {row_condition}{student_condition}
+                GROUP BY student_id
+            """)
+
+        query = f"""
+            SELECT 
+                c.student_id,
+                s.student_name,
+                CAST(SUM(c.total_days) AS INTEGER) as total_days,
+                CAST(SUM(c.present_days) AS INTEGER) as present_days,
+                CAST(SUM(c.absent_days) AS INTEGER) as absent_days,
+                CAST(SUM(c.late_days) AS INTEGER) as late_days,
+                ROUND(SUM(c.present_days) * 100.0 / SUM(c.total_days), 2) as attendance_percentage
+            FROM ({" UNION ALL ".join(parts)}) AS c(student_id, present_days, absent_days, late_days, total_days)
+            LEFT JOIN app.students s ON c.student_id = s.student_id
+            GROUP BY c.student_id, s.student_name
+            HAVING SUM(c.total_days) > 0
+            ORDER BY s.student_name
+        """
         
-        if start_date is not None:
-            conditions.append("a.attendance_date >= :start_date")
-            params["start_date"] = start_date
-        
-        if end_date is not None:
-            conditions.append("a.attendance_date <= :end_date")
-            params["end_date"] = end_date
-        
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-        
-        query += " GROUP BY a.student_id, s.student_name ORDER BY s.student_name"
-        
-        result = conn.execute(text(query), params)
+        result = conn.execute(cached_statement("get_attendance_summary", query), params)
         columns = result.keys()
         summary = [dict(zip(columns, row)) for row in result.fetchall()]
         
-        return {
+        return format_records({
             "success": True,
             "message": f"Retrieved attendance summary for {len(summary)} students.",
             "summary": summary,
-        }
+        }, "summary", format)
     except Exception as e:
         return {
             "success": False,
@@ -574,12 +2101,71 @@ def get_attendance_summary(
         conn.close()
 
 
+def _summarize_attendance_rows(
+    conn,
+    student_id: Optional[int],
+    start_date: Optional[str],
+    end_date: Optional[str]
+) -> dict:
+    """Computes the attendance summary by aggregating app.attendance directly.
+
+    Used when the monthly rollup has not been set up.
+    """
+    query = """
+        SELECT 
+            a.student_id, 
+            s.student_name,
+            COUNT(*) as total_days,
+            COUNT(CASE WHEN a.status = 'present' THEN 1 END) as present_days,
+            COUNT(CASE WHEN a.status = 'absent' THEN 1 END) as absent_days,
+            COUNT(CASE WHEN a.status = 'late' THEN 1 END) as late_days,
+            ROUND(
+                (COUNT(CASE WHEN a.status = 'present' THEN 1 END) * 100.0 / COUNT(*)), 2
+            ) as attendance_percentage
+        FROM app.attendance a
+        LEFT JOIN app.students s ON a.student_id = s.student_id
+    """
+    
+    conditions = []
+    params = {}
+    
+    if student_id is not None:
+        conditions.append("a.student_id = :student_id")
+        params["student_id"] = student_id
+    
+    if start_date is not None:
+        conditions.append("a.attendance_date >= :start_date")
+        params["start_date"] = start_date
+    
+    if end_date is not None:
+        conditions.append("a.attendance_date <= :end_date")
+        params["end_date"] = end_date
+    
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    
+    query += " GROUP BY a.student_id, s.student_name ORDER BY s.student_name"
+    
+    result = conn.execute(cached_statement("get_attendance_summary", query), params)
+    columns = result.keys()
+    summary = [dict(zip(columns, row)) for row in result.fetchall()]
+    
+    return {
+        "success": True,
+        "message": f"Retrieved attendance summary for {len(summary)} students.",
+        "summary": summary,
+    }
+
+
 def get_behavior_records(
     student_id: Optional[int] = None,
     logged_by: Optional[int] = None,
     source: Optional[str] = None,
     start_date: Optional[str] = None,
-    end_date: Optional[str] = None
+    end_date: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    format: str = "rows"
 ) -> dict:
     """Gets behavior records with optional filtering.
 
@@ -589,10 +2175,15 @@ def get_behavior_records(
         source (str, optional): Filter by behavior source.
         start_date (str, optional): Start date filter (YYYY-MM-DD format).
         end_date (str, optional): End date filter (YYYY-MM-DD format).
+        limit (int, optional): Maximum number of records to return (default 100).
+        cursor (str, optional): The 'next_cursor' returned by a previous call, to fetch the next page.
+        format (str): Response format: 'rows' (a list of records, the default), 'columnar'
+                      (one array per column) or 'ndjson' (a header line, then one line per record).
 
     Returns:
         dict: A dictionary with keys 'success' (bool), 'message' (str),
-              and 'records' (list[dict]) containing behavior records.
+              'records' (list[dict]) containing behavior records,
+              and 'next_cursor' (str) for the next page, or None on the last page.
     """
     conn = get_db_connection()
     try:
@@ -628,20 +2219,21 @@ def get_behavior_records(
             conditions.append("br.record_date <= :end_date")
             params["end_date"] = end_date
         
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-        
-        query += " ORDER BY br.record_date DESC, br.created_at DESC"
-        
-        result = conn.execute(text(query), params)
-        columns = result.keys()
-        records = [dict(zip(columns, row)) for row in result.fetchall()]
+        sort_keys = [
+            ("br.record_date", "record_date", "DESC"),
+            ("br.created_at", "created_at", "DESC"),
+            ("br.id", "id", "DESC"),
+        ]
+        records, next_cursor = fetch_page(
+            conn, query, conditions, params, sort_keys, "get_behavior_records", limit, cursor
+        )
         
-        return {
+        return format_records({
             "success": True,
             "message": f"Retrieved {len(records)} behavior records.",
             "records": records,
-        }
+            "next_cursor": next_cursor,
+        }, "records", format)
     except Exception as e:
         return {
             "success": False,
@@ -697,7 +2289,7 @@ def add_behavior_record(
             "logged_by": logged_by
         }
         
-        result = conn.execute(text(query), params)
+        result = conn.execute(cached_statement("add_behavior_record", query), params)
         record_id = result.fetchone()[0]
         conn.commit()
         
@@ -716,68 +2308,362 @@ def add_behavior_record(
         conn.close()
 
 
-def get_behavior_summary(
-    student_id: Optional[int] = None,
-    start_date: Optional[str] = None,
-    end_date: Optional[str] = None
-) -> dict:
-    """Gets behavior summary statistics for students within a date range.
+# Monthly per-student sentiment aggregates read by get_behavior_summary,
+# maintained by statement-level triggers on app.behavior_records like
+# app.attendance_monthly. Records without a record_date are kept under the
+# month '-infinity'. MIN and MAX cannot be reversed, so a bucket that loses
+# rows on update or delete has them recomputed exactly from its records.
+# As for attendance, the triggers are dropped and created again rather than
+# replaced, which would need PostgreSQL 14.
+BEHAVIOR_ROLLUP_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS app.behavior_monthly (
+        student_id INTEGER NOT NULL,
+        month DATE NOT NULL,
+        record_count INTEGER NOT NULL DEFAULT 0,
+        scored_count INTEGER NOT NULL DEFAULT 0,
+        sentiment_sum NUMERIC NOT NULL DEFAULT 0,
+        min_sentiment_score NUMERIC,
+        max_sentiment_score NUMERIC,
+        positive_records INTEGER NOT NULL DEFAULT 0,
+        negative_records INTEGER NOT NULL DEFAULT 0,
+        neutral_records INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (student_id, month)
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS behavior_records_student_date_idx
+        ON app.behavior_records (student_id, record_date)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS behavior_records_date_idx ON app.behavior_records (record_date)
+    """,
+    """
+    CREATE OR REPLACE FUNCTION app.behavior_monthly_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            INSERT INTO app.behavior_monthly AS m
+                (student_id, month, record_count, scored_count, sentiment_sum,
+                 positive_records, negative_records, neutral_records)
+            SELECT student_id, COALESCE(CAST(date_trunc('month', record_date) AS DATE), '-infinity'),
+                   -COUNT(*), -COUNT(sentiment_score), -COALESCE(SUM(sentiment_score), 0),
+                   -COUNT(*) FILTER (WHERE sentiment_score > 0),
+                   -COUNT(*) FILTER (WHERE sentiment_score < 0),
+                   -COUNT(*) FILTER (WHERE sentiment_score = 0)
+            FROM old_rows
+            WHERE student_id IS NOT NULL
+            GROUP BY 1, 2
+            ON CONFLICT (student_id, month) DO UPDATE SET
+                record_count = m.record_count + EXCLUDED.record_count,
+                scored_count = m.scored_count + EXCLUDED.scored_count,
+                sentiment_sum = m.sentiment_sum + EXCLUDED.sentiment_sum,
+                positive_records = m.positive_records + EXCLUDED.positive_records,
+                negative_records = m.negative_records + EXCLUDED.negative_records,
+                neutral_records = m.neutral_records + EXCLUDED.neutral_records;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO app.behavior_monthly AS m
+                (student_id, month, record_count, scored_count, sentiment_sum,
+                 min_sentiment_score, max_sentiment_score,
+                 positive_records, negative_records, neutral_records)
+            SELECT student_id, COALESCE(CAST(date_trunc('month', record_date) AS DATE), '-infinity'),
+                   COUNT(*), COUNT(sentiment_score), COALESCE(SUM(sentiment_score), 0),
+                   MIN(sentiment_score), MAX(sentiment_score),
+                   COUNT(*) FILTER (WHERE sentiment_score > 0),
+                   COUNT(*) FILTER (WHERE sentiment_score < 0),
+                   COUNT(*) FILTER (WHERE sentiment_score = 0)
+            FROM new_rows
+            WHERE student_id IS NOT NULL
+            GROUP BY 1, 2
+            ON CONFLICT (student_id, month) DO UPDATE SET
+                record_count = m.record_count + EXCLUDED.record_count,
+                scored_count = m.scored_count + EXCLUDED.scored_count,
+                sentiment_sum = m.sentiment_sum + EXCLUDED.sentiment_sum,
+                min_sentiment_score = LEAST(m.min_sentiment_score, EXCLUDED.min_sentiment_score),
+                max_sentiment_score = GREATEST(m.max_sentiment_score, EXCLUDED.max_sentiment_score),
+                positive_records = m.positive_records + EXCLUDED.positive_records,
+                negative_records = m.negative_records + EXCLUDED.negative_records,
+                neutral_records = m.neutral_records + EXCLUDED.neutral_records;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE app.behavior_monthly m
+            SET min_sentiment_score = exact.min_score, max_sentiment_score = exact.max_score
+            FROM (
+                SELECT DISTINCT student_id,
+                       COALESCE(CAST(date_trunc('month', record_date) AS DATE), '-infinity') AS month
+                FROM old_rows
+                WHERE student_id IS NOT NULL
+            ) AS changed
+            CROSS JOIN LATERAL (
+                SELECT MIN(b.sentiment_score) AS min_score, MAX(b.sentiment_score) AS max_score
+                FROM app.behavior_records b
+                WHERE b.student_id = changed.student_id
+                  AND CASE WHEN changed.month = '-infinity' THEN b.record_date IS NULL
+                           ELSE b.record_date >= changed.month
+                                AND b.record_date < changed.month + INTERVAL '1 month' END
+            ) AS exact
+            WHERE m.student_id = changed.student_id AND m.month = changed.month;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    DROP TRIGGER IF EXISTS behavior_monthly_insert ON app.behavior_records
+    """,
+    """
+    CREATE TRIGGER behavior_monthly_insert AFTER INSERT ON app.behavior_records
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION app.behavior_monthly_apply()
+    """,
+    """
+    DROP TRIGGER IF EXISTS behavior_monthly_update ON app.behavior_records
+    """,
+    """
+    CREATE TRIGGER behavior_monthly_update AFTER UPDATE ON app.behavior_records
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION app.behavior_monthly_apply()
+    """,
+    """
+    DROP TRIGGER IF EXISTS behavior_monthly_delete ON app.behavior_records
+    """,
+    """
+    CREATE TRIGGER behavior_monthly_delete AFTER DELETE ON app.behavior_records
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION app.behavior_monthly_apply()
+    """,
+)
+
+# Exact per-student, per-month aggregates computed from app.behavior_records;
+# used to rebuild app.behavior_monthly and to check it
+BEHAVIOR_ROLLUP_EXACT = """
+    SELECT student_id, COALESCE(CAST(date_trunc('month', record_date) AS DATE), '-infinity') AS month,
+           COUNT(*) AS record_count, COUNT(sentiment_score) AS scored_count,
+           COALESCE(SUM(sentiment_score), 0) AS sentiment_sum,
+           MIN(sentiment_score) AS min_sentiment_score, MAX(sentiment_score) AS max_sentiment_score,
+           COUNT(*) FILTER (WHERE sentiment_score > 0) AS positive_records,
+           COUNT(*) FILTER (WHERE sentiment_score < 0) AS negative_records,
+           COUNT(*) FILTER (WHERE sentiment_score = 0) AS neutral_records
+    FROM app.behavior_records
+    WHERE student_id IS NOT NULL
+    GROUP BY 1, 2
+"""
+
+BEHAVIOR_ROLLUP_COLUMNS = (
+    "record_count", "scored_count", "sentiment_sum", "min_sentiment_score",
+    "max_sentiment_score", "positive_records", "negative_records", "neutral_records",
+)
 
-    Args:
-        student_id (int, optional): Filter by student ID.
-        start_date (str, optional): Start date (YYYY-MM-DD format).
-        end_date (str, optional): End date (YYYY-MM-DD format).
 
+def setup_behavior_rollup(dummy_param: str) -> dict:
+    """Creates (if missing) and rebuilds the monthly sentiment aggregates used by get_behavior_summary.
+
+    Safe to run again at any time; the aggregates are recomputed from app.behavior_records.
+
+    Args:
+        dummy_param (str): This parameter is not used by the function
+                           but helps ensure schema generation. A non-empty string is expected.
     Returns:
         dict: A dictionary with keys 'success' (bool), 'message' (str),
-              and 'summary' (list[dict]) containing behavior statistics.
+              and 'rollup_rows' (int) with the number of student-months stored.
     """
     conn = get_db_connection()
     try:
-        query = """
-            SELECT 
-                br.student_id,
-                s.student_name,
-                COUNT(*) as total_records,
-                AVG(br.sentiment_score) as avg_sentiment_score,
-                MIN(br.sentiment_score) as min_sentiment_score,
-                MAX(br.sentiment_score) as max_sentiment_score,
-                COUNT(CASE WHEN br.sentiment_score > 0 THEN 1 END) as positive_records,
-                COUNT(CASE WHEN br.sentiment_score < 0 THEN 1 END) as negative_records,
-                COUNT(CASE WHEN br.sentiment_score = 0 THEN 1 END) as neutral_records
-            FROM app.behavior_records br
-            LEFT JOIN app.students s ON br.student_id = s.student_id
-        """
-        
-        conditions = []
-        params = {}
-        
-        if student_id is not None:
-            conditions.append("br.student_id = :student_id")
-            params["student_id"] = student_id
-        
-        if start_date is not None:
-            conditions.append("br.record_date >= :start_date")
-            params["start_date"] = start_date
-        
-        if end_date is not None:
-            conditions.append("br.record_date <= :end_date")
-            params["end_date"] = end_date
-        
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-        
-        query += " GROUP BY br.student_id, s.student_name ORDER BY s.student_name"
+        for statement in BEHAVIOR_ROLLUP_DDL:
+            conn.execute(text(statement))
+        # Block behavior record writes while recomputing so no trigger delta is lost
+        conn.execute(text("LOCK TABLE app.behavior_records IN SHARE MODE"))
+        conn.execute(text("DELETE FROM app.behavior_monthly"))
+        rollup_rows = conn.execute(text(
+            f"INSERT INTO app.behavior_monthly (student_id, month, {', '.join(BEHAVIOR_ROLLUP_COLUMNS)}) "
+            f"{BEHAVIOR_ROLLUP_EXACT}"
+        )).rowcount
+        conn.commit()
+        get_schema_tables(force_refresh=True)
+
+        return {
+            "success": True,
+            "message": f"Behavior rollup rebuilt with {rollup_rows} student-month rows.",
+            "rollup_rows": rollup_rows,
+        }
+    except Exception as e:
+        conn.rollback()
+        return {
+            "success": False,
+            "message": f"Error setting up behavior rollup: {e}",
+        }
+    finally:
+        conn.close()
+
+
+def check_behavior_rollup(student_id: Optional[int] = None, repair: bool = False) -> dict:
+    """Compares the monthly sentiment aggregates with an exact recompute from app.behavior_records.
+
+    Args:
+        student_id (int, optional): Only check this student.
+        repair (bool): If true, overwrite mismatched aggregates with the exact values. Defaults to false.
+
+    Returns:
+        dict: A dictionary with keys 'success' (bool), 'message' (str), 'consistent' (bool),
+              'checked' (int) student-months, and 'mismatches' (list[dict]) with the stored and
+              exact values of each differing student-month.
+    """
+    conn = get_db_connection()
+    try:
+        params = {}
+        student_condition = ""
+        if student_id is not None:
+            student_condition = " AND student_id = :student_id"
+            params["student_id"] = student_id
+        stored_values = ", ".join(f"r.{column}" for column in BEHAVIOR_ROLLUP_COLUMNS)
+        exact_values = ", ".join(f"e.{column}" for column in BEHAVIOR_ROLLUP_COLUMNS)
+        query = f"""
+            WITH exact AS ({BEHAVIOR_ROLLUP_EXACT}),
+            stored AS (
+                SELECT * FROM app.behavior_monthly WHERE record_count <> 0{student_condition}
+            )
+            SELECT COALESCE(r.student_id, e.student_id) AS student_id,
+                   NULLIF(COALESCE(r.month, e.month), '-infinity') AS month,
+                   ({stored_values}) IS DISTINCT FROM ({exact_values}) AS differs,
+                   json_build_object({", ".join(f"'{column}', r.{column}" for column in BEHAVIOR_ROLLUP_COLUMNS)}) AS stored,
+                   json_build_object({", ".join(f"'{column}', e.{column}" for column in BEHAVIOR_ROLLUP_COLUMNS)}) AS exact
+            FROM stored r
+            FULL JOIN (SELECT * FROM exact WHERE TRUE{student_condition}) e
+                ON e.student_id = r.student_id AND e.month = r.month
+        """
+        rows = conn.execute(text(query), params).fetchall()
+        mismatches = [
+            {
+                "student_id": row.student_id,
+                "month": row.month,
+                "stored": row.stored if row.stored["record_count"] is not None else None,
+                "exact": row.exact if row.exact["record_count"] is not None else None,
+            }
+            for row in rows if row.differs
+        ]
+
+        if mismatches and repair:
+            conn.execute(text("LOCK TABLE app.behavior_records IN SHARE MODE"))
+            conn.execute(text(f"DELETE FROM app.behavior_monthly WHERE TRUE{student_condition}"), params)
+            conn.execute(text(
+                f"INSERT INTO app.behavior_monthly (student_id, month, {', '.join(BEHAVIOR_ROLLUP_COLUMNS)}) "
+                f"SELECT * FROM ({BEHAVIOR_ROLLUP_EXACT}) AS exact WHERE TRUE{student_condition}"
+            ), params)
+            conn.commit()
+
+        message = f"Checked {len(rows)} student-months: {len(mismatches)} mismatch(es)."
+        if mismatches and repair:
+            message += " Aggregates repaired."
+        return {
+            "success": True,
+            "message": message,
+            "consistent": not mismatches,
+            "checked": len(rows),
+            "mismatches": mismatches,
+        }
+    except Exception as e:
+        conn.rollback()
+        return {
+            "success": False,
+            "message": f"Error checking behavior rollup: {e}",
+        }
+    finally:
+        conn.close()
+
+
+def get_behavior_summary(
+    student_id: Optional[int] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    exact: bool = False,
+    format: str = "rows"
+) -> dict:
+    """Gets behavior summary statistics for students within a date range.
+
+    Args:
+        student_id (int, optional): Filter by student ID.
+        start_date (str, optional): Start date (YYYY-MM-DD format).
+        end_date (str, optional): End date (YYYY-MM-DD format).
+        exact (bool): If true, recompute the statistics from every behavior record instead of
+                      the monthly aggregates. Defaults to false.
+        format (str): Response format: 'rows' (a list of records, the default), 'columnar'
+                      (one array per column) or 'ndjson' (a header line, then one line per record).
+
+    Returns:
+        dict: A dictionary with keys 'success' (bool), 'message' (str),
+              and 'summary' (list[dict]) containing behavior statistics.
+    """
+    conn = get_db_connection()
+    try:
+        if exact or "behavior_monthly" not in get_schema_tables():
+            response = _summarize_behavior_rows(conn, student_id, start_date, end_date)
+            return format_records(response, "summary", format)
+
+        # Whole months come from the aggregates; only the partial months at
+        # either end of the range are computed from app.behavior_records
+        parts = []
+        params = {}
+        student_condition = " AND student_id = :student_id" if student_id is not None else ""
+        if student_id is not None:
+            params["student_id"] = student_id
+        month_condition, row_condition = _rollup_range_conditions(
+            start_date, end_date, "record_date", params
+        )
+
+        if month_condition is not None:
+            if start_date is not None or end_date is not None:
+                # Records without a date never fall inside a date range
+                month_condition += " AND month > '-infinity'"
+            parts.append(f"""
+                SELECT student_id, record_count, scored_count, sentiment_sum,
+                       min_sentiment_score, max_sentiment_score,
+                       positive_records, negative_records, neutral_records
+                FROM app.behavior_monthly
+                WHERE {month_condition}{student_condition}
+            """)
+
+        if row_condition is not None:
+            parts.append(f"""
+                SELECT student_id, COUNT(*), COUNT(sentiment_score), COALESCE(SUM(sentiment_score), 0),
+                       MIN(sentiment_score), MAX(sentiment_score),
+                       COUNT(*) FILTER (WHERE sentiment_score > 0),
+                       COUNT(*) FILTER (WHERE sentiment_score < 0),
+                       COUNT(*) FILTER (WHERE sentiment_score = 0)
+                FROM app.behavior_records
+                WHERE student_id IS NOT NULL AND {row_condition}{student_condition}
+                GROUP BY student_id
+            """)
+
+        query = f"""
+            SELECT 
+                c.student_id,
+                s.student_name,
+                CAST(SUM(c.record_count) AS INTEGER) as total_records,
+                SUM(c.sentiment_sum) / NULLIF(SUM(c.scored_count), 0) as avg_sentiment_score,
+                MIN(c.min_sentiment_score) as min_sentiment_score,
+                MAX(c.max_sentiment_score) as max_sentiment_score,
+                CAST(SUM(c.positive_records) AS INTEGER) as positive_records,
+                CAST(SUM(c.negative_records) AS INTEGER) as negative_records,
+                CAST(SUM(c.neutral_records) AS INTEGER) as neutral_records
+            FROM ({" UNION ALL ".join(parts)}) AS c(
+                student_id, record_count, scored_count, sentiment_sum, min_sentiment_score,
+                max_sentiment_score, positive_records, negative_records, neutral_records
+            )
+            LEFT JOIN app.students s ON c.student_id = s.student_id
+            GROUP BY c.student_id, s.student_name
+            HAVING SUM(c.record_count) > 0
+            ORDER BY s.student_name
+        """
         
-        result = conn.execute(text(query), params)
+        result = conn.execute(cached_statement("get_behavior_summary", query), params)
         columns = result.keys()
         summary = [dict(zip(columns, row)) for row in result.fetchall()]
         
-        return {
+        return format_records({
             "success": True,
             "message": f"Retrieved behavior summary for {len(summary)} students.",
             "summary": summary,
-        }
+        }, "summary", format)
     except Exception as e:
         return {
             "success": False,
@@ -788,12 +2674,71 @@ def get_behavior_summary(
         conn.close()
 
 
+def _summarize_behavior_rows(
+    conn,
+    student_id: Optional[int],
+    start_date: Optional[str],
+    end_date: Optional[str]
+) -> dict:
+    """Computes the behavior summary exactly by aggregating app.behavior_records directly.
+
+    Used when exact=True or the monthly aggregates have not been set up.
+    """
+    query = """
+        SELECT 
+            br.student_id,
+            s.student_name,
+            COUNT(*) as total_records,
+            AVG(br.sentiment_score) as avg_sentiment_score,
+            MIN(br.sentiment_score) as min_sentiment_score,
+            MAX(br.sentiment_score) as max_sentiment_score,
+            COUNT(CASE WHEN br.sentiment_score > 0 THEN 1 END) as positive_records,
+            COUNT(CASE WHEN br.sentiment_score < 0 THEN 1 END) as negative_records,
+            COUNT(CASE WHEN br.sentiment_score = 0 THEN 1 END) as neutral_records
+        FROM app.behavior_records br
+        LEFT JOIN app.students s ON br.student_id = s.student_id
+    """
+    
+    conditions = []
+    params = {}
+    
+    if student_id is not None:
+        conditions.append("br.student_id = :student_id")
+        params["student_id"] = student_id
+    
+    if start_date is not None:
+        conditions.append("br.record_date >= :start_date")
+        params["start_date"] = start_date
+    
+    if end_date is not None:
+        conditions.append("br.record_date <= :end_date")
+        params["end_date"] = end_date
+    
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    
+    query += " GROUP BY br.student_id, s.student_name ORDER BY s.student_name"
+    
+    result = conn.execute(cached_statement("get_behavior_summary", query), params)
+    columns = result.keys()
+    summary = [dict(zip(columns, row)) for row in result.fetchall()]
+    
+    return {
+        "success": True,
+        "message": f"Retrieved behavior summary for {len(summary)} students.",
+        "summary": summary,
+    }
+
+
 def get_students(
     student_id: Optional[int] = None,
     student_name: Optional[str] = None,
     class_value: Optional[str] = None,
     section: Optional[str] = None,
-    gender: Optional[str] = None
+    gender: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    format: str = "rows"
 ) -> dict:
     """Gets student records with optional filtering.
 
@@ -803,10 +2748,15 @@ def get_students(
         class_value (str, optional): Filter by class.
         section (str, optional): Filter by section.
         gender (str, optional): Filter by gender.
+        limit (int, optional): Maximum number of records to return (default 100).
+        cursor (str, optional): The 'next_cursor' returned by a previous call, to fetch the next page.
+        format (str): Response format: 'rows' (a list of records, the default), 'columnar'
+                      (one array per column) or 'ndjson' (a header line, then one line per record).
 
     Returns:
         dict: A dictionary with keys 'success' (bool), 'message' (str),
-              and 'students' (list[dict]) containing student records.
+              'students' (list[dict]) containing student records,
+              and 'next_cursor' (str) for the next page, or None on the last page.
     """
     conn = get_db_connection()
     try:
@@ -840,20 +2790,22 @@ def get_students(
             conditions.append("gender = :gender")
             params["gender"] = gender
         
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-        
-        query += " ORDER BY class_value, section, student_name"
-        
-        result = conn.execute(text(query), params)
-        columns = result.keys()
-        students = [dict(zip(columns, row)) for row in result.fetchall()]
+        sort_keys = [
+            ("class_value", "class_value", "ASC"),
+            ("section", "section", "ASC"),
+            ("student_name", "student_name", "ASC"),
+            ("id", "id", "ASC"),
+        ]
+        students, next_cursor = fetch_page(
+            conn, query, conditions, params, sort_keys, "get_students", limit, cursor
+        )
         
-        return {
+        return format_records({
             "success": True,
             "message": f"Retrieved {len(students)} student records.",
             "students": students,
-        }
+            "next_cursor": next_cursor,
+        }, "students", format)
     except Exception as e:
         return {
             "success": False,
@@ -1028,12 +2980,14 @@ def update_student(
         conn.close()
 
 
-def get_students_by_class(class_value: str, section: Optional[str] = None) -> dict:
+def get_students_by_class(class_value: str, section: Optional[str] = None, format: str = "rows") -> dict:
     """Gets all students in a specific class and optionally section.
 
     Args:
         class_value (str): The class to filter by.
         section (str, optional): The section to filter by.
+        format (str): Response format: 'rows' (a list of records, the default), 'columnar'
+                      (one array per column) or 'ndjson' (a header line, then one line per record).
 
     Returns:
         dict: A dictionary with keys 'success' (bool), 'message' (str),
@@ -1057,17 +3011,17 @@ def get_students_by_class(class_value: str, section: Optional[str] = None) -> di
         
         query += " ORDER BY student_name"
         
-        result = conn.execute(text(query), params)
+        result = conn.execute(cached_statement("get_students_by_class", query), params)
         columns = result.keys()
         students = [dict(zip(columns, row)) for row in result.fetchall()]
         
         class_section = f"{class_value}-{section}" if section else class_value
         
-        return {
+        return format_records({
             "success": True,
             "message": f"Retrieved {len(students)} students from {class_section}.",
             "students": students,
-        }
+        }, "students", format)
     except Exception as e:
         return {
             "success": False,
@@ -1084,7 +3038,10 @@ def get_users(
     email: Optional[str] = None,
     role: Optional[str] = None,
     student_id: Optional[int] = None,
-    subject: Optional[str] = None
+    subject: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    format: str = "rows"
 ) -> dict:
     """Gets user records with optional filtering.
 
@@ -1095,10 +3052,15 @@ def get_users(
         role (str, optional): Filter by user role ('teacher', 'parent', 'admin').
         student_id (int, optional): Filter by associated student ID.
         subject (str, optional): Filter by subject (for teachers).
+        limit (int, optional): Maximum number of records to return (default 100).
+        cursor (str, optional): The 'next_cursor' returned by a previous call, to fetch the next page.
+        format (str): Response format: 'rows' (a list of records, the default), 'columnar'
+                      (one array per column) or 'ndjson' (a header line, then one line per record).
 
     Returns:
         dict: A dictionary with keys 'success' (bool), 'message' (str),
-              and 'users' (list[dict]) containing user records.
+              'users' (list[dict]) containing user records,
+              and 'next_cursor' (str) for the next page, or None on the last page.
     """
     conn = get_db_connection()
     try:
@@ -1136,20 +3098,17 @@ def get_users(
             conditions.append("u.subject ILIKE :subject")
             params["subject"] = f"%{subject}%"
         
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-        
-        query += " ORDER BY u.role, u.name"
-        
-        result = conn.execute(text(query), params)
-        columns = result.keys()
-        users = [dict(zip(columns, row)) for row in result.fetchall()]
+        sort_keys = [("u.role", "role", "ASC"), ("u.name", "name", "ASC"), ("u.id", "id", "ASC")]
+        users, next_cursor = fetch_page(
+            conn, query, conditions, params, sort_keys, "get_users", limit, cursor
+        )
         
-        return {
+        return format_records({
             "success": True,
             "message": f"Retrieved {len(users)} user records.",
             "users": users,
-        }
+            "next_cursor": next_cursor,
+        }, "users", format)
     except Exception as e:
         return {
             "success": False,
@@ -1328,11 +3287,13 @@ def update_user(
         conn.close()
 
 
-def get_users_by_role(role: str) -> dict:
+def get_users_by_role(role: str, format: str = "rows") -> dict:
     """Gets all users with a specific role.
 
     Args:
         role (str): The role to filter by ('teacher', 'parent', 'admin').
+        format (str): Response format: 'rows' (a list of records, the default), 'columnar'
+                      (one array per column) or 'ndjson' (a header line, then one line per record).
 
     Returns:
         dict: A dictionary with keys 'success' (bool), 'message' (str),
@@ -1351,15 +3312,15 @@ def get_users_by_role(role: str) -> dict:
         
         params = {"role": role}
         
-        result = conn.execute(text(query), params)
+        result = conn.execute(cached_statement("get_users_by_role", query), params)
         columns = result.keys()
         users = [dict(zip(columns, row)) for row in result.fetchall()]
         
-        return {
+        return format_records({
             "success": True,
             "message": f"Retrieved {len(users)} users with role '{role}'.",
             "users": users,
-        }
+        }, "users", format)
     except Exception as e:
         return {
             "success": False,
@@ -1370,11 +3331,13 @@ def get_users_by_role(role: str) -> dict:
         conn.close()
 
 
-def get_teachers_by_subject(subject: str) -> dict:
+def get_teachers_by_subject(subject: str, format: str = "rows") -> dict:
     """Gets all teachers who teach a specific subject.
 
     Args:
         subject (str): The subject to filter by.
+        format (str): Response format: 'rows' (a list of records, the default), 'columnar'
+                      (one array per column) or 'ndjson' (a header line, then one line per record).
 
     Returns:
         dict: A dictionary with keys 'success' (bool), 'message' (str),
@@ -1392,15 +3355,15 @@ def get_teachers_by_subject(subject: str) -> dict:
         
         params = {"subject": f"%{subject}%"}
         
-        result = conn.execute(text(query), params)
+        result = conn.execute(cached_statement("get_teachers_by_subject", query), params)
         columns = result.keys()
         teachers = [dict(zip(columns, row)) for row in result.fetchall()]
         
-        return {
+        return format_records({
             "success": True,
             "message": f"Retrieved {len(teachers)} teachers for subject '{subject}'.",
             "teachers": teachers,
-        }
+        }, "teachers", format)
     except Exception as e:
         return {
             "success": False,
@@ -1411,139 +3374,2137 @@ def get_teachers_by_subject(subject: str) -> dict:
         conn.close()
 
 
-# --- MCP Server Setup ---
-logging.info(
-    "Creating MCP Server instance for PostgreSQL DB..."
-)  
-app = Server("postgresql-db-mcp-server")
+# --- Name Search ---
 
-# Wrap database utility functions as ADK FunctionTools
-ADK_DB_TOOLS = {
-    "list_db_tables": FunctionTool(func=list_db_tables),
-    "get_table_schema": FunctionTool(func=get_table_schema),
-    "query_db_table": FunctionTool(func=query_db_table),
-    "insert_data": FunctionTool(func=insert_data),
-    "delete_data": FunctionTool(func=delete_data),
-    "get_academic_records": FunctionTool(func=get_academic_records),
-    "add_academic_record": FunctionTool(func=add_academic_record),
-    "get_attendance_records": FunctionTool(func=get_attendance_records),
-    "mark_attendance": FunctionTool(func=mark_attendance),
-    "get_attendance_summary": FunctionTool(func=get_attendance_summary),
-    "get_behavior_records": FunctionTool(func=get_behavior_records),
-    "add_behavior_record": FunctionTool(func=add_behavior_record),
-    "get_behavior_summary": FunctionTool(func=get_behavior_summary),
-    "get_students": FunctionTool(func=get_students),
-    "add_student": FunctionTool(func=add_student),
-    "update_student": FunctionTool(func=update_student),
-    "get_students_by_class": FunctionTool(func=get_students_by_class),
-    "get_users": FunctionTool(func=get_users),
-    "add_user": FunctionTool(func=add_user),
-    "update_user": FunctionTool(func=update_user),
-    "get_users_by_role": FunctionTool(func=get_users_by_role),
-    "get_teachers_by_subject": FunctionTool(func=get_teachers_by_subject),
-}
+# Trigram (pg_trgm GIN) indexes behind the search tools, as
+# (index name, table, column). They also serve the ILIKE '%term%' filters of
+# get_students, get_users, get_teachers_by_subject and get_academic_records.
+TRIGRAM_INDEXES = (
+    ("students_name_trgm_idx", "students", "student_name"),
+    ("users_name_trgm_idx", "users", "name"),
+    ("users_subject_trgm_idx", "users", "subject"),
+    ("academic_records_subject_trgm_idx", "academic_records", "subject"),
+)
 
+# Whether the pg_trgm extension is installed; checked on first search
+_pg_trgm_available = None
 
-@app.list_tools()
-async def list_mcp_tools() -> list[mcp_types.Tool]:
-    """MCP handler to list tools this server exposes."""
-    logging.info(
-        "MCP Server: Received list_tools request."
-    )  # Changed print to logging.info
-    mcp_tools_list = []
-    for tool_name, adk_tool_instance in ADK_DB_TOOLS.items():
-        if not adk_tool_instance.name:
-            adk_tool_instance.name = tool_name
 
-        mcp_tool_schema = adk_to_mcp_tool_type(adk_tool_instance)
-        logging.info(  # Changed print to logging.info
-            f"MCP Server: Advertising tool: {mcp_tool_schema.name}, InputSchema: {mcp_tool_schema.inputSchema}"
-        )
-        mcp_tools_list.append(mcp_tool_schema)
-    return mcp_tools_list
+def _has_pg_trgm(conn) -> bool:
+    """Returns whether pg_trgm is installed, checking the database once."""
+    global _pg_trgm_available
+    if _pg_trgm_available is None:
+        _pg_trgm_available = conn.execute(
+            text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+        ).scalar()
+        if not _pg_trgm_available:
+            logging.warning("pg_trgm is not installed; name search falls back to ILIKE matching.")
+    return _pg_trgm_available
 
 
-@app.call_tool()
-async def call_mcp_tool(name: str, arguments: dict) -> list[mcp_types.TextContent]:
-    """MCP handler to execute a tool call requested by an MCP client."""
-    logging.info(
-        f"MCP Server: Received call_tool request for '{name}' with args: {arguments}"
-    )  # Changed print to logging.info
+def setup_search_indexes(dummy_param: str) -> dict:
+    """Installs pg_trgm and creates the trigram indexes used by search_students and search_users.
 
-    if name in ADK_DB_TOOLS:
-        adk_tool_instance = ADK_DB_TOOLS[name]
-        try:
-            adk_tool_response = await adk_tool_instance.run_async(
-                args=arguments,
-                tool_context=None,  # type: ignore
-            )
-            logging.info(  # Changed print to logging.info
-                f"MCP Server: ADK tool '{name}' executed. Response: {adk_tool_response}"
-            )
-            response_text = json.dumps(adk_tool_response, indent=2, default=json_serializer)
-            return [mcp_types.TextContent(type="text", text=response_text)]
+    Args:
+        dummy_param (str): This parameter is not used by the function
+                           but helps ensure schema generation. A non-empty string is expected.
+    Returns:
+        dict: A dictionary with keys 'success' (bool), 'message' (str),
+              and 'indexes' (list[str]) with the index names.
+    """
+    global _pg_trgm_available
+    conn = get_db_connection()
+    try:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for index_name, table_name, column in TRIGRAM_INDEXES:
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {index_name} "
+                f"ON app.{table_name} USING gin ({column} gin_trgm_ops)"
+            ))
+        conn.commit()
+        _pg_trgm_available = True
 
-        except Exception as e:
-            logging.error(
-                f"MCP Server: Error executing ADK tool '{name}': {e}", exc_info=True
-            )  # Changed print to logging.error, added exc_info
-            error_payload = {
-                "success": False,
-                "message": f"Failed to execute tool '{name}': {str(e)}",
-            }
-            error_text = json.dumps(error_payload)
-            return [mcp_types.TextContent(type="text", text=error_text)]
-    else:
-        logging.warning(
-            f"MCP Server: Tool '{name}' not found/exposed by this server."
-        )  # Changed print to logging.warning
-        error_payload = {
+        return {
+            "success": True,
+            "message": f"pg_trgm installed and {len(TRIGRAM_INDEXES)} trigram indexes ensured.",
+            "indexes": [index_name for index_name, _, _ in TRIGRAM_INDEXES],
+        }
+    except Exception as e:
+        conn.rollback()
+        return {
             "success": False,
-            "message": f"Tool '{name}' not implemented by this server.",
+            "message": f"Error setting up search indexes: {e}",
         }
-        error_text = json.dumps(error_payload)
-        return [mcp_types.TextContent(type="text", text=error_text)]
+    finally:
+        conn.close()
 
 
-# --- MCP Server Runner ---
-async def run_mcp_stdio_server():
-    """Runs the MCP server, listening for connections over standard input/output."""
-    async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
-        logging.info(
-            "MCP Stdio Server: Starting handshake with client..."
-        )  # Changed print to logging.info
-        await app.run(
-            read_stream,
-            write_stream,
-            InitializationOptions(
-                server_name=app.name,
-                server_version="0.1.0",
-                capabilities=app.get_capabilities(
-                    notification_options=NotificationOptions(),
-                    experimental_capabilities={},
-                ),
-            ),
+def _plan_index_names(plan: dict) -> set:
+    """Collects the index names used anywhere in an EXPLAIN (FORMAT JSON) plan."""
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        names |= _plan_index_names(child)
+    return names
+
+
+def check_search_indexes(sample_term: str = "smith") -> dict:
+    """Checks with EXPLAIN that the search and ILIKE filters are served by the trigram indexes.
+
+    For each index, 'usable' tells whether the planner can use it for the query
+    at all, and 'chosen' whether it does with the current table statistics;
+    small tables are often cheaper to scan sequentially.
+
+    Args:
+        sample_term (str): The search term to plan the queries with. Defaults to 'smith'.
+
+    Returns:
+        dict: A dictionary with keys 'success' (bool), 'message' (str), 'pg_trgm_installed' (bool)
+              and 'indexes' (list[dict]) with 'exists', 'usable' and 'chosen' per index and query.
+    """
+    conn = get_db_connection()
+    try:
+        installed = _has_pg_trgm(conn)
+        existing = {
+            row.indexname for row in conn.execute(text(
+                "SELECT indexname FROM pg_indexes WHERE schemaname = 'app'"
+            ))
+        }
+        params = {"term": sample_term, "pattern": f"%{sample_term}%"}
+        checks = []
+        for index_name, table_name, column in TRIGRAM_INDEXES:
+            predicates = {"ilike": f"{column} ILIKE :pattern"}
+            if installed:
+                predicates["search"] = f":term <% {column}"
+            for query_kind, predicate in predicates.items():
+                explain = text(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM app.{table_name} WHERE {predicate}")
+                chosen = index_name in _plan_index_names(conn.execute(explain, params).scalar()[0]["Plan"])
+                conn.execute(text("SET LOCAL enable_seqscan = off"))
+                usable = index_name in _plan_index_names(conn.execute(explain, params).scalar()[0]["Plan"])
+                conn.execute(text("SET LOCAL enable_seqscan = on"))
+                checks.append({
+                    "index": index_name,
+                    "query": query_kind,
+                    "exists": index_name in existing,
+                    "usable": usable,
+                    "chosen": chosen,
+                })
+        conn.rollback()
+
+        unusable = [check["index"] for check in checks if not check["usable"]]
+        message = (
+            "All trigram indexes are usable." if not unusable
+            else f"Trigram indexes not usable: {', '.join(sorted(set(unusable)))}. Run setup_search_indexes."
         )
-        logging.info(
-            "MCP Stdio Server: Run loop finished or client disconnected."
-        )  # Changed print to logging.info
+        return {
+            "success": True,
+            "message": message,
+            "pg_trgm_installed": installed,
+            "indexes": checks,
+        }
+    except Exception as e:
+        conn.rollback()
+        return {
+            "success": False,
+            "message": f"Error checking search indexes: {e}",
+        }
+    finally:
+        conn.close()
 
 
-if __name__ == "__main__":
-    logging.info(
-        "Launching PostgreSQL DB MCP Server via stdio..."
-    )
+def trigram_search(
+    conn,
+    query: str,
+    search_terms: dict,
+    conditions: list,
+    params: dict,
+    order_column: str,
+    limit: int,
+    min_similarity: float
+) -> list[dict]:
+    """Runs a ranked fuzzy search over the columns in search_terms ({column: term}).
+
+    With pg_trgm, rows match when a term is word-similar to its column (an
+    indexed `<%` lookup) and are ranked by summed word similarity. Without it,
+    rows match by ILIKE containment and are ordered by order_column.
+    """
+    if _has_pg_trgm(conn):
+        conn.execute(
+            text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+            {"threshold": str(min_similarity)},
+        )
+        scores = []
+        for index, (column, term) in enumerate(search_terms.items()):
+            conditions.append(f":term_{index} <% {column}")
+            scores.append(f"word_similarity(:term_{index}, {column})")
+            params[f"term_{index}"] = term
+        score = f"ROUND(CAST({' + '.join(scores)} AS NUMERIC), 3)"
+    else:
+        for index, (column, term) in enumerate(search_terms.items()):
+            conditions.append(f"{column} ILIKE :term_{index}")
+            params[f"term_{index}"] = f"%{term}%"
+        score = "NULL"
+
+    query = query.format(score=score)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY similarity DESC NULLS LAST, {order_column} LIMIT :limit"
+    params["limit"] = min(limit, MAX_PAGE_SIZE)
+
+    result = conn.execute(text(query), params)
+    columns = result.keys()
+    return [dict(zip(columns, row)) for row in result.fetchall()]
+
+
+def search_students(
+    name: str,
+    class_value: Optional[str] = None,
+    limit: int = 10,
+    min_similarity: float = 0.3
+) -> dict:
+    """Finds students by approximate name, best matches first; tolerant of typos and partial names.
+
+    Args:
+        name (str): The name, or part of it, to search for.
+        class_value (str, optional): Only search this class.
+        limit (int): Maximum number of matches to return. Defaults to 10.
+        min_similarity (float): Minimum word similarity (0 to 1) for a match. Defaults to 0.3.
+
+    Returns:
+        dict: A dictionary with keys 'success' (bool), 'message' (str),
+              and 'students' (list[dict]) with each match's 'similarity' score.
+    """
+    conn = get_db_connection()
+    try:
+        query = """
+            SELECT id, student_id, student_name, class_value, section, parent_name,
+                   {score} AS similarity
+            FROM app.students
+        """
+        conditions = []
+        params = {}
+        if class_value is not None:
+            conditions.append("class_value = :class_value")
+            params["class_value"] = class_value
+
+        students = trigram_search(
+            conn, query, {"student_name": name}, conditions, params, "student_name", limit, min_similarity
+        )
+        return {
+            "success": True,
+            "message": f"Found {len(students)} students matching '{name}'.",
+            "students": students,
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Error searching students: {e}",
+            "students": [],
+        }
+    finally:
+        conn.close()
+
+
+def search_users(
+    name: Optional[str] = None,
+    subject: Optional[str] = None,
+    role: Optional[str] = None,
+    limit: int = 10,
+    min_similarity: float = 0.3
+) -> dict:
+    """Finds users (teachers, parents, staff) by approximate name and/or subject, best matches first.
+
+    Args:
+        name (str, optional): The name, or part of it, to search for.
+        subject (str, optional): The subject, or part of it, to search for.
+        role (str, optional): Only search users with this role (e.g. 'teacher').
+        limit (int): Maximum number of matches to return. Defaults to 10.
+        min_similarity (float): Minimum word similarity (0 to 1) for a match. Defaults to 0.3.
+
+    Returns:
+        dict: A dictionary with keys 'success' (bool), 'message' (str),
+              and 'users' (list[dict]) with each match's 'similarity' score.
+    """
+    search_terms = {column: term for column, term in (("name", name), ("subject", subject)) if term}
+    if not search_terms:
+        return {"success": False, "message": "Provide a name or subject to search for.", "users": []}
+
+    conn = get_db_connection()
     try:
-        asyncio.run(run_mcp_stdio_server())
+        query = """
+            SELECT id, name, email, phone, role, subject, {score} AS similarity
+            FROM app.users
+        """
+        conditions = []
+        params = {}
+        if role is not None:
+            conditions.append("role = :role")
+            params["role"] = role
+
+        users = trigram_search(conn, query, search_terms, conditions, params, "name", limit, min_similarity)
+        return {
+            "success": True,
+            "message": f"Found {len(users)} users matching {', '.join(search_terms.values())}.",
+            "users": users,
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Error searching users: {e}",
+            "users": [],
+        }
+    finally:
+        conn.close()
+
+
+# --- Index Advisor ---
+
+# The predicates and sort orders of the read tools, each with the B-tree index
+# that serves it. advise_indexes EXPLAINs `query` with predicate values sampled
+# from the table; an index counts as present when any valid B-tree index on
+# the table starts with `columns`.
+INDEX_ADVICE = (
+    {
+        "tools": ["get_attendance_records", "get_attendance_summary"],
+        "index": "attendance_student_date_idx",
+        "table": "attendance",
+        "columns": ["student_id", "attendance_date"],
+        "query": "SELECT * FROM app.attendance WHERE student_id = :student_id "
+                 "ORDER BY attendance_date DESC, id LIMIT 100",
+    },
+    {
+        "tools": ["get_attendance_records", "get_attendance_summary"],
+        "index": "attendance_date_idx",
+        "table": "attendance",
+        "columns": ["attendance_date"],
+        "query": "SELECT * FROM app.attendance WHERE attendance_date = :attendance_date "
+                 "ORDER BY id LIMIT 100",
+    },
+    {
+        "tools": ["get_behavior_records", "get_behavior_summary"],
+        "index": "behavior_records_student_date_idx",
+        "table": "behavior_records",
+        "columns": ["student_id", "record_date"],
+        "query": "SELECT * FROM app.behavior_records WHERE student_id = :student_id "
+                 "ORDER BY record_date DESC, created_at DESC, id DESC LIMIT 100",
+    },
+    {
+        "tools": ["get_academic_records"],
+        "index": "academic_records_student_date_idx",
+        "table": "academic_records",
+        "columns": ["student_id", "record_date"],
+        "query": "SELECT * FROM app.academic_records WHERE student_id = :student_id "
+                 "ORDER BY record_date DESC, id DESC LIMIT 100",
+    },
+    {
+        "tools": ["get_academic_records"],
+        "index": "academic_records_teacher_date_idx",
+        "table": "academic_records",
+        "columns": ["teacher_id", "record_date"],
+        "query": "SELECT * FROM app.academic_records WHERE teacher_id = :teacher_id "
+                 "ORDER BY record_date DESC, id DESC LIMIT 100",
+    },
+    {
+        "tools": ["get_users", "get_users_by_role", "get_teachers_by_subject"],
+        "index": "users_role_name_idx",
+        "table": "users",
+        "columns": ["role", "name"],
+        "query": "SELECT * FROM app.users WHERE role = :role ORDER BY name, id LIMIT 100",
+    },
+    {
+        "tools": ["get_students", "get_students_by_class"],
+        "index": "students_class_section_name_idx",
+        "table": "students",
+        "columns": ["class_value", "section", "student_name"],
+        "query": "SELECT * FROM app.students WHERE class_value = :class_value AND section = :section "
+                 "ORDER BY student_name, id LIMIT 100",
+    },
+)
+
+# Every index in the app schema with its key columns and scan count
+APP_INDEXES_QUERY = """
+    SELECT i.relname AS index_name, t.relname AS table_name, am.amname AS method,
+           ix.indisvalid AS valid, ix.indisunique OR ix.indisprimary AS enforces_constraint,
+           COALESCE(s.idx_scan, 0) AS scans,
+           array_agg(a.attname ORDER BY k.position) AS columns
+    FROM pg_index ix
+    JOIN pg_class i ON i.oid = ix.indexrelid
+    JOIN pg_class t ON t.oid = ix.indrelid
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    JOIN pg_am am ON am.oid = i.relam
+    CROSS JOIN LATERAL unnest(ix.indkey) WITH ORDINALITY AS k(attnum, position)
+    LEFT JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+    LEFT JOIN pg_stat_user_indexes s ON s.indexrelid = ix.indexrelid
+    WHERE n.nspname = 'app'
+    GROUP BY i.relname, t.relname, am.amname, ix.indisvalid, ix.indisunique, ix.indisprimary, s.idx_scan
+"""
+
+
+def _covering_index(indexes: list, advice: dict) -> Optional[str]:
+    """Returns the name of a valid B-tree index serving the advice's columns, if any."""
+    width = len(advice["columns"])
+    for index in indexes:
+        if (
+            index.table_name == advice["table"] and index.method == "btree" and index.valid
+            and list(index.columns[:width]) == advice["columns"]
+        ):
+            return index.index_name
+    return None
+
+
+def _explain_advice(conn, advice: dict) -> Optional[dict]:
+    """EXPLAINs the advice's query with predicate values sampled from its table.
+
+    Returns None when the table has no row to sample.
+    """
+    predicate_columns = [column for column in advice["columns"] if f":{column}" in advice["query"]]
+    sample = conn.execute(text(
+        f"SELECT {', '.join(predicate_columns)} FROM app.{advice['table']} "
+        f"WHERE {' AND '.join(f'{column} IS NOT NULL' for column in predicate_columns)} LIMIT 1"
+    )).mappings().first()
+    if sample is None:
+        return None
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {advice['query']}"), dict(sample)).scalar()[0]["Plan"]
+    return {
+        "parameters": dict(sample),
+        "indexes_used": sorted(_plan_index_names(plan)),
+        "seq_scan": _plan_has_seq_scan(plan),
+        "estimated_cost": plan["Total Cost"],
+    }
+
+
+def _plan_has_seq_scan(plan: dict) -> bool:
+    """Returns whether an EXPLAIN (FORMAT JSON) plan scans any table sequentially."""
+    return plan["Node Type"] == "Seq Scan" or any(_plan_has_seq_scan(child) for child in plan.get("Plans", []))
+
+
+def advise_indexes(apply: bool = False) -> dict:
+    """Checks that the indexes behind the read tools' filters and sort orders exist and are used.
+
+    Runs EXPLAIN on each tool's typical query, reports recommended indexes that are
+    missing and existing indexes that have never been scanned, and with apply=true
+    creates the missing ones with CREATE INDEX CONCURRENTLY (safe to run repeatedly;
+    writes are not blocked while the indexes build).
+
+    Args:
+        apply (bool): If true, create the missing recommended indexes. Defaults to false.
+
+    Returns:
+        dict: A dictionary with keys 'success' (bool), 'message' (str), 'recommendations' (list[dict])
+              with each recommended index's tools, status and query plan, 'unused_indexes'
+              (list[dict]) and 'created' (list[str]) with the indexes created by this call.
+    """
+    conn = get_db_connection()
+    try:
+        indexes = conn.execute(text(APP_INDEXES_QUERY)).fetchall()
+        recommendations = []
+        for advice in INDEX_ADVICE:
+            covered_by = _covering_index(indexes, advice)
+            recommendations.append({
+                "index": advice["index"],
+                "table": advice["table"],
+                "columns": advice["columns"],
+                "tools": advice["tools"],
+                "status": "present" if covered_by else "missing",
+                "covered_by": covered_by,
+                "plan": _explain_advice(conn, advice),
+            })
+
+        recommended_names = {recommendation["covered_by"] for recommendation in recommendations}
+        unused_indexes = [
+            {"index": index.index_name, "table": index.table_name, "columns": list(index.columns)}
+            for index in indexes
+            if index.scans == 0 and index.valid and not index.enforces_constraint
+            and index.index_name not in recommended_names
+        ]
+        invalid_names = {index.index_name for index in indexes if not index.valid}
+        conn.commit()
+
+        created = []
+        missing = [recommendation for recommendation in recommendations if recommendation["status"] == "missing"]
+        if apply and missing:
+            if conn.in_transaction():
+                raise RuntimeError("apply=true cannot run inside a transactional batch.")
+            # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+            sa_conn = unwrap_connection(conn)
+            sa_conn.execution_options(isolation_level="AUTOCOMMIT")
+            try:
+                for recommendation in missing:
+                    if recommendation["index"] in invalid_names:
+                        # Left behind by an interrupted concurrent build
+                        sa_conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS app.{recommendation['index']}"))
+                    sa_conn.execute(text(
+                        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {recommendation['index']} "
+                        f"ON app.{recommendation['table']} ({', '.join(recommendation['columns'])})"
+                    ))
+                    recommendation["status"] = "created"
+                    recommendation["covered_by"] = recommendation["index"]
+                    created.append(recommendation["index"])
+            finally:
+                sa_conn.commit()
+                sa_conn.execution_options(isolation_level=sa_conn.default_isolation_level)
+
+        message = (
+            f"{len(recommendations) - len(missing)} of {len(recommendations)} recommended indexes present, "
+            f"{len(unused_indexes)} unused index(es)."
+        )
+        if created:
+            message += f" Created {len(created)} index(es)."
+        return {
+            "success": True,
+            "message": message,
+            "recommendations": recommendations,
+            "unused_indexes": unused_indexes,
+            "created": created,
+        }
+    except Exception as e:
+        conn.rollback()
+        return {
+            "success": False,
+            "message": f"Error advising indexes: {e}",
+        }
+    finally:
+        conn.close()
+
+
+# --- Batch Tool ---
+
+
+class TransactionConnection(BorrowedConnection):
+    """Borrowed connection whose commits are deferred to the end of a batch.
+
+    Tools commit after each write; inside a single-transaction batch those
+    commits are no-ops and the batch commits or rolls back once at the end.
+    """
+
+    def commit(self):
+        pass
+
+
+def batch(operations: list[dict], transaction: bool = False) -> dict:
+    """Runs an ordered list of tool calls on one database connection and returns all results.
+
+    Use this for multi-step plans, e.g. look up a student, check their attendance
+    summary and add a behavior record, in a single request.
+
+    Args:
+        operations (list[dict]): The calls to run in order, each a dictionary with keys
+                                 'tool' (str, the tool name) and 'arguments' (dict).
+        transaction (bool): If true, run every call in one transaction: the batch stops at the
+                            first call that fails and all of its changes are rolled back.
+                            Otherwise each call commits on its own and the batch continues
+                            past failures. Defaults to false.
+
+    Returns:
+        dict: A dictionary with keys 'success' (bool, true if every call succeeded), 'message' (str),
+              'committed' (bool) and 'results' (list[dict]) with each call's 'tool', 'success'
+              and 'result'.
+    """
+    if not operations:
+        return {"success": False, "message": "No operations given.", "committed": False, "results": []}
+
+    conn = get_db_connection()
+    shared_connection = unwrap_connection(conn)
+    if transaction:
+        shared_connection = TransactionConnection(shared_connection)
+    token = _bound_connection.set(shared_connection)
+    results = []
+    failed = False
+    try:
+        for operation in operations:
+            tool_name = operation.get("tool")
+            func = DB_TOOL_FUNCTIONS.get(tool_name)
+            try:
+                if func is None or func is batch:
+                    raise ValueError(f"Tool '{tool_name}' cannot be used in a batch.")
+                result = func(**(operation.get("arguments") or {}))
+                succeeded = not (isinstance(result, dict) and result.get("success") is False)
+            except Exception as e:
+                result = {"success": False, "message": f"Failed to execute tool '{tool_name}': {e}"}
+                succeeded = False
+
+            results.append({"tool": tool_name, "success": succeeded, "result": result})
+            if not succeeded:
+                failed = True
+                if transaction:
+                    break
+                # Clear an aborted transaction so the following calls can run
+                if conn.in_transaction():
+                    conn.rollback()
+
+        committed = not (transaction and failed)
+        if transaction:
+            if failed:
+                conn.rollback()
+            else:
+                conn.commit()
+    except Exception as e:
+        conn.rollback()
+        return {
+            "success": False,
+            "message": f"Error executing batch: {e}",
+            "committed": False,
+            "results": results,
+        }
+    finally:
+        _bound_connection.reset(token)
+        conn.close()
+
+    succeeded_count = sum(1 for entry in results if entry["success"])
+    message = f"Executed {len(results)} of {len(operations)} operations; {succeeded_count} succeeded."
+    if transaction:
+        message += " Transaction committed." if committed else " Transaction rolled back."
+    return {
+        "success": not failed,
+        "message": message,
+        "committed": committed,
+        "results": results,
+    }
+
+
+# --- Async Execution Path ---
+
+
+def _run_with_bound_connection(sync_conn, func, kwargs):
+    """Runs a tool function with `sync_conn` as its database connection."""
+    if _autocommit_call.get():
+        sync_conn.execution_options(isolation_level="AUTOCOMMIT")
+    apply_statement_timeout(sync_conn)
+    token = _bound_connection.set(sync_conn)
+    try:
+        return func(**kwargs)
+    finally:
+        _bound_connection.reset(token)
+
+
+async def cancel_running_query(async_conn):
+    """Asks the server to cancel the query still running on the connection of a cancelled call.
+
+    psycopg 3 cancels a query itself when the task is cancelled while it waits
+    on the query; a query left running by any other path is cancelled here
+    before the connection goes back to its pool.
+    """
+    try:
+        driver_connection = (await async_conn.get_raw_connection()).driver_connection
+        from psycopg.pq import TransactionStatus
+
+        if driver_connection.info.transaction_status == TransactionStatus.ACTIVE:
+            await driver_connection.cancel_safe(timeout=5)
+    except Exception as e:
+        logging.warning(f"Cancelling a query failed: {e}")
+
+
+def async_db_tool(func):
+    """Builds an async version of a database tool function.
+
+    The tool body runs on a connection from the async engine, so every
+    `conn.execute()` awaits the driver instead of blocking the event loop.
+    The wrapper keeps the tool's name, docstring and signature so the
+    generated MCP schema is unchanged.
+    """
+
+    @functools.wraps(func)
+    async def async_tool(**kwargs):
+        started_at = time.perf_counter()
+        async_conn, engine_name = await connect_async_for_call()
+        try:
+            checkout_wait = time.perf_counter() - started_at
+            _record_pool_checkout(engine_name, checkout_wait)
+            add_queue_wait(checkout_wait)
+            return await async_conn.run_sync(_run_with_bound_connection, func, kwargs)
+        except asyncio.CancelledError:
+            await cancel_running_query(async_conn)
+            raise
+        finally:
+            await async_conn.close()
+
+    return async_tool
+
+
+def _run_with_statement_timeout(conn, func, *args):
+    """Runs func(conn, *args) under DB_STATEMENT_TIMEOUT, for work outside a tool call."""
+    apply_statement_timeout(conn, DB_STATEMENT_TIMEOUT)
+    return func(conn, *args)
+
+
+async def run_with_connection(func, *args, replica: bool = False):
+    """Runs func(conn, *args) on a connection from the engine used by the execution mode.
+
+    With `replica`, the connection comes from the read replica instead of the primary.
+    """
+    if DB_EXECUTION_MODE == "async":
+        async_engine_for_call = get_replica_async_engine() if replica else get_async_engine()
+        async with async_engine_for_call.connect() as async_conn:
+            return await async_conn.run_sync(_run_with_statement_timeout, func, *args)
+
+    def run_on_sync_engine():
+        with (get_replica_engine() if replica else get_engine()).connect() as conn:
+            return _run_with_statement_timeout(conn, func, *args)
+
+    return await asyncio.to_thread(run_on_sync_engine)
+
+
+async def load_schema_cache():
+    """Reflects the app schema at startup so the schema tools are served from memory."""
+    try:
+        started_at = time.perf_counter()
+        tables = await run_with_connection(refresh_schema_cache)
+        logging.info(
+            f"Schema cache loaded: {len(tables)} tables reflected in "
+            f"{(time.perf_counter() - started_at) * 1000:.1f}ms"
+        )
+    except Exception as e:
+        logging.warning(f"Schema cache load failed: {e}")
+
+
+# --- Connection Pool Management ---
+
+
+def _warm_sync_pool(count: int) -> int:
+    """Opens `count` connections on the sync engine concurrently, sets
+    DB_STATEMENT_TIMEOUT on them and returns them to the pool."""
+    with ThreadPoolExecutor(max_workers=count) as warmup_executor:
+        futures = [warmup_executor.submit(get_engine().connect) for _ in range(count)]
+    connections = [future.result() for future in futures if future.exception() is None]
+    try:
+        for connection in connections:
+            apply_statement_timeout(connection, DB_STATEMENT_TIMEOUT)
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+async def _warm_async_pool(count: int) -> int:
+    """Opens `count` connections on the async engine concurrently, sets
+    DB_STATEMENT_TIMEOUT on them and returns them to the pool."""
+    results = await asyncio.gather(
+        *(get_async_engine().connect() for _ in range(count)), return_exceptions=True
+    )
+    connections = [result for result in results if not isinstance(result, Exception)]
+    try:
+        for connection in connections:
+            await connection.run_sync(apply_statement_timeout, DB_STATEMENT_TIMEOUT)
+    finally:
+        for connection in connections:
+            await connection.close()
+    return len(connections)
+
+
+async def warm_connection_pool():
+    """Pre-opens DB_POOL_WARMUP connections on the engine used by the execution mode."""
+    count = min(DB_POOL_WARMUP, DB_POOL_SIZE)
+    if count <= 0:
+        return
+    try:
+        started_at = time.perf_counter()
+        if DB_EXECUTION_MODE == "async":
+            opened = await _warm_async_pool(count)
+        else:
+            opened = await asyncio.to_thread(_warm_sync_pool, count)
+        logging.info(
+            f"Connection pool warmed: {opened}/{count} connections opened in "
+            f"{(time.perf_counter() - started_at) * 1000:.1f}ms"
+        )
+    except Exception as e:
+        logging.warning(f"Connection pool warm-up failed: {e}")
+
+
+def _describe_pool(pool, engine_name: str) -> dict:
+    """Returns occupancy and checkout wait statistics for one connection pool."""
+    checkout_stats = pool_checkout_stats.get(engine_name, {})
+    checkouts = checkout_stats.get("checkouts", 0)
+    return {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checkouts": checkouts,
+        "avg_checkout_wait_ms": round(checkout_stats["wait_ms_total"] / checkouts, 2) if checkouts else 0.0,
+        "max_checkout_wait_ms": round(checkout_stats.get("wait_ms_max", 0.0), 2),
+    }
+
+
+def get_pool_stats(dummy_param: str) -> dict:
+    """Reports connection pool health: checked-out, idle and overflow connections and checkout wait times.
+
+    Args:
+        dummy_param (str): This parameter is not used by the function
+                           but helps ensure schema generation. A non-empty string is expected.
+    Returns:
+        dict: A dictionary with keys 'success' (bool), 'message' (str),
+              'settings' (dict) and 'pools' (dict) with statistics per engine.
+    """
+    pools = {"sync": _describe_pool(get_engine().pool, "sync")}
+    if async_engine is not None:
+        pools["async"] = _describe_pool(async_engine.pool, "async")
+    if replica_engine is not None:
+        pools["replica"] = _describe_pool(replica_engine.pool, "replica")
+    if replica_async_engine is not None:
+        pools["replica_async"] = _describe_pool(replica_async_engine.pool, "replica_async")
+    return {
+        "success": True,
+        "message": f"Pool statistics for {len(pools)} engine(s).",
+        "settings": {**POOL_OPTIONS, "warmup": DB_POOL_WARMUP},
+        "pools": pools,
+    }
+
+
+# --- Read Replica Routing ---
+
+# Latest replica health, updated by check_replica_lag: 'reason' says why reads
+# go to the primary ("unchecked", "lagging" or "unavailable"), None when they
+# may use the replica
+replica_state = {"reason": "unchecked", "lag_seconds": None, "checked_at": None, "error": None}
+# Read-only calls served by the replica, by the primary (by reason), and
+# retried on the primary after failing on the replica
+replica_routing_stats = {"replica": 0, "primary": {}, "fallbacks": 0}
+# When each session last wrote, for read-your-writes; dropped with their session
+_session_writes = weakref.WeakKeyDictionary()
+# The current call's routing decision from route_read(), or None for calls
+# that always use the primary
+_read_route = contextvars.ContextVar("read_route", default=None)
+
+# Seconds the replica is behind the primary: 0 when it has replayed all WAL
+# it received (or is not a standby at all), NULL before it has replayed any.
+# After a restart the standby reports the start of the WAL segment it resumed
+# streaming at, before what it has already replayed, hence <=.
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() <= pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+def measure_replica_lag(conn) -> Optional[float]:
+    lag = conn.execute(text(REPLICA_LAG_QUERY)).scalar()
+    return None if lag is None else float(lag)
+
+
+async def check_replica_lag():
+    """Measures the replica's lag and updates replica_state, logging changes in its health."""
+    previous_reason = replica_state["reason"]
+    try:
+        lag = await run_with_connection(measure_replica_lag, replica=True)
+    except Exception as e:
+        replica_state.update(reason="unavailable", lag_seconds=None, error=str(e))
+    else:
+        lagging = lag is None or lag > DB_REPLICA_MAX_LAG
+        replica_state.update(reason="lagging" if lagging else None, lag_seconds=lag, error=None)
+    replica_state["checked_at"] = time.monotonic()
+    if replica_state["reason"] == previous_reason:
+        return
+    if replica_state["reason"] is None:
+        logging.info(f"Read replica in use, {replica_state['lag_seconds']:.1f}s behind the primary")
+    elif replica_state["reason"] == "lagging":
+        lag = "an unknown time" if lag is None else f"{lag:.1f}s"
+        logging.warning(f"Read replica lagging {lag} behind the primary, reads go to the primary")
+    else:
+        logging.warning(f"Read replica unavailable, reads go to the primary: {replica_state['error']}")
+
+
+async def monitor_replica_lag():
+    """Checks the replica's lag every DB_REPLICA_LAG_CHECK_INTERVAL seconds."""
+    while True:
+        await check_replica_lag()
+        await asyncio.sleep(DB_REPLICA_LAG_CHECK_INTERVAL)
+
+
+def current_session():
+    """Returns the MCP session of the request being handled, if any."""
+    try:
+        return app.request_context.session
+    except LookupError:
+        return None
+
+
+def note_session_write(tool_name: str):
+    """After a call that may have written, pins the session's reads to the primary for a while."""
+    if DATABASE_REPLICA_URI is None or tool_name in READ_ONLY_TOOLS or tool_name not in DB_TOOL_FUNCTIONS:
+        return
+    session = current_session()
+    if session is not None:
+        _session_writes[session] = time.monotonic()
+
+
+def route_read(tool_name: str) -> Optional[dict]:
+    """Decides whether a call of `tool_name` reads from the replica; None if it always uses the primary."""
+    if DATABASE_REPLICA_URI is None or tool_name not in READ_ONLY_TOOLS:
+        return None
+    now = time.monotonic()
+    session = current_session()
+    reason = replica_state["reason"]
+    if session is not None and now - _session_writes.get(session, -math.inf) < DB_READ_YOUR_WRITES_SECONDS:
+        reason = "pinned"
+    elif replica_state["checked_at"] is None or now - replica_state["checked_at"] > 3 * DB_REPLICA_LAG_CHECK_INTERVAL:
+        # The lag check is stuck, e.g. connecting to an unreachable host
+        reason = "unchecked"
+    if reason is None:
+        replica_routing_stats["replica"] += 1
+    else:
+        replica_routing_stats["primary"][reason] = replica_routing_stats["primary"].get(reason, 0) + 1
+    return {"replica": reason is None, "served": False, "error": None}
+
+
+def note_replica_error(context):
+    """Keeps the latest database error of a call on the replica, for run_routed_tool().
+
+    Tools report most errors in their response rather than raising them, so
+    this is where the original exception can still be seen.
+    """
+    read_route = _read_route.get()
+    if read_route is not None:
+        read_route["error"] = context.sqlalchemy_exception or context.original_exception
+
+
+def is_replica_retryable(error: BaseException) -> bool:
+    """Whether a read that failed with `error` on the replica may be run again on the primary.
+
+    Only lost or refused connections and queries the standby cancelled in a
+    recovery conflict qualify. Statement timeouts, cancelled calls and errors
+    in the query itself are returned to the caller.
+    """
+    driver_error = getattr(error, "orig", None) or error
+    # psycopg and asyncpg name the SQLSTATE 'sqlstate', psycopg2 'pgcode'
+    sqlstate = getattr(driver_error, "sqlstate", None) or getattr(driver_error, "pgcode", None)
+    if sqlstate is not None and sqlstate.startswith("40"):
+        # Serialization failures are only expected on a standby in a recovery conflict
+        return sqlstate == "40001" and "conflict with recovery" in str(error)
+    if sqlstate == "57014":  # query_canceled: statement_timeout or a cancelled call
+        return False
+    return isinstance(error, (OperationalError, InterfaceError, DisconnectionError))
+
+
+def replica_failed(error: Exception):
+    """Sends reads to the primary until the next lag check finds the replica reachable."""
+    if replica_state["reason"] != "unavailable":
+        logging.warning(f"Read replica unavailable, reads go to the primary: {error}")
+    replica_state.update(reason="unavailable", error=str(error))
+
+
+def connect_for_call():
+    """Checks out a sync connection for the current call, from the replica if it was routed there.
+
+    Returns the connection and the name of the engine it came from.
+    """
+    read_route = _read_route.get()
+    if read_route is not None and read_route["replica"]:
+        try:
+            connection = get_replica_engine().connect()
+        except Exception as e:
+            replica_failed(e)
+            read_route["replica"] = False
+            replica_routing_stats["fallbacks"] += 1
+        else:
+            read_route["served"] = True
+            return connection, "replica"
+    return get_engine().connect(), "sync"
+
+
+async def connect_async_for_call():
+    """The async engine counterpart of connect_for_call(); returns a started AsyncConnection."""
+    read_route = _read_route.get()
+    if read_route is not None and read_route["replica"]:
+        try:
+            connection = await get_replica_async_engine().connect()
+        except Exception as e:
+            replica_failed(e)
+            read_route["replica"] = False
+            replica_routing_stats["fallbacks"] += 1
+        else:
+            read_route["served"] = True
+            return connection, "replica_async"
+    return await get_async_engine().connect(), "async"
+
+
+async def run_routed_tool(adk_tool_instance, arguments: dict, read_route: Optional[dict]):
+    """Runs a tool call; a read that lost its replica connection or hit a recovery conflict is run again on the primary.
+
+    Any other failure is returned, or raised, unchanged.
+    """
+    try:
+        response = await adk_tool_instance.run_async(
+            args=arguments,
+            tool_context=None,  # type: ignore
+        )
+        if read_route is None or not read_route["served"] or not is_error_response(response):
+            return response
+        error = read_route["error"]
+        if error is None or not is_replica_retryable(error):
+            return response
+    except Exception as e:
+        if read_route is None or not read_route["served"]:
+            raise
+        # Tools such as query_db_table raise database errors wrapped in a ValueError
+        error = read_route["error"] or e
+        if not is_replica_retryable(error):
+            raise
+    # Reads are safe to repeat
+    logging.warning(f"Read '{adk_tool_instance.name}' failed on the replica, retrying on the primary: {error}")
+    replica_routing_stats["fallbacks"] += 1
+    read_route.update(replica=False, served=False, error=None)
+    return await adk_tool_instance.run_async(
+        args=arguments,
+        tool_context=None,  # type: ignore
+    )
+
+
+def get_replica_stats(dummy_param: str) -> dict:
+    """Reports read replica health and how read-only tool calls were routed between replica and primary.
+
+    Args:
+        dummy_param (str): This parameter is not used by the function
+                           but helps ensure schema generation. A non-empty string is expected.
+    Returns:
+        dict: A dictionary with keys 'success' (bool), 'message' (str), 'configured' (bool),
+              'in_use' (bool), 'reason' (str, why reads go to the primary), 'lag_seconds' (float),
+              'checked_seconds_ago' (float), 'error' (str), 'settings' (dict) and 'reads' (dict)
+              with calls served by the replica, by the primary per reason, and fallbacks.
+    """
+    if DATABASE_REPLICA_URI is None:
+        return {"success": True, "message": "No read replica configured.", "configured": False}
+    checked_at = replica_state["checked_at"]
+    in_use = replica_state["reason"] is None
+    return {
+        "success": True,
+        "message": "Reads use the replica." if in_use else f"Reads use the primary: replica {replica_state['reason']}.",
+        "configured": True,
+        "in_use": in_use,
+        "reason": replica_state["reason"],
+        "lag_seconds": replica_state["lag_seconds"],
+        "checked_seconds_ago": None if checked_at is None else round(time.monotonic() - checked_at, 1),
+        "error": replica_state["error"],
+        "settings": {
+            "max_lag_seconds": DB_REPLICA_MAX_LAG,
+            "lag_check_interval_seconds": DB_REPLICA_LAG_CHECK_INTERVAL,
+            "read_your_writes_seconds": DB_READ_YOUR_WRITES_SECONDS,
+        },
+        "reads": replica_routing_stats,
+    }
+
+
+# --- Thread Pool Execution Path ---
+
+# Created on first use by the "threadpool" execution mode
+tool_executor = None
+_tool_semaphores = {}
+
+# Per-tool timings, split into time spent waiting for a worker (saturation)
+# and time spent running the tool (slow SQL)
+executor_stats = {}
+
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    """Return the tool thread pool, creating it on first use."""
+    global tool_executor
+    if tool_executor is None:
+        tool_executor = ThreadPoolExecutor(
+            max_workers=TOOL_THREAD_POOL_SIZE, thread_name_prefix="mcp-tool"
+        )
+    return tool_executor
+
+
+def _get_tool_semaphore(tool_name: str) -> Optional[asyncio.Semaphore]:
+    """Returns the semaphore enforcing a tool's concurrency cap, if it has one."""
+    if tool_name not in TOOL_CONCURRENCY_LIMITS:
+        return None
+    if tool_name not in _tool_semaphores:
+        _tool_semaphores[tool_name] = asyncio.Semaphore(TOOL_CONCURRENCY_LIMITS[tool_name])
+    return _tool_semaphores[tool_name]
+
+
+def _record_executor_timing(tool_name: str, queue_wait: float, execution: float):
+    """Adds one call's queue-wait and execution time to executor_stats."""
+    stats = executor_stats.setdefault(tool_name, {
+        "calls": 0,
+        "queue_wait_ms_total": 0.0,
+        "queue_wait_ms_max": 0.0,
+        "execution_ms_total": 0.0,
+        "execution_ms_max": 0.0,
+    })
+    stats["calls"] += 1
+    stats["queue_wait_ms_total"] += queue_wait * 1000
+    stats["queue_wait_ms_max"] = max(stats["queue_wait_ms_max"], queue_wait * 1000)
+    stats["execution_ms_total"] += execution * 1000
+    stats["execution_ms_max"] = max(stats["execution_ms_max"], execution * 1000)
+
+
+def threadpool_db_tool(func):
+    """Builds an async version of a database tool that runs on the tool thread pool.
+
+    Calls wait on the tool's concurrency cap (if any) and for a free worker;
+    that queue-wait time is recorded separately from the execution time.
+    """
+
+    def timed_call(submitted_at, kwargs):
+        started_at = time.perf_counter()
+        try:
+            return func(**kwargs)
+        finally:
+            finished_at = time.perf_counter()
+            queue_wait = started_at - submitted_at
+            execution = finished_at - started_at
+            _record_executor_timing(func.__name__, queue_wait, execution)
+            add_queue_wait(queue_wait)
+            call_logger.info(
+                "Tool '%s' queue_wait=%.1fms execution=%.1fms",
+                func.__name__, queue_wait * 1000, execution * 1000,
+            )
+
+    @functools.wraps(func)
+    async def threadpool_tool(**kwargs):
+        submitted_at = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        call_connections = CallConnections()
+        token = _call_connections.set(call_connections)
+        # Run in a copy of the caller's context, as asyncio.to_thread does, so
+        # the call's queue wait reaches its _call_phases
+        context_call = functools.partial(contextvars.copy_context().run, timed_call, submitted_at, kwargs)
+        _call_connections.reset(token)
+        semaphore = _get_tool_semaphore(func.__name__)
+        try:
+            if semaphore is None:
+                return await loop.run_in_executor(get_tool_executor(), context_call)
+            async with semaphore:
+                return await loop.run_in_executor(get_tool_executor(), context_call)
+        except asyncio.CancelledError:
+            # The worker thread keeps running the tool; cancelling its query
+            # frees the thread and the connection. A call still queued for a
+            # thread is dropped by the executor.
+            loop.run_in_executor(None, call_connections.cancel)
+            raise
+
+    return threadpool_tool
+
+
+def get_executor_stats(dummy_param: str) -> dict:
+    """Reports thread pool settings and per-tool queue-wait and execution times.
+
+    Args:
+        dummy_param (str): This parameter is not used by the function
+                           but helps ensure schema generation. A non-empty string is expected.
+    Returns:
+        dict: A dictionary with keys 'success' (bool), 'message' (str),
+              'execution_mode' (str), 'thread_pool_size' (int),
+              'concurrency_limits' (dict) and 'tools' (dict) with per-tool timings.
+    """
+    tools = {}
+    for tool_name, stats in executor_stats.items():
+        calls = stats["calls"]
+        tools[tool_name] = {
+            "calls": calls,
+            "avg_queue_wait_ms": round(stats["queue_wait_ms_total"] / calls, 2),
+            "max_queue_wait_ms": round(stats["queue_wait_ms_max"], 2),
+            "avg_execution_ms": round(stats["execution_ms_total"] / calls, 2),
+            "max_execution_ms": round(stats["execution_ms_max"], 2),
+        }
+    return {
+        "success": True,
+        "message": f"Executor statistics for {len(tools)} tools.",
+        "execution_mode": DB_EXECUTION_MODE,
+        "thread_pool_size": TOOL_THREAD_POOL_SIZE,
+        "concurrency_limits": TOOL_CONCURRENCY_LIMITS,
+        "tools": tools,
+    }
+
+
+# --- Server Metrics ---
+
+# Upper bounds, in seconds, of the latency histogram buckets in the Prometheus dump
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Phases of a tool call: waiting for a worker or a pooled connection, running
+# the tool and its SQL, and serializing the response
+METRIC_PHASES = ("queue", "db", "serialize")
+# Response keys holding the records of the read tools
+RECORD_KEYS = ("records", "summary", "students", "users", "teachers")
+
+# Per-tool call metrics, recorded by call_mcp_tool
+tool_metrics = {}
+server_started_at = time.time()
+# Tool calls this process is running right now
+calls_in_flight = 0
+# Phase timings of the tool call in progress. The execution wrappers add their
+# queue wait; call_mcp_tool fills in the rest.
+_call_phases = contextvars.ContextVar("call_phases", default=None)
+
+
+def add_queue_wait(wait: float):
+    """Adds time spent waiting for a worker or connection to the current call's queue phase."""
+    phases = _call_phases.get()
+    if phases is not None:
+        phases["queue"] += wait
+
+
+def is_error_response(response) -> bool:
+    """Whether a tool response reports a failure rather than a result."""
+    return isinstance(response, dict) and (response.get("success") is False or "error" in response)
+
+
+def count_response_rows(response) -> int:
+    """Returns the number of records in a tool response, or 0 if it holds none."""
+    if isinstance(response, NDJSONChunks):
+        return response.rows
+    if isinstance(response, list):
+        return len(response)
+    if isinstance(response, dict):
+        for records_key in RECORD_KEYS:
+            records = response.get(records_key)
+            if isinstance(records, list):
+                return len(records)
+            if isinstance(records, dict):
+                # Columnar format: one array per column
+                return len(next(iter(records.values()), []))
+        if all(isinstance(values, list) for values in response.values()):
+            # query_db_table's columnar format
+            return len(next(iter(response.values()), []))
+    return 0
+
+
+def record_tool_metrics(
+    tool_name: str,
+    phases: dict,
+    total: float,
+    error: bool,
+    rows: int,
+    response_bytes: int,
+    timed_out: bool = False,
+    cancelled: bool = False,
+):
+    """Adds one tool call to tool_metrics."""
+    metrics = tool_metrics.get(tool_name)
+    if metrics is None:
+        metrics = tool_metrics[tool_name] = {
+            "calls": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "cancelled": 0,
+            "rows": 0,
+            "response_bytes": 0,
+            "seconds_total": 0.0,
+            "phase_seconds_total": dict.fromkeys(METRIC_PHASES, 0.0),
+            "bucket_counts": [0] * len(LATENCY_BUCKETS),
+            "recent": collections.deque(maxlen=METRICS_WINDOW),
+        }
+    metrics["calls"] += 1
+    metrics["errors"] += error
+    metrics["timeouts"] += timed_out
+    metrics["cancelled"] += cancelled
+    metrics["rows"] += rows
+    metrics["response_bytes"] += response_bytes
+    metrics["seconds_total"] += total
+    for phase in METRIC_PHASES:
+        metrics["phase_seconds_total"][phase] += phases[phase]
+    bucket = bisect.bisect_left(LATENCY_BUCKETS, total)
+    if bucket < len(LATENCY_BUCKETS):
+        metrics["bucket_counts"][bucket] += 1
+    metrics["recent"].append(total)
+
+
+def _percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+
+def describe_tool_metrics(tool_name: str) -> dict:
+    """Summarizes one tool's metrics in milliseconds."""
+    metrics = tool_metrics[tool_name]
+    calls = metrics["calls"]
+    recent = sorted(metrics["recent"])
+    return {
+        "calls": calls,
+        "errors": metrics["errors"],
+        "timeouts": metrics["timeouts"],
+        "cancelled": metrics["cancelled"],
+        "calls_per_second": round(calls / max(time.time() - server_started_at, 1e-9), 3),
+        "p50_ms": round(_percentile(recent, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(recent, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(recent, 0.99) * 1000, 2),
+        "avg_ms": round(metrics["seconds_total"] / calls * 1000, 2),
+        "avg_phase_ms": {
+            phase: round(seconds / calls * 1000, 2)
+            for phase, seconds in metrics["phase_seconds_total"].items()
+        },
+        "rows": metrics["rows"],
+        "avg_rows": round(metrics["rows"] / calls, 1),
+        "response_bytes": metrics["response_bytes"],
+        "avg_response_bytes": round(metrics["response_bytes"] / calls),
+    }
+
+
+def prometheus_metrics() -> str:
+    """Renders tool_metrics in the Prometheus text exposition format.
+
+    With several HTTP workers each series is also labelled with the worker's pid.
+    """
+    worker = f',worker="{os.getpid()}"' if HTTP_WORKERS > 1 else ""
+    lines = [
+        "# HELP mcp_tool_calls_total Tool calls handled.",
+        "# TYPE mcp_tool_calls_total counter",
+    ]
+    tool_names = sorted(tool_metrics)
+    lines += [f'mcp_tool_calls_total{{tool="{name}"{worker}}} {tool_metrics[name]["calls"]}' for name in tool_names]
+    lines += ["# HELP mcp_tool_errors_total Tool calls that raised or returned success=false.",
+              "# TYPE mcp_tool_errors_total counter"]
+    lines += [f'mcp_tool_errors_total{{tool="{name}"{worker}}} {tool_metrics[name]["errors"]}' for name in tool_names]
+    lines += ["# HELP mcp_tool_timeouts_total Tool calls with a statement cancelled by statement_timeout.",
+              "# TYPE mcp_tool_timeouts_total counter"]
+    lines += [f'mcp_tool_timeouts_total{{tool="{name}"{worker}}} {tool_metrics[name]["timeouts"]}' for name in tool_names]
+    lines += ["# HELP mcp_tool_cancelled_total Tool calls cancelled by the client.",
+              "# TYPE mcp_tool_cancelled_total counter"]
+    lines += [f'mcp_tool_cancelled_total{{tool="{name}"{worker}}} {tool_metrics[name]["cancelled"]}' for name in tool_names]
+    lines += ["# HELP mcp_tool_rows_total Records returned by tool calls.",
+              "# TYPE mcp_tool_rows_total counter"]
+    lines += [f'mcp_tool_rows_total{{tool="{name}"{worker}}} {tool_metrics[name]["rows"]}' for name in tool_names]
+    lines += ["# HELP mcp_tool_response_bytes_total Bytes of serialized tool responses.",
+              "# TYPE mcp_tool_response_bytes_total counter"]
+    lines += [f'mcp_tool_response_bytes_total{{tool="{name}"{worker}}} {tool_metrics[name]["response_bytes"]}' for name in tool_names]
+    lines += ["# HELP mcp_tool_phase_seconds_total Time spent in each phase of tool calls.",
+              "# TYPE mcp_tool_phase_seconds_total counter"]
+    for name in tool_names:
+        for phase, seconds in tool_metrics[name]["phase_seconds_total"].items():
+            lines.append(f'mcp_tool_phase_seconds_total{{tool="{name}",phase="{phase}"{worker}}} {seconds:.6f}')
+    lines += ["# HELP mcp_tool_duration_seconds Tool call latency.",
+              "# TYPE mcp_tool_duration_seconds histogram"]
+    for name in tool_names:
+        metrics = tool_metrics[name]
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, metrics["bucket_counts"]):
+            cumulative += count
+            lines.append(f'mcp_tool_duration_seconds_bucket{{tool="{name}",le="{bound}"{worker}}} {cumulative}')
+        lines.append(f'mcp_tool_duration_seconds_bucket{{tool="{name}",le="+Inf"{worker}}} {metrics["calls"]}')
+        lines.append(f'mcp_tool_duration_seconds_sum{{tool="{name}"{worker}}} {metrics["seconds_total"]:.6f}')
+        lines.append(f'mcp_tool_duration_seconds_count{{tool="{name}"{worker}}} {metrics["calls"]}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus_metrics(path: str):
+    """Writes the Prometheus dump to `path`, replacing it atomically."""
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as metrics_file:
+        metrics_file.write(prometheus_metrics())
+    os.replace(temporary_path, path)
+
+
+def prometheus_metrics_path() -> str:
+    """METRICS_PROMETHEUS_FILE, with the pid before the extension when several HTTP workers each write one."""
+    if HTTP_WORKERS <= 1:
+        return METRICS_PROMETHEUS_FILE
+    root, extension = os.path.splitext(METRICS_PROMETHEUS_FILE)
+    return f"{root}.{os.getpid()}{extension}"
+
+
+async def dump_metrics_periodically():
+    """Writes the Prometheus dump to METRICS_PROMETHEUS_FILE every METRICS_DUMP_INTERVAL seconds."""
+    metrics_path = prometheus_metrics_path()
+    while True:
+        await asyncio.sleep(METRICS_DUMP_INTERVAL)
+        try:
+            await asyncio.to_thread(write_prometheus_metrics, metrics_path)
+        except OSError as e:
+            logging.warning(f"Writing metrics to {metrics_path} failed: {e}")
+
+
+# CPU time and wall clock at the previous worker status, for the recent CPU load
+_last_cpu_sample = (time.process_time(), time.time())
+
+
+def worker_status() -> dict:
+    """This process's load: tool calls, calls in flight, CPU, memory and checked-out connections."""
+    cpu_seconds, now = time.process_time(), time.time()
+    previous_cpu_seconds, previous_time = _last_cpu_sample
+    checked_out = {"sync": engine.pool.checkedout()} if engine is not None else {}
+    if async_engine is not None:
+        checked_out["async"] = async_engine.pool.checkedout()
+    if replica_engine is not None:
+        checked_out["replica"] = replica_engine.pool.checkedout()
+    if replica_async_engine is not None:
+        checked_out["replica_async"] = replica_async_engine.pool.checkedout()
+    return {
+        "pid": os.getpid(),
+        "uptime_seconds": round(now - server_started_at, 1),
+        "updated_at": now,
+        "calls": sum(metrics["calls"] for metrics in tool_metrics.values()),
+        "errors": sum(metrics["errors"] for metrics in tool_metrics.values()),
+        "calls_in_flight": calls_in_flight,
+        "cpu_seconds": round(cpu_seconds, 2),
+        # Since the last status written, i.e. over about WORKER_STATUS_INTERVAL
+        "cpu_percent": round((cpu_seconds - previous_cpu_seconds) / max(now - previous_time, 1e-9) * 100, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "pool_size": DB_POOL_SIZE,
+        "checked_out": checked_out,
+    }
+
+
+def worker_status_path(pid: int) -> str:
+    return os.path.join(WORKER_STATUS_DIR, f"worker-{pid}.json")
+
+
+def write_worker_status():
+    """Writes worker_status() to this worker's file in WORKER_STATUS_DIR, replacing it atomically."""
+    global _last_cpu_sample
+    status = worker_status()
+    _last_cpu_sample = (time.process_time(), time.time())
+    path = worker_status_path(os.getpid())
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as status_file:
+        status_file.write(dumps_json(status))
+    os.replace(temporary_path, path)
+
+
+async def write_worker_status_periodically():
+    """Writes this worker's status every WORKER_STATUS_INTERVAL seconds."""
+    while True:
+        try:
+            await asyncio.to_thread(write_worker_status)
+        except OSError as e:
+            logging.warning(f"Writing worker status to {WORKER_STATUS_DIR} failed: {e}")
+        await asyncio.sleep(WORKER_STATUS_INTERVAL)
+
+
+def get_server_metrics(format: str = "json") -> dict:
+    """Reports per-tool call counts, errors, latency percentiles, phase times, rows and response sizes.
+
+    Args:
+        format (str): 'json' (default) for a per-tool summary, or 'prometheus'
+                      for the Prometheus text exposition format under 'metrics'.
+    Returns:
+        dict: A dictionary with keys 'success' (bool), 'message' (str),
+              'uptime_seconds' (float) and either 'tools' (dict) with metrics per tool,
+              sorted by total time spent, or 'metrics' (str) in Prometheus format.
+    """
+    uptime = round(time.time() - server_started_at, 1)
+    if format == "prometheus":
+        return {
+            "success": True,
+            "message": f"Prometheus metrics for {len(tool_metrics)} tools.",
+            "uptime_seconds": uptime,
+            "metrics": prometheus_metrics(),
+        }
+    if format != "json":
+        return {"success": False, "message": "format must be 'json' or 'prometheus'."}
+    tool_names = sorted(tool_metrics, key=lambda name: tool_metrics[name]["seconds_total"], reverse=True)
+    return {
+        "success": True,
+        "message": f"Metrics for {len(tool_names)} tools over the last {METRICS_WINDOW} calls each.",
+        "uptime_seconds": uptime,
+        "tools": {name: describe_tool_metrics(name) for name in tool_names},
+    }
+
+
+def get_worker_stats(dummy_param: str) -> dict:
+    """Reports the load of each HTTP worker process: tool calls, calls in flight, CPU, memory and pool use.
+
+    Args:
+        dummy_param (str): This parameter is not used by the function
+                           but helps ensure schema generation. A non-empty string is expected.
+    Returns:
+        dict: A dictionary with keys 'success' (bool), 'message' (str), 'workers' (list[dict])
+              with the status of every live worker process (this one included) and
+              'totals' (dict) of calls, errors, calls in flight and CPU over all of them.
+    """
+    statuses = {os.getpid(): worker_status()}
+    if WORKER_STATUS_DIR and os.path.isdir(WORKER_STATUS_DIR):
+        # A file not rewritten for three intervals belongs to a worker that has exited
+        stale_before = time.time() - 3 * WORKER_STATUS_INTERVAL
+        for file_name in os.listdir(WORKER_STATUS_DIR):
+            if not (file_name.startswith("worker-") and file_name.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(WORKER_STATUS_DIR, file_name)) as status_file:
+                    status = json.load(status_file)
+            except (OSError, ValueError):
+                continue
+            if status["updated_at"] >= stale_before:
+                statuses.setdefault(status["pid"], status)
+    workers = [statuses[pid] for pid in sorted(statuses)]
+    totals = {
+        key: round(sum(status[key] for status in workers), 2)
+        for key in ("calls", "errors", "calls_in_flight", "cpu_seconds", "cpu_percent")
+    }
+    return {
+        "success": True,
+        "message": f"Load of {len(workers)} worker process(es).",
+        "workers": workers,
+        "totals": totals,
+    }
+
+
+# --- MCP Server Setup ---
+logging.info(
+    "Creating MCP Server instance for PostgreSQL DB..."
+)  
+app = Server("postgresql-db-mcp-server")
+
+# Database tool functions exposed over MCP, by tool name
+DB_TOOL_FUNCTIONS = {
+    "list_db_tables": list_db_tables,
+    "get_table_schema": get_table_schema,
+    "refresh_schema": refresh_schema,
+    "query_db_table": query_db_table,
+    "insert_data": insert_data,
+    "bulk_insert_data": bulk_insert_data,
+    "delete_data": delete_data,
+    "get_academic_records": get_academic_records,
+    "add_academic_record": add_academic_record,
+    "get_attendance_records": get_attendance_records,
+    "mark_attendance": mark_attendance,
+    "mark_class_attendance": mark_class_attendance,
+    "get_attendance_summary": get_attendance_summary,
+    "setup_attendance_rollup": setup_attendance_rollup,
+    "get_behavior_records": get_behavior_records,
+    "add_behavior_record": add_behavior_record,
+    "get_behavior_summary": get_behavior_summary,
+    "setup_behavior_rollup": setup_behavior_rollup,
+    "check_behavior_rollup": check_behavior_rollup,
+    "get_students": get_students,
+    "add_student": add_student,
+    "update_student": update_student,
+    "get_students_by_class": get_students_by_class,
+    "get_users": get_users,
+    "add_user": add_user,
+    "update_user": update_user,
+    "get_users_by_role": get_users_by_role,
+    "get_teachers_by_subject": get_teachers_by_subject,
+    "search_students": search_students,
+    "search_users": search_users,
+    "setup_search_indexes": setup_search_indexes,
+    "check_search_indexes": check_search_indexes,
+    "advise_indexes": advise_indexes,
+    "batch": batch,
+}
+
+# Database tools that never write; with a read replica configured they run there
+READ_ONLY_TOOLS = frozenset({
+    "list_db_tables",
+    "get_table_schema",
+    "query_db_table",
+    "get_academic_records",
+    "get_attendance_records",
+    "get_attendance_summary",
+    "get_behavior_records",
+    "get_behavior_summary",
+    "get_students",
+    "get_students_by_class",
+    "get_users",
+    "get_users_by_role",
+    "get_teachers_by_subject",
+    "search_students",
+    "search_users",
+})
+
+# Read-only tools whose connections run in autocommit mode. psycopg 3 drops a
+# connection's prepared statements whenever it rolls back a transaction, as
+# the pool does when a call returns a connection with one still open; in
+# READ COMMITTED every statement takes its own snapshot anyway. query_db_table
+# keeps its transaction, which streaming's server-side cursor needs.
+AUTOCOMMIT_TOOLS = READ_ONLY_TOOLS - {"query_db_table"}
+
+# Server administration tools; these run inline in every execution mode
+ADMIN_TOOL_FUNCTIONS = {
+    "get_executor_stats": get_executor_stats,
+    "get_pool_stats": get_pool_stats,
+    "get_statement_cache_stats": get_statement_cache_stats,
+    "get_server_metrics": get_server_metrics,
+    "get_worker_stats": get_worker_stats,
+    "get_replica_stats": get_replica_stats,
+}
+
+# ADK FunctionTool registries built from the functions above by
+# load_tool_registries(): ADK_DB_TOOLS runs the tools inline, the async and
+# thread pool registries are used by the matching DB_EXECUTION_MODE.
+ADK_DB_TOOLS = None
+ADK_ASYNC_DB_TOOLS = None
+ADK_THREADPOOL_DB_TOOLS = None
+ADK_ADMIN_TOOLS = None
+_registry_lock = threading.Lock()
+
+# MCP tool schemas advertised by list_tools, computed once
+_mcp_tools = None
+# Background import of google.adk started after the client handshake
+_registry_preload_task = None
+
+
+def load_tool_registries():
+    """Imports google.adk and wraps the tool functions as ADK FunctionTools, once."""
+    global ADK_DB_TOOLS, ADK_ASYNC_DB_TOOLS, ADK_THREADPOOL_DB_TOOLS, ADK_ADMIN_TOOLS
+    with _registry_lock:
+        if ADK_DB_TOOLS is not None:
+            return
+        started_at = time.perf_counter()
+        from google.adk.tools.function_tool import FunctionTool
+
+        ADK_ASYNC_DB_TOOLS = {
+            tool_name: FunctionTool(func=async_db_tool(func))
+            for tool_name, func in DB_TOOL_FUNCTIONS.items()
+        }
+        ADK_THREADPOOL_DB_TOOLS = {
+            tool_name: FunctionTool(func=threadpool_db_tool(func))
+            for tool_name, func in DB_TOOL_FUNCTIONS.items()
+        }
+        ADK_ADMIN_TOOLS = {
+            tool_name: FunctionTool(func=func) for tool_name, func in ADMIN_TOOL_FUNCTIONS.items()
+        }
+        # Assigned last: other threads treat a non-None ADK_DB_TOOLS as "loaded"
+        ADK_DB_TOOLS = {
+            tool_name: FunctionTool(func=func) for tool_name, func in DB_TOOL_FUNCTIONS.items()
+        }
+        logging.info(
+            f"ADK tool registries loaded in {(time.perf_counter() - started_at) * 1000:.1f}ms"
+        )
+
+
+def get_tool_registry() -> dict:
+    """Returns the database tool registry matching the configured execution mode."""
+    if ADK_DB_TOOLS is None:
+        load_tool_registries()
+    if DB_EXECUTION_MODE == "async":
+        return ADK_ASYNC_DB_TOOLS
+    if DB_EXECUTION_MODE == "threadpool":
+        return ADK_THREADPOOL_DB_TOOLS
+    return ADK_DB_TOOLS
+
+
+def tool_fingerprint() -> str:
+    """Hashes every tool's name, signature and docstring; changes whenever a schema would."""
+    digest = hashlib.sha256()
+    for tool_name, func in sorted({**DB_TOOL_FUNCTIONS, **ADMIN_TOOL_FUNCTIONS}.items()):
+        digest.update(f"{tool_name}{inspect.signature(func)}{func.__doc__}".encode())
+    return digest.hexdigest()
+
+
+def build_mcp_tools() -> list[mcp_types.Tool]:
+    """Converts every ADK tool to its MCP tool schema."""
+    from google.adk.tools.mcp_tool.conversion_utils import adk_to_mcp_tool_type
+
+    get_tool_registry()
+    mcp_tools_list = []
+    for tool_name, adk_tool_instance in {**ADK_DB_TOOLS, **ADK_ADMIN_TOOLS}.items():
+        if not adk_tool_instance.name:
+            adk_tool_instance.name = tool_name
+        mcp_tools_list.append(adk_to_mcp_tool_type(adk_tool_instance))
+    return mcp_tools_list
+
+
+def load_tool_manifest() -> Optional[list[mcp_types.Tool]]:
+    """Loads the tool schemas from TOOL_MANIFEST_PATH, or None if missing, stale or unreadable."""
+    try:
+        with open(TOOL_MANIFEST_PATH) as manifest_file:
+            manifest = json.load(manifest_file)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        logging.warning(f"Tool manifest {TOOL_MANIFEST_PATH} is unreadable, computing the tool schemas: {e}")
+        return None
+    if not isinstance(manifest, dict) or manifest.get("fingerprint") != tool_fingerprint():
+        logging.warning(
+            f"Tool manifest {TOOL_MANIFEST_PATH} is stale; run `python server.py --generate-manifest`."
+        )
+        return None
+    try:
+        return [mcp_types.Tool.model_validate(tool) for tool in manifest["tools"]]
+    except (ValueError, KeyError, TypeError) as e:
+        # pydantic's ValidationError is a ValueError
+        logging.warning(f"Tool manifest {TOOL_MANIFEST_PATH} is unreadable, computing the tool schemas: {e}")
+        return None
+
+
+def write_tool_manifest():
+    """Writes the current tool schemas to TOOL_MANIFEST_PATH."""
+    tools = build_mcp_tools()
+    manifest = {
+        "fingerprint": tool_fingerprint(),
+        "tools": [tool.model_dump(mode="json", exclude_none=True) for tool in tools],
+    }
+    with open(TOOL_MANIFEST_PATH, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    return len(tools)
+
+
+def get_mcp_tools() -> list[mcp_types.Tool]:
+    """Returns the advertised tool schemas, computing them on first use."""
+    global _mcp_tools
+    if _mcp_tools is None:
+        tools = load_tool_manifest() if FAST_START else None
+        if tools is None:
+            tools = build_mcp_tools()
+        logging.info(f"MCP Server: Advertising {len(tools)} tools.")
+        logging.debug(f"MCP Server: Tools: {[tool.name for tool in tools]}")
+        _mcp_tools = tools
+    return _mcp_tools
+
+
+if not FAST_START:
+    load_tool_registries()
+
+
+async def ensure_tool_registries():
+    """Loads the ADK tool registries if needed, waiting off the event loop.
+
+    The preload thread may hold _registry_lock for seconds while it imports
+    google.adk; blocking on the lock here would stall every other request.
+    """
+    if ADK_DB_TOOLS is None:
+        await asyncio.to_thread(load_tool_registries)
+
+
+def start_registry_preload():
+    """Starts building the ADK tool registries in a background thread, once."""
+    global _registry_preload_task
+    if ADK_DB_TOOLS is None and _registry_preload_task is None:
+        _registry_preload_task = asyncio.create_task(asyncio.to_thread(load_tool_registries))
+
+
+@app.list_tools()
+async def list_mcp_tools() -> list[mcp_types.Tool]:
+    """MCP handler to list tools this server exposes."""
+    logging.info(
+        "MCP Server: Received list_tools request."
+    )  # Changed print to logging.info
+    # The handshake is done; import google.adk in the background so the
+    # first tool call finds the registries loaded
+    start_registry_preload()
+    if _mcp_tools is None:
+        # Without a current manifest the schemas are computed from the ADK tools
+        return await asyncio.to_thread(get_mcp_tools)
+    return _mcp_tools
+
+
+def log_tool_response(name: str, response_texts: list[str]):
+    """Logs a tool response's size and, for sampled calls, its first LOG_RESPONSE_CHARS characters."""
+    if not call_logger.isEnabledFor(logging.INFO):
+        return
+    response_size = sum(len(response_text) for response_text in response_texts)
+    if LOG_RESPONSE_SAMPLE_RATE < 1 and random.random() >= LOG_RESPONSE_SAMPLE_RATE:
+        call_logger.info("MCP Server: ADK tool '%s' executed. Response: %d chars", name, response_size)
+        return
+    preview = response_texts[0][:LOG_RESPONSE_CHARS] if response_texts else ""
+    if response_size > len(preview):
+        preview += f"... [{response_size - len(preview)} more chars]"
+    call_logger.info("MCP Server: ADK tool '%s' executed. Response: %s", name, preview)
+
+
+# Set by run_mcp_http_server; the stdio transport serves one session and is not capped
+session_concurrency_limit = None
+# Per-session semaphores enforcing session_concurrency_limit, dropped with their session
+_session_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_session_semaphore() -> Optional[asyncio.Semaphore]:
+    """Returns the semaphore capping the current MCP session's concurrent tool calls, if any."""
+    session = current_session()
+    if session_concurrency_limit is None or session is None:
+        return None
+    semaphore = _session_semaphores.get(session)
+    if semaphore is None:
+        semaphore = _session_semaphores[session] = asyncio.Semaphore(session_concurrency_limit)
+    return semaphore
+
+
+@app.call_tool()
+async def call_mcp_tool(name: str, arguments: dict) -> list[mcp_types.TextContent]:
+    """MCP handler to execute a tool call requested by an MCP client."""
+    global calls_in_flight
+    call_logger.info(
+        "MCP Server: Received call_tool request for '%s' with args: %s", name, _log_repr.repr(arguments)
+    )
+
+    await ensure_tool_registries()
+    adk_tool_instance = get_tool_registry().get(name) or ADK_ADMIN_TOOLS.get(name)
+    if adk_tool_instance is not None:
+        phases = dict.fromkeys(METRIC_PHASES, 0.0)
+        phases_token = _call_phases.set(phases)
+        started_at = time.perf_counter()
+        session_semaphore = get_session_semaphore()
+        read_route = route_read(name)
+        route_token = _read_route.set(read_route)
+        timeout_token = _statement_timeout.set(statement_timeout_for(name))
+        autocommit_token = _autocommit_call.set(name in AUTOCOMMIT_TOOLS)
+        calls_in_flight += 1
+        try:
+            async with session_semaphore if session_semaphore is not None else contextlib.nullcontext():
+                phases["queue"] += time.perf_counter() - started_at
+                adk_tool_response = await run_routed_tool(adk_tool_instance, arguments, read_route)
+            executed_at = time.perf_counter()
+            if isinstance(adk_tool_response, NDJSONChunks):
+                response_texts = list(adk_tool_response)
+            else:
+                response_texts = [dumps_json(adk_tool_response, pretty=JSON_PRETTY)]
+            finished_at = time.perf_counter()
+            phases["db"] = executed_at - started_at - phases["queue"]
+            phases["serialize"] = finished_at - executed_at
+            record_tool_metrics(
+                name,
+                phases,
+                finished_at - started_at,
+                error=is_error_response(adk_tool_response),
+                rows=count_response_rows(adk_tool_response),
+                response_bytes=sum(len(response_text.encode()) for response_text in response_texts),
+                timed_out=is_error_response(adk_tool_response) and STATEMENT_TIMEOUT_MESSAGE in str(adk_tool_response),
+            )
+            log_tool_response(name, response_texts)
+            return [mcp_types.TextContent(type="text", text=response_text) for response_text in response_texts]
+
+        except asyncio.CancelledError:
+            phases["db"] = time.perf_counter() - started_at - phases["queue"]
+            record_tool_metrics(
+                name, phases, time.perf_counter() - started_at, error=False, rows=0, response_bytes=0, cancelled=True
+            )
+            call_logger.info("Tool '%s' cancelled after %.1fms", name, (time.perf_counter() - started_at) * 1000)
+            raise
+        except Exception as e:
+            phases["db"] = time.perf_counter() - started_at - phases["queue"]
+            record_tool_metrics(
+                name, phases, time.perf_counter() - started_at, error=True, rows=0, response_bytes=0,
+                timed_out=STATEMENT_TIMEOUT_MESSAGE in str(e),
+            )
+            logging.error(
+                f"MCP Server: Error executing ADK tool '{name}': {e}", exc_info=True
+            )  # Changed print to logging.error, added exc_info
+            error_payload = {
+                "success": False,
+                "message": f"Failed to execute tool '{name}': {str(e)}",
+            }
+            error_text = dumps_json(error_payload)
+            return [mcp_types.TextContent(type="text", text=error_text)]
+        finally:
+            calls_in_flight -= 1
+            note_session_write(name)
+            _autocommit_call.reset(autocommit_token)
+            _statement_timeout.reset(timeout_token)
+            _read_route.reset(route_token)
+            _call_phases.reset(phases_token)
+    else:
+        logging.warning(
+            f"MCP Server: Tool '{name}' not found/exposed by this server."
+        )  # Changed print to logging.warning
+        error_payload = {
+            "success": False,
+            "message": f"Tool '{name}' not implemented by this server.",
+        }
+        error_text = dumps_json(error_payload)
+        return [mcp_types.TextContent(type="text", text=error_text)]
+
+
+# --- MCP Server Runner ---
+def server_initialization_options() -> InitializationOptions:
+    """The options every transport starts an MCP session with."""
+    return InitializationOptions(
+        server_name=app.name,
+        server_version="0.1.0",
+        capabilities=app.get_capabilities(
+            notification_options=NotificationOptions(),
+            experimental_capabilities={},
+        ),
+    )
+
+
+@contextlib.asynccontextmanager
+async def server_lifespan():
+    """Runs the startup tasks alongside the server and releases the engines when it stops."""
+    # Warm the pool alongside the handshake rather than delaying it
+    warmup_task = asyncio.create_task(warm_connection_pool())
+    schema_task = asyncio.create_task(load_schema_cache())
+    metrics_task = (
+        asyncio.create_task(dump_metrics_periodically()) if METRICS_PROMETHEUS_FILE else None
+    )
+    status_task = (
+        asyncio.create_task(write_worker_status_periodically()) if WORKER_STATUS_DIR else None
+    )
+    replica_task = asyncio.create_task(monitor_replica_lag()) if DATABASE_REPLICA_URI else None
+    try:
+        yield
+    finally:
+        await warmup_task
+        await schema_task
+        if _registry_preload_task is not None:
+            await _registry_preload_task
+        if metrics_task is not None:
+            metrics_task.cancel()
+            if HTTP_WORKERS > 1:
+                # A retired worker's series end with it; its replacement writes its own file
+                with contextlib.suppress(OSError):
+                    os.remove(prometheus_metrics_path())
+            else:
+                write_prometheus_metrics(METRICS_PROMETHEUS_FILE)
+        if status_task is not None:
+            status_task.cancel()
+            with contextlib.suppress(OSError):
+                os.remove(worker_status_path(os.getpid()))
+        if replica_task is not None:
+            replica_task.cancel()
+        if async_engine is not None:
+            await async_engine.dispose()
+        if replica_async_engine is not None:
+            await replica_async_engine.dispose()
+        if tool_executor is not None:
+            tool_executor.shutdown(wait=False)
+
+
+async def run_mcp_stdio_server():
+    """Runs the MCP server, listening for connections over standard input/output."""
+    async with server_lifespan():
+        async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
+            logging.info(
+                "MCP Stdio Server: Starting handshake with client..."
+            )  # Changed print to logging.info
+            await app.run(read_stream, write_stream, server_initialization_options())
+            logging.info(
+                "MCP Stdio Server: Run loop finished or client disconnected."
+            )  # Changed print to logging.info
+
+
+class StreamableHTTPEndpoint:
+    """ASGI endpoint handing /mcp requests to the streamable HTTP session manager."""
+
+    def __init__(self, session_manager):
+        self.session_manager = session_manager
+
+    async def __call__(self, scope, receive, send):
+        await self.session_manager.handle_request(scope, receive, send)
+
+
+class WorkerRecycler:
+    """ASGI middleware retiring an HTTP worker after its request limit.
+
+    Once the limit is reached the worker drains: every response asks the
+    client to close its connection, so clients reconnect (reaching any worker)
+    instead of sending more requests down a connection that is about to be
+    closed. After HTTP_WORKER_DRAIN_SECONDS the worker sends itself SIGTERM,
+    uvicorn finishes the requests in flight, and the supervisor starts a
+    replacement.
+    """
+
+    def __init__(self, app, max_requests: int):
+        self.app = app
+        self.max_requests = max_requests + random.randint(0, HTTP_WORKER_MAX_REQUESTS_JITTER)
+        self.requests = 0
+        self.draining = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        self.requests += 1
+        if not self.draining and self.requests >= self.max_requests:
+            self.draining = True
+            logging.info(
+                f"Worker {os.getpid()} served {self.requests} requests; "
+                f"exiting after a {HTTP_WORKER_DRAIN_SECONDS:g}s drain"
+            )
+            asyncio.get_running_loop().call_later(
+                HTTP_WORKER_DRAIN_SECONDS, os.kill, os.getpid(), signal.SIGTERM
+            )
+        if not self.draining:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_close(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"connection", b"close")]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_close)
+
+
+def build_http_app():
+    """Builds the Starlette app serving `app` over streamable HTTP (/mcp) and SSE (/sse).
+
+    Every session runs in this process, so all clients share one set of
+    engines, connection pools and caches. Each of several HTTP workers builds
+    its own app; they serve stateless streamable HTTP only.
+    """
+    from mcp.server.sse import SseServerTransport
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+    from starlette.applications import Starlette
+    from starlette.middleware import Middleware
+    from starlette.responses import PlainTextResponse, Response
+    from starlette.routing import Mount, Route
+
+    global session_concurrency_limit
+    session_concurrency_limit = SESSION_CONCURRENCY_LIMIT
+    # Several workers cannot share sessions, and their responses are plain JSON
+    # rather than SSE streams, which are cut off when a worker is recycled
+    session_manager = StreamableHTTPSessionManager(
+        app=app,
+        stateless=HTTP_STATELESS or HTTP_WORKERS > 1,
+        json_response=HTTP_JSON_RESPONSE or HTTP_WORKERS > 1,
+    )
+    sse_transport = SseServerTransport("/messages/")
+
+    async def handle_sse(request):
+        async with sse_transport.connect_sse(
+            request.scope, request.receive, request._send
+        ) as (read_stream, write_stream):
+            await app.run(read_stream, write_stream, server_initialization_options())
+        return Response()
+
+    async def handle_health(request):
+        return PlainTextResponse("ok")
+
+    async def handle_metrics(request):
+        return PlainTextResponse(prometheus_metrics(), media_type="text/plain; version=0.0.4")
+
+    async def handle_workers(request):
+        return Response(dumps_json(get_worker_stats("")), media_type="application/json")
+
+    @contextlib.asynccontextmanager
+    async def lifespan(starlette_app):
+        async with server_lifespan(), session_manager.run():
+            # No handshake is waiting on it here, and with several workers a
+            # worker's first request may be a tool call without a list_tools first
+            start_registry_preload()
+            yield
+
+    routes = [
+        Route("/mcp", endpoint=StreamableHTTPEndpoint(session_manager)),
+        Route("/healthz", endpoint=handle_health, methods=["GET"]),
+        Route("/metrics", endpoint=handle_metrics, methods=["GET"]),
+        Route("/workers", endpoint=handle_workers, methods=["GET"]),
+    ]
+    if HTTP_WORKERS <= 1:
+        routes += [
+            Route("/sse", endpoint=handle_sse, methods=["GET"]),
+            Mount("/messages/", app=sse_transport.handle_post_message),
+        ]
+    middleware = []
+    if HTTP_WORKERS > 1 and HTTP_WORKER_MAX_REQUESTS:
+        middleware.append(Middleware(WorkerRecycler, max_requests=HTTP_WORKER_MAX_REQUESTS))
+    return Starlette(routes=routes, middleware=middleware, lifespan=lifespan)
+
+
+def worker_pool_size(workers: int) -> int:
+    """The fixed pool size of each worker's tool engines when DB_CONNECTION_BUDGET is split evenly over `workers`.
+
+    A worker's share is split between the primary and, if configured, the
+    replica. In async mode each of them also has a sync engine, held to one
+    connection by run_mcp_http_server, which is taken out of the share first.
+    """
+    databases = 2 if DATABASE_REPLICA_URI else 1
+    pool_size = DB_CONNECTION_BUDGET // workers // databases - (DB_EXECUTION_MODE == "async")
+    if pool_size < 1:
+        raise ValueError(f"DB_CONNECTION_BUDGET={DB_CONNECTION_BUDGET} is too small for {workers} workers.")
+    return pool_size
+
+
+def run_mcp_http_server(host: str, port: int, workers: int = 1):
+    """Serves the MCP server over HTTP with uvicorn until interrupted.
+
+    With several workers, uvicorn's supervisor starts them as processes sharing
+    one listening socket, replaces any that exit (see WorkerRecycler), and
+    restarts them one at a time on SIGHUP. Workers read their settings from the environment at import,
+    so the per-worker ones are put there first.
+    """
+    import uvicorn
+
+    if workers <= 1:
+        logging.info(f"MCP HTTP Server: Listening on http://{host}:{port}/mcp and /sse")
+        # log_config=None keeps uvicorn's loggers on the queue-backed activity log
+        uvicorn.run(
+            build_http_app(),
+            host=host,
+            port=port,
+            log_config=None,
+            access_log=False,
+            timeout_graceful_shutdown=HTTP_GRACEFUL_TIMEOUT,
+        )
+        return
+
+    import multiprocessing
+    from uvicorn.supervisors import Multiprocess
+
+    os.environ["HTTP_WORKERS"] = str(workers)
+    if DB_CONNECTION_BUDGET:
+        os.environ["DB_POOL_SIZE"] = str(worker_pool_size(workers))
+        os.environ["DB_SECONDARY_POOL_SIZE"] = "1"
+        os.environ["DB_MAX_OVERFLOW"] = "0"
+    status_dir = WORKER_STATUS_DIR or tempfile.mkdtemp(prefix="mcp-workers-")
+    os.environ["WORKER_STATUS_DIR"] = status_dir
+
+    # Workers put their log records on this queue; this process writes them to the activity log
+    worker_log_queue = multiprocessing.get_context("spawn").Queue()
+    worker_log_listener = logging.handlers.QueueListener(
+        worker_log_queue, *log_listener.handlers, respect_handler_level=True
+    )
+    config = uvicorn.Config(
+        "server:build_http_app",
+        factory=True,
+        host=host,
+        port=port,
+        workers=workers,
+        log_config=None,
+        access_log=False,
+        timeout_graceful_shutdown=HTTP_GRACEFUL_TIMEOUT,
+    )
+    # Set after Config() has configured this process's logging, so only the workers apply it
+    config.log_config = {
+        "version": 1,
+        "disable_existing_loggers": False,
+        "handlers": {"supervisor": {"()": "logging.handlers.QueueHandler", "queue": worker_log_queue}},
+        "root": {"handlers": ["supervisor"], "level": LOG_LEVEL},
+    }
+    logging.info(
+        f"MCP HTTP Server: Starting {workers} workers on http://{host}:{port}/mcp, "
+        f"pool size {os.environ.get('DB_POOL_SIZE', DB_POOL_SIZE)} each"
+    )
+    # uvicorn binds the socket without naming its protocol, and asyncio only
+    # turns on TCP_NODELAY for connections on IPPROTO_TCP sockets. Without it
+    # every keep-alive request waits ~40ms on Nagle's algorithm and delayed ACKs.
+    bound_socket = config.bind_socket()
+    listen_socket = socket.socket(
+        bound_socket.family, bound_socket.type, socket.IPPROTO_TCP, fileno=bound_socket.detach()
+    )
+    worker_log_listener.start()
+    try:
+        Multiprocess(config, sockets=[listen_socket]).run()
+    finally:
+        worker_log_listener.stop()
+        if not WORKER_STATUS_DIR:
+            shutil.rmtree(status_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PostgreSQL DB MCP Server")
+    parser.add_argument(
+        "--generate-manifest",
+        action="store_true",
+        help=f"Write the tool schemas to {TOOL_MANIFEST_PATH} and exit.",
+    )
+    parser.add_argument(
+        "--transport",
+        choices=("stdio", "http"),
+        default=MCP_TRANSPORT,
+        help="Serve one client over stdio, or many over streamable HTTP and SSE.",
+    )
+    parser.add_argument("--host", default=HTTP_HOST, help="HTTP transport bind address.")
+    parser.add_argument("--port", type=int, default=HTTP_PORT, help="HTTP transport port.")
+    parser.add_argument(
+        "--workers", type=int, default=HTTP_WORKERS, help="HTTP transport worker processes."
+    )
+    cli_args = parser.parse_args()
+    if cli_args.generate_manifest:
+        tool_count = write_tool_manifest()
+        print(f"Wrote {tool_count} tool schemas to {TOOL_MANIFEST_PATH}")
+        raise SystemExit(0)
+
+    logging.info(
+        f"Launching PostgreSQL DB MCP Server via {cli_args.transport}..."
+    )
+    try:
+        if cli_args.transport == "http":
+            run_mcp_http_server(cli_args.host, cli_args.port, cli_args.workers)
+        else:
+            asyncio.run(run_mcp_stdio_server())
     except KeyboardInterrupt:
         logging.info(
-            "\nMCP Server (stdio) stopped by user."
+            f"\nMCP Server ({cli_args.transport}) stopped by user."
         )
     except Exception as e:
         logging.critical(
-            f"MCP Server (stdio) encountered an unhandled error: {e}", exc_info=True
+            f"MCP Server ({cli_args.transport}) encountered an unhandled error: {e}", exc_info=True
         )
     finally:
         logging.info(
-            "MCP Server (stdio) process exiting."
+            f"MCP Server ({cli_args.transport}) process exiting."
         )
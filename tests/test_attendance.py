@@ -0,0 +1,167 @@
+import re
+from datetime import date
+
+import pytest
+
+import server
+
+
+class FakeResult:
+    def __init__(self, value, columns=()):
+        self.value = value
+        self.columns = columns
+
+    def scalar(self):
+        return self.value
+
+    def keys(self):
+        return self.columns
+
+    def fetchall(self):
+        return self.value
+
+
+class FakeConnection:
+    """Answers the unique index check and counts how often it was asked."""
+
+    def __init__(self, has_index):
+        self.has_index = has_index
+        self.checks = 0
+
+    def execute(self, statement, params=None):
+        self.checks += 1
+        return FakeResult(self.has_index)
+
+
+@pytest.fixture(autouse=True)
+def reset_index_check(monkeypatch):
+    monkeypatch.setattr(server, "_attendance_unique_index", None)
+
+
+def test_upsert_uses_on_conflict_with_unique_index():
+    conn = FakeConnection(has_index=True)
+    query = server.attendance_upsert(conn, "VALUES (1, CURRENT_DATE, 'present', NULL)")
+    assert "ON CONFLICT (student_id, attendance_date)" in query
+    assert "VALUES (1, CURRENT_DATE, 'present', NULL)" in query
+
+
+def test_upsert_falls_back_without_unique_index():
+    conn = FakeConnection(has_index=False)
+    query = server.attendance_upsert(conn, "VALUES (1, CURRENT_DATE, 'present', NULL)")
+    assert "ON CONFLICT" not in query
+    assert "UPDATE app.attendance" in query
+    assert "INSERT INTO app.attendance" in query
+
+
+def test_index_is_checked_once():
+    conn = FakeConnection(has_index=False)
+    for _ in range(3):
+        server.attendance_upsert(conn, "VALUES (1, CURRENT_DATE, 'present', NULL)")
+    assert conn.checks == 1
+
+
+@pytest.mark.parametrize("statuses, notes, unlisted", [
+    ({"3": "late"}, None, "[3]"),
+    (None, {"4": "Doctor's appointment"}, "[4]"),
+    ({"1": "absent", "5": "late"}, {"6": "Left early"}, "[5, 6]"),
+])
+def test_class_attendance_rejects_students_not_in_student_ids(monkeypatch, statuses, notes, unlisted):
+    def no_database():
+        raise AssertionError("the request should be rejected before connecting")
+
+    monkeypatch.setattr(server, "get_db_connection", no_database)
+    response = server.mark_class_attendance(
+        "2024-01-15", student_ids=[1, 2], statuses=statuses, notes=notes
+    )
+    assert response["success"] is False
+    assert unlisted in response["message"]
+
+
+SUMMARY_COLUMNS = (
+    "student_id", "student_name", "total_days", "present_days", "absent_days", "late_days", "attendance_percentage",
+)
+
+
+class SummaryConnection:
+    """Records the summary query and its parameters and returns one summary row."""
+
+    def __init__(self):
+        self.queries = []
+
+    def execute(self, statement, params=None):
+        self.queries.append((str(statement), params))
+        return FakeResult([(1, "A", 20, 18, 1, 1, 90.0)], SUMMARY_COLUMNS)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def summary_connection(monkeypatch):
+    conn = SummaryConnection()
+    monkeypatch.setattr(server, "get_db_connection", lambda: conn)
+    return conn
+
+
+def reads_base_table(query):
+    return re.search(r"FROM app\.attendance\b(?!_)", query) is not None
+
+
+def use_rollup(monkeypatch, rollup):
+    tables = {"attendance": object(), "students": object()}
+    if rollup:
+        tables["attendance_monthly"] = object()
+    monkeypatch.setattr(server, "get_schema_tables", lambda force_refresh=False: tables)
+
+
+def test_summary_of_whole_months_reads_only_the_rollup(monkeypatch, summary_connection):
+    use_rollup(monkeypatch, True)
+    response = server.get_attendance_summary(student_id=1, start_date="2024-01-01", end_date="2024-03-31")
+    assert response["summary"] == [dict(zip(SUMMARY_COLUMNS, (1, "A", 20, 18, 1, 1, 90.0)))]
+    [(query, params)] = summary_connection.queries
+    assert "FROM app.attendance_monthly" in query
+    assert not reads_base_table(query)
+    assert params == {"student_id": 1, "months_from": date(2024, 1, 1), "months_to": date(2024, 4, 1)}
+
+
+def test_summary_counts_partial_months_from_the_base_table(monkeypatch, summary_connection):
+    use_rollup(monkeypatch, True)
+    server.get_attendance_summary(start_date="2024-01-15", end_date="2024-03-10")
+    [(query, params)] = summary_connection.queries
+    assert "FROM app.attendance_monthly" in query
+    assert reads_base_table(query)
+    assert params == {
+        "months_from": date(2024, 2, 1),
+        "months_to": date(2024, 3, 1),
+        "range_from_0": date(2024, 1, 15),
+        "range_to_0": date(2024, 2, 1),
+        "range_from_1": date(2024, 3, 1),
+        "range_to_1": date(2024, 3, 11),
+    }
+
+
+def test_summary_within_one_month_reads_only_the_base_table(monkeypatch, summary_connection):
+    use_rollup(monkeypatch, True)
+    server.get_attendance_summary(start_date="2024-01-10", end_date="2024-01-20")
+    [(query, params)] = summary_connection.queries
+    assert "attendance_monthly" not in query
+    assert reads_base_table(query)
+
+
+def test_summary_without_rollup_aggregates_the_base_table(monkeypatch, summary_connection):
+    use_rollup(monkeypatch, False)
+    response = server.get_attendance_summary(student_id=1, start_date="2024-01-01", end_date="2024-03-31")
+    assert response["success"] is True
+    assert len(response["summary"]) == 1
+    [(query, params)] = summary_connection.queries
+    assert "attendance_monthly" not in query
+    assert reads_base_table(query)
+    assert params == {"student_id": 1, "start_date": "2024-01-01", "end_date": "2024-03-31"}
+
+
+def test_rollup_triggers_are_dropped_and_created_again():
+    statements = [" ".join(statement.split()) for statement in server.ATTENDANCE_ROLLUP_DDL]
+    assert not any("CREATE OR REPLACE TRIGGER" in statement for statement in statements)
+    for trigger in ("attendance_monthly_insert", "attendance_monthly_update", "attendance_monthly_delete"):
+        drop = statements.index(f"DROP TRIGGER IF EXISTS {trigger} ON app.attendance")
+        assert statements[drop + 1].startswith(f"CREATE TRIGGER {trigger} ")
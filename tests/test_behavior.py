@@ -0,0 +1,105 @@
+import re
+from datetime import date
+
+import pytest
+
+import server
+
+SUMMARY_COLUMNS = (
+    "student_id", "student_name", "total_records", "avg_sentiment_score", "min_sentiment_score",
+    "max_sentiment_score", "positive_records", "negative_records", "neutral_records",
+)
+SUMMARY_ROW = (1, "A", 4, 0.5, -1, 2, 2, 1, 1)
+
+
+class FakeResult:
+    def keys(self):
+        return SUMMARY_COLUMNS
+
+    def fetchall(self):
+        return [SUMMARY_ROW]
+
+
+class SummaryConnection:
+    """Records the summary query and its parameters and returns one summary row."""
+
+    def __init__(self):
+        self.queries = []
+
+    def execute(self, statement, params=None):
+        self.queries.append((str(statement), params))
+        return FakeResult()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def summary_connection(monkeypatch):
+    conn = SummaryConnection()
+    monkeypatch.setattr(server, "get_db_connection", lambda: conn)
+    return conn
+
+
+def reads_base_table(query):
+    return re.search(r"FROM app\.behavior_records\b", query) is not None
+
+
+def use_rollup(monkeypatch, rollup):
+    tables = {"behavior_records": object(), "students": object()}
+    if rollup:
+        tables["behavior_monthly"] = object()
+    monkeypatch.setattr(server, "get_schema_tables", lambda force_refresh=False: tables)
+
+
+def test_summary_of_whole_months_reads_only_the_rollup(monkeypatch, summary_connection):
+    use_rollup(monkeypatch, True)
+    response = server.get_behavior_summary(student_id=1, start_date="2024-01-01", end_date="2024-03-31")
+    assert response["summary"] == [dict(zip(SUMMARY_COLUMNS, SUMMARY_ROW))]
+    [(query, params)] = summary_connection.queries
+    assert "FROM app.behavior_monthly" in query
+    assert not reads_base_table(query)
+    # Undated records are left out of a date range
+    assert "month > '-infinity'" in query
+    assert params == {"student_id": 1, "months_from": date(2024, 1, 1), "months_to": date(2024, 4, 1)}
+
+
+def test_summary_without_range_includes_undated_records(monkeypatch, summary_connection):
+    use_rollup(monkeypatch, True)
+    server.get_behavior_summary(student_id=1)
+    [(query, params)] = summary_connection.queries
+    assert "FROM app.behavior_monthly" in query
+    assert "'-infinity'" not in query
+    assert not reads_base_table(query)
+    assert params == {"student_id": 1}
+
+
+def test_summary_counts_partial_months_from_the_base_table(monkeypatch, summary_connection):
+    use_rollup(monkeypatch, True)
+    server.get_behavior_summary(start_date="2024-01-15", end_date="2024-03-10")
+    [(query, params)] = summary_connection.queries
+    assert "FROM app.behavior_monthly" in query
+    assert reads_base_table(query)
+    assert params["range_from_0"] == date(2024, 1, 15)
+    assert params["range_to_1"] == date(2024, 3, 11)
+
+
+@pytest.mark.parametrize("rollup, exact", [(False, False), (True, True)])
+def test_summary_aggregates_the_base_table_without_rollup_or_when_exact(
+    monkeypatch, summary_connection, rollup, exact
+):
+    use_rollup(monkeypatch, rollup)
+    response = server.get_behavior_summary(student_id=1, start_date="2024-01-01", exact=exact)
+    assert response["success"] is True
+    [(query, params)] = summary_connection.queries
+    assert "behavior_monthly" not in query
+    assert reads_base_table(query)
+    assert params == {"student_id": 1, "start_date": "2024-01-01"}
+
+
+def test_rollup_triggers_are_dropped_and_created_again():
+    statements = [" ".join(statement.split()) for statement in server.BEHAVIOR_ROLLUP_DDL]
+    assert not any("CREATE OR REPLACE TRIGGER" in statement for statement in statements)
+    for trigger in ("behavior_monthly_insert", "behavior_monthly_update", "behavior_monthly_delete"):
+        drop = statements.index(f"DROP TRIGGER IF EXISTS {trigger} ON app.behavior_records")
+        assert statements[drop + 1].startswith(f"CREATE TRIGGER {trigger} ")
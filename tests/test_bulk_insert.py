@@ -0,0 +1,110 @@
+import pytest
+
+import server
+
+
+class FakeConnection:
+    """Records loaded rows; a rollback discards those not yet committed."""
+
+    def __init__(self):
+        self.pending = []
+        self.committed = []
+        self.active = False
+
+    def in_transaction(self):
+        return self.active
+
+    def begin(self):
+        self.active = True
+
+    def commit(self):
+        self.committed += self.pending
+        self.pending = []
+        self.active = False
+
+    def rollback(self):
+        self.pending = []
+        self.active = False
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_load(monkeypatch):
+    """Loads through insert_chunk into a FakeConnection, failing on student_id 0."""
+    conn = FakeConnection()
+    loads = []
+
+    def insert_chunk(conn_, table_name, columns, chunk):
+        loads.append((tuple(columns), len(chunk)))
+        if any(dict(zip(columns, values)).get("student_id") == 0 for values in chunk):
+            raise ValueError("duplicate key")
+        conn.pending += chunk
+
+    monkeypatch.setattr(server, "insert_chunk", insert_chunk)
+    monkeypatch.setattr(server, "get_db_connection", lambda: conn)
+    return conn, loads
+
+
+@pytest.mark.parametrize("name, content", [
+    ("empty.csv", ""),
+    ("empty.ndjson", ""),
+    ("blank.ndjson", "\n\n"),
+    ("header.csv", "student_id,student_name\n"),
+])
+def test_empty_file_loads_no_rows(tmp_path, fake_load, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    response = server.bulk_insert_data("students", file_path=str(path), method="insert")
+    assert response["success"] is True
+    assert response["rows_loaded"] == 0
+    assert response["chunks"] == 0
+    assert "No rows" in response["message"]
+
+
+def test_rows_are_loaded_per_column_set(fake_load):
+    conn, loads = fake_load
+    rows = [
+        {"student_id": 1, "student_name": "A"},
+        {"student_id": 2, "student_name": "B", "section": "C"},
+        {"student_id": 3, "student_name": "D"},
+    ]
+    response = server.bulk_insert_data("students", rows=rows, method="insert")
+    assert response["rows_loaded"] == 3
+    # No row is padded with NULL for a column it left out
+    assert loads == [(("student_id", "student_name"), 2), (("student_id", "student_name", "section"), 1)]
+
+
+def test_ndjson_rows_keep_their_own_columns(tmp_path, fake_load):
+    conn, loads = fake_load
+    path = tmp_path / "students.ndjson"
+    path.write_text('{"student_id": 1, "student_name": "A"}\n{"student_id": 2, "section": "C"}\n')
+    server.bulk_insert_data("students", file_path=str(path), method="insert")
+    assert sorted(loads) == [(("student_id", "section"), 1), (("student_id", "student_name"), 1)]
+
+
+def test_failed_chunk_outside_batch_keeps_other_chunks(fake_load):
+    conn, loads = fake_load
+    rows = [{"student_id": student_id} for student_id in (1, 2, 0, 4)]
+    response = server.bulk_insert_data("students", rows=rows, chunk_size=2, method="insert")
+    assert response["success"] is False
+    assert response["rows_loaded"] == 2
+    assert response["rows_failed"] == 2
+    assert len(conn.committed) == 2
+
+
+def test_failed_chunk_in_transactional_batch_loads_nothing(fake_load, monkeypatch):
+    conn, loads = fake_load
+    batch_connection = server.BorrowedConnection(server.TransactionConnection(conn))
+    monkeypatch.setattr(server, "get_db_connection", lambda: batch_connection)
+    rows = [{"student_id": student_id} for student_id in (1, 2, 0, 4, 5)]
+    response = server.bulk_insert_data("students", rows=rows, chunk_size=2, method="insert")
+    assert response["success"] is False
+    assert response["rows_loaded"] == 0
+    assert response["rows_failed"] == 4
+    assert response["chunks"] == 2
+    assert "rolled back" in response["message"]
+    assert conn.committed == []
+    # Loading stops at the failed chunk
+    assert sum(count for _, count in loads) == 4
@@ -0,0 +1,48 @@
+import re
+from types import SimpleNamespace
+
+from benchmarks import generate_dataset
+
+import server
+
+
+def create_table_columns(ddl: str) -> dict:
+    """{table: set of column names} for each CREATE TABLE in ddl."""
+    tables = {}
+    for table_name, body in re.findall(r"CREATE TABLE IF NOT EXISTS app\.(\w+) \((.*?)\n\);", ddl, re.S):
+        tables[table_name] = {line.split()[0] for line in body.strip().splitlines()}
+    return tables
+
+
+def test_every_generated_table_has_created_at():
+    tables = create_table_columns(generate_dataset.SCHEMA_DDL)
+    assert set(tables) == set(generate_dataset.DATA_TABLES)
+    for table_name, columns in tables.items():
+        assert "created_at" in columns, table_name
+
+
+class FakeResult:
+    def __init__(self, row):
+        self.row = row
+
+    def one(self):
+        return self.row
+
+
+class FakeConnection:
+    """Returns one sample row for each query smoke_calls makes."""
+
+    def execute(self, statement):
+        sql = str(statement)
+        if "FROM app.students" in sql:
+            return FakeResult(SimpleNamespace(
+                student_id=100001, student_name="Aarav Gupta", class_value="1", section="A",
+            ))
+        if "FROM app.users" in sql:
+            return FakeResult(SimpleNamespace(id=1, subject="Mathematics"))
+        return FakeResult(("2022-09-01", "2025-06-13"))
+
+
+def test_smoke_run_calls_every_read_tool():
+    calls = generate_dataset.smoke_calls(FakeConnection())
+    assert sorted(tool_name for tool_name, _ in calls) == sorted(server.READ_ONLY_TOOLS)
@@ -0,0 +1,125 @@
+import functools
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import server
+
+STUDENTS = [
+    # id, class_value, section, student_name
+    (1, "1", "A", "Asha"),
+    (2, "1", None, "Bilal"),
+    (3, "1", "A", None),
+    (4, "2", "B", "Chen"),
+    (5, None, "A", "Dara"),
+    (6, "1", None, "Aarav"),
+    (7, "2", None, None),
+    (8, None, None, "Eve"),
+    (9, "1", "A", "Asha"),
+    (10, "2", "B", "Chen"),
+]
+
+SORT_ORDERS = {
+    "ascending": [
+        ("class_value", "class_value", "ASC"),
+        ("section", "section", "ASC"),
+        ("student_name", "student_name", "ASC"),
+        ("id", "id", "ASC"),
+    ],
+    "descending": [
+        ("class_value", "class_value", "DESC"),
+        ("section", "section", "DESC"),
+        ("student_name", "student_name", "DESC"),
+        ("id", "id", "DESC"),
+    ],
+    "mixed": [
+        ("class_value", "class_value", "DESC"),
+        ("student_name", "student_name", "ASC"),
+        ("id", "id", "ASC"),
+    ],
+}
+
+
+def expected_ids(sort_keys: list) -> list:
+    """The ids in the order _order_by(sort_keys) sorts them: NULL is the largest value."""
+    columns = ("id", "class_value", "section", "student_name")
+
+    def compare(left, right):
+        for column, _, direction in sort_keys:
+            a, b = left[columns.index(column)], right[columns.index(column)]
+            if a == b:
+                continue
+            result = 1 if a is None else -1 if b is None else (a > b) - (a < b)
+            return -result if direction == "DESC" else result
+        return 0
+
+    return [row[0] for row in sorted(STUDENTS, key=functools.cmp_to_key(compare))]
+
+
+@pytest.fixture
+def conn():
+    engine = create_engine("sqlite://")
+    with engine.connect() as connection:
+        connection.execute(text(
+            "CREATE TABLE students (id INTEGER PRIMARY KEY, class_value TEXT, section TEXT, student_name TEXT)"
+        ))
+        for row in STUDENTS:
+            connection.execute(
+                text("INSERT INTO students VALUES (:id, :class_value, :section, :student_name)"),
+                dict(zip(("id", "class_value", "section", "student_name"), row)),
+            )
+        yield connection
+
+
+@pytest.mark.parametrize("order", SORT_ORDERS)
+@pytest.mark.parametrize("limit", [1, 2, 3, 7])
+def test_paging_returns_every_row_once_with_null_sort_keys(conn, order, limit):
+    sort_keys = SORT_ORDERS[order]
+    ids, cursor = [], None
+    while True:
+        records, cursor = server.fetch_page(
+            conn, "SELECT * FROM students", [], {}, sort_keys, "get_students", limit, cursor
+        )
+        ids += [record["id"] for record in records]
+        if cursor is None:
+            break
+    assert ids == expected_ids(sort_keys)
+
+
+def test_cursor_round_trip_keeps_nulls():
+    values = ["1", None, "Asha", 9]
+    cursor = server.encode_cursor("get_students", values)
+    assert server.decode_cursor("get_students", cursor) == values
+
+
+def test_decode_cursor_rejects_other_tools_and_garbage():
+    cursor = server.encode_cursor("get_students", [1])
+    with pytest.raises(ValueError, match="get_users"):
+        server.decode_cursor("get_users", cursor)
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        server.decode_cursor("get_students", "not a cursor")
+
+
+def test_keyset_condition_null_cursor_value_uses_is_null():
+    params = {}
+    condition = server._keyset_condition(SORT_ORDERS["ascending"], ["1", None, "Asha", 9], params)
+    assert "section IS NULL" in condition
+    assert "section = " not in condition
+    assert params == {"cursor_0": "1", "cursor_2": "Asha", "cursor_3": 9}
+
+
+def test_keyset_condition_ascending_includes_null_rows_after_a_value():
+    params = {}
+    condition = server._keyset_condition([("section", "section", "ASC"), ("id", "id", "ASC")], ["A", 3], params)
+    assert condition == (
+        "(((section > :cursor_0 OR section IS NULL)) OR (section = :cursor_0 AND (id > :cursor_1 OR id IS NULL)))"
+    )
+
+
+def test_keyset_condition_descending_null_is_followed_by_values():
+    condition = server._keyset_condition([("section", "section", "DESC"), ("id", "id", "DESC")], [None, 3], {})
+    assert condition == "((section IS NOT NULL) OR (section IS NULL AND id < :cursor_1))"
+
+
+def test_order_by_spells_out_null_placement():
+    assert server._order_by([("a", "a", "ASC"), ("b", "b", "DESC")]) == "a ASC NULLS LAST, b DESC NULLS FIRST"
@@ -0,0 +1,142 @@
+from types import SimpleNamespace
+
+import pytest
+from psycopg.pq import TransactionStatus
+
+import server
+
+
+class FakeDriverConnection:
+    """Stands in for a psycopg 3 connection, which has prepare_threshold."""
+
+    def __init__(self):
+        self.prepare_threshold = 5
+        self.prepared_max = 100
+        self.info = SimpleNamespace(transaction_status=TransactionStatus.INTRANS)
+
+
+def connect(driver_connection=None):
+    """Runs the pool "connect" hook and returns a connection on the new record."""
+    record = SimpleNamespace(driver_connection=driver_connection or FakeDriverConnection(), info={})
+    server.configure_prepared_statements(None, record)
+    return SimpleNamespace(info=record.info, invalidated=False, connection=record)
+
+
+def run(conn, *queries, executemany=False):
+    """Runs each query as a tool's fixed-shape query; returns whether each was a hit."""
+    hits = []
+    for query in queries:
+        statement = server.cached_statement("tool", query)
+        context = SimpleNamespace(execution_options=statement.get_execution_options())
+        before = server.statement_cache_stats.get("tool", {}).get("hits", 0)
+        server.count_prepared_statement(conn, None, query, {}, context, executemany)
+        hits.append(server.statement_cache_stats["tool"]["hits"] > before)
+    return hits
+
+
+def run_other(conn, statement):
+    """Runs a statement that is not a tool's fixed-shape query."""
+    context = SimpleNamespace(execution_options={})
+    server.count_prepared_statement(conn, None, statement, {}, context, False)
+
+
+@pytest.fixture(autouse=True)
+def prepared_statements(monkeypatch):
+    monkeypatch.setattr(server, "PREPARE_THRESHOLD", 2)
+    monkeypatch.setattr(server, "PREPARED_STATEMENTS_MAX", 2)
+    monkeypatch.setattr(server, "statement_cache_stats", {})
+
+
+def test_connect_configures_the_driver():
+    conn = connect()
+    assert conn.connection.driver_connection.prepare_threshold == 2
+    assert conn.connection.driver_connection.prepared_max == 2
+
+
+def test_query_is_a_hit_once_prepared():
+    conn = connect()
+    # Prepared on its third execution, reused from the fourth
+    assert run(conn, "A", "A", "A", "A", "A") == [False, False, False, True, True]
+    assert server.statement_cache_stats["tool"] == {"hits": 2, "misses": 3}
+
+
+def test_executemany_prepares_at_once():
+    conn = connect()
+    assert run(conn, "A", executemany=True) == [False]
+    assert run(conn, "A") == [True]
+
+
+def test_each_connection_prepares_on_its_own():
+    first, second = connect(), connect()
+    run(first, "A", "A", "A")
+    assert run(second, "A") == [False]
+    assert run(first, "A") == [True]
+
+
+def test_least_recently_used_statement_is_evicted_when_a_new_one_runs():
+    conn = connect()
+    run(conn, "A", "A", "A", "B", "B", "B")
+    assert run(conn, "A") == [True]
+    # Like the driver, preparing C does not evict; the next new statement does
+    run(conn, "C", "C", "C")
+    run_other(conn, "SELECT 1")
+    assert run(conn, "A", "C", "B") == [True, True, False]
+
+
+def test_other_statements_take_the_same_slots():
+    conn = connect()
+    run(conn, "A", "A", "A")
+    for statement in ("SELECT 1", "SELECT 2", "SELECT 3"):
+        run_other(conn, statement)
+        run_other(conn, statement)
+        run_other(conn, statement)
+    assert run(conn, "A") == [False]
+
+
+@pytest.mark.parametrize("statement", [
+    "DROP INDEX app.idx_students_name",
+    "CREATE TABLE t (id int); DROP TRIGGER IF EXISTS t_trigger ON t",
+    "alter table app.students add column nickname text",
+])
+def test_ddl_forgets_prepared_statements(statement):
+    conn = connect()
+    run(conn, "A", "A", "A")
+    run_other(conn, statement)
+    assert run(conn, "A") == [False]
+
+
+def test_rollback_forgets_prepared_statements():
+    conn = connect()
+    run(conn, "A", "A", "A")
+    server.forget_prepared_statements(conn)
+    assert run(conn, "A") == [False]
+
+
+def test_rollback_outside_a_transaction_keeps_prepared_statements():
+    conn = connect()
+    run(conn, "A", "A", "A")
+    conn.connection.driver_connection.info.transaction_status = TransactionStatus.IDLE
+    server.forget_prepared_statements(conn)
+    assert run(conn, "A") == [True]
+
+
+def test_driver_without_prepared_statements_only_misses():
+    conn = connect(SimpleNamespace())
+    assert "prepared_statements" not in conn.info
+    assert run(conn, "A", "A", "A", "A") == [False] * 4
+
+
+@pytest.mark.parametrize("uri, expected", [
+    ("postgresql://user:secret@db/school", "postgresql+psycopg://user:secret@db/school"),
+    ("postgresql+psycopg2://user@db/school", "postgresql+psycopg2://user@db/school"),
+    ("postgresql://user@/school?host=/tmp/pg", "postgresql+psycopg://user@/school?host=/tmp/pg"),
+    (None, None),
+])
+def test_uri_without_driver_uses_psycopg(uri, expected):
+    assert server.with_default_driver(uri) == expected
+
+
+def test_statements_are_cached_per_tool_and_query():
+    assert server.cached_statement.cache_info().maxsize is not None
+    assert server.cached_statement("tool", "SELECT 1") is server.cached_statement("tool", "SELECT 1")
+    assert server.cached_statement("other", "SELECT 1").get_execution_options()["statement_tool"] == "other"
@@ -0,0 +1,114 @@
+import json
+
+import pytest
+
+import server
+
+
+def test_unknown_format_is_rejected_before_querying(monkeypatch):
+    def no_database():
+        raise AssertionError("format should be validated before connecting")
+
+    monkeypatch.setattr(server, "get_db_connection", no_database)
+    with pytest.raises(ValueError, match="format must be one of rows, columnar, ndjson"):
+        server.query_db_table("students", "*", "", format="csv")
+
+
+class FakeStreamResult:
+    """Yields `row_count` single-column rows in partitions, recording how many were read."""
+
+    def __init__(self, row_count):
+        self.row_count = row_count
+        self.rows_read = 0
+        self.closed = False
+
+    def keys(self):
+        return ["id"]
+
+    def partitions(self, size):
+        while self.rows_read < self.row_count:
+            partition = [(row_id,) for row_id in range(self.rows_read, min(self.rows_read + size, self.row_count))]
+            self.rows_read += len(partition)
+            yield partition
+
+    def close(self):
+        self.closed = True
+
+
+class FakeStreamConnection:
+    def __init__(self, row_count):
+        self.result = FakeStreamResult(row_count)
+        self.execution_options = None
+
+    def execute(self, statement, execution_options=None):
+        self.execution_options = execution_options
+        return self.result
+
+    def close(self):
+        pass
+
+
+def stream(monkeypatch, row_count, chunk_size, max_rows=100000, max_bytes=64 * 1024 * 1024):
+    conn = FakeStreamConnection(row_count)
+    monkeypatch.setattr(server, "get_db_connection", lambda: conn)
+    monkeypatch.setattr(server, "STREAM_MAX_ROWS", max_rows)
+    monkeypatch.setattr(server, "STREAM_MAX_BYTES", max_bytes)
+    chunks = server.query_db_table("attendance", "id", "", stream=True, chunk_size=chunk_size)
+    header = json.loads(chunks[0])
+    records = [json.loads(line) for line in "".join(chunks[1:]).splitlines()]
+    return conn, chunks, header, records
+
+
+def test_stream_reads_everything_under_the_limits(monkeypatch):
+    conn, chunks, header, records = stream(monkeypatch, row_count=10, chunk_size=4)
+    assert header == {"success": True, "message": "Streamed 10 row(s).", "rows": 10, "truncated": False}
+    assert records == [{"id": row_id} for row_id in range(10)]
+    assert chunks.rows == 10
+    assert len(chunks) == 1 + 3
+    assert conn.execution_options == {"stream_results": True, "yield_per": 4}
+
+
+@pytest.mark.parametrize("max_rows", [6, 8])
+def test_stream_stops_at_the_row_limit(monkeypatch, max_rows):
+    conn, chunks, header, records = stream(monkeypatch, row_count=1000, chunk_size=4, max_rows=max_rows)
+    assert header["truncated"] is True
+    assert header["rows"] == max_rows
+    assert records == [{"id": row_id} for row_id in range(max_rows)]
+    # Reading stops within a partition of the limit, and the cursor is closed
+    assert conn.result.rows_read <= max_rows + 4
+    assert conn.result.closed
+
+
+def test_stream_exactly_at_the_row_limit_is_not_truncated(monkeypatch):
+    conn, chunks, header, records = stream(monkeypatch, row_count=8, chunk_size=4, max_rows=8)
+    assert header["truncated"] is False
+    assert header["rows"] == 8
+
+
+def test_stream_stops_at_the_byte_limit(monkeypatch):
+    # Each record line is '{"id":N}\n', 9 bytes for one digit
+    conn, chunks, header, records = stream(monkeypatch, row_count=1000, chunk_size=2, max_bytes=30)
+    assert header["truncated"] is True
+    assert header["rows"] == 4
+    assert conn.result.rows_read <= 6
+
+
+def test_stream_of_no_rows(monkeypatch):
+    conn, chunks, header, records = stream(monkeypatch, row_count=0, chunk_size=4)
+    assert header["rows"] == 0
+    assert records == []
+
+
+@pytest.mark.parametrize("arguments, message", [
+    ({"stream": True, "format": "columnar"}, "format cannot be used with stream"),
+    ({"stream": True, "format": "ndjson"}, "format cannot be used with stream"),
+    ({"stream": True, "chunk_size": 0}, "chunk_size must be a positive integer"),
+    ({"chunk_size": 0}, "chunk_size must be a positive integer"),
+])
+def test_invalid_arguments_are_rejected_before_querying(monkeypatch, arguments, message):
+    def no_database():
+        raise AssertionError("arguments should be validated before connecting")
+
+    monkeypatch.setattr(server, "get_db_connection", no_database)
+    with pytest.raises(ValueError, match=message):
+        server.query_db_table("students", "*", "", **arguments)
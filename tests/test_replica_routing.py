@@ -0,0 +1,113 @@
+import asyncio
+
+import psycopg.errors
+import pytest
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError, ProgrammingError
+
+import server
+
+
+def wrapped(error_class, sqlalchemy_class, message):
+    """A driver error as SQLAlchemy raises it."""
+    return sqlalchemy_class("SELECT 1", {}, error_class(message))
+
+
+@pytest.mark.parametrize("error", [
+    wrapped(psycopg.OperationalError, OperationalError, "connection failed: server closed the connection"),
+    wrapped(psycopg.errors.AdminShutdown, OperationalError, "terminating connection due to administrator command"),
+    wrapped(psycopg.InterfaceError, InterfaceError, "the connection is closed"),
+    wrapped(psycopg.errors.SerializationFailure, OperationalError,
+            "canceling statement due to conflict with recovery"),
+])
+def test_connection_failures_and_recovery_conflicts_are_retried(error):
+    assert server.is_replica_retryable(error)
+
+
+@pytest.mark.parametrize("error", [
+    wrapped(psycopg.errors.QueryCanceled, OperationalError, server.STATEMENT_TIMEOUT_MESSAGE),
+    wrapped(psycopg.errors.QueryCanceled, OperationalError, "canceling statement due to user request"),
+    wrapped(psycopg.errors.SerializationFailure, OperationalError, "could not serialize access"),
+    wrapped(psycopg.errors.DeadlockDetected, OperationalError, "deadlock detected"),
+    wrapped(psycopg.errors.UndefinedColumn, ProgrammingError, 'column "nope" does not exist'),
+    wrapped(psycopg.errors.DivisionByZero, DBAPIError, "division by zero"),
+    ValueError("Invalid cursor."),
+])
+def test_other_errors_are_not_retried(error):
+    assert not server.is_replica_retryable(error)
+
+
+class FakeTool:
+    """Fails its first run with `response`, or by raising it, and succeeds on the next."""
+
+    name = "get_students"
+
+    def __init__(self, response):
+        self.response = response
+        self.runs = 0
+
+    async def run_async(self, args, tool_context):
+        self.runs += 1
+        if self.runs > 1:
+            return {"success": True, "students": []}
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+def served_route(error):
+    return {"replica": True, "served": True, "error": error}
+
+
+@pytest.fixture(autouse=True)
+def routing_stats(monkeypatch):
+    stats = {"replica": 0, "primary": {}, "fallbacks": 0}
+    monkeypatch.setattr(server, "replica_routing_stats", stats)
+    return stats
+
+
+def test_lost_connection_is_retried_on_the_primary(routing_stats):
+    error = wrapped(psycopg.errors.AdminShutdown, OperationalError, "terminating connection")
+    tool = FakeTool({"success": False, "message": f"Error retrieving students: {error}"})
+    read_route = served_route(error)
+
+    response = asyncio.run(server.run_routed_tool(tool, {}, read_route))
+
+    assert response["success"] is True
+    assert tool.runs == 2
+    assert read_route == {"replica": False, "served": False, "error": None}
+    assert routing_stats["fallbacks"] == 1
+
+
+def test_statement_timeout_is_returned_unchanged(routing_stats):
+    error = wrapped(psycopg.errors.QueryCanceled, OperationalError, server.STATEMENT_TIMEOUT_MESSAGE)
+    failure = {"success": False, "message": f"Error retrieving students: {error}"}
+    tool = FakeTool(failure)
+
+    response = asyncio.run(server.run_routed_tool(tool, {}, served_route(error)))
+
+    assert response is failure
+    assert tool.runs == 1
+    assert routing_stats["fallbacks"] == 0
+
+
+def test_error_without_database_error_is_returned_unchanged():
+    failure = {"success": False, "message": "Invalid cursor."}
+    tool = FakeTool(failure)
+    assert asyncio.run(server.run_routed_tool(tool, {}, served_route(None))) is failure
+    assert tool.runs == 1
+
+
+def test_raised_wrapper_of_lost_connection_is_retried():
+    error = wrapped(psycopg.OperationalError, OperationalError, "server closed the connection unexpectedly")
+    tool = FakeTool(ValueError(f"Error querying table 'students': {error}"))
+    response = asyncio.run(server.run_routed_tool(tool, {}, served_route(error)))
+    assert response["success"] is True
+    assert tool.runs == 2
+
+
+def test_raised_query_error_is_not_retried():
+    error = wrapped(psycopg.errors.UndefinedColumn, ProgrammingError, 'column "nope" does not exist')
+    tool = FakeTool(ValueError(f"Error querying table 'students': {error}"))
+    with pytest.raises(ValueError, match="nope"):
+        asyncio.run(server.run_routed_tool(tool, {}, served_route(error)))
+    assert tool.runs == 1
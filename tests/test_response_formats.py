@@ -0,0 +1,78 @@
+import json
+from datetime import date
+
+import pytest
+
+import server
+
+RECORDS = [
+    {"id": 1, "student_name": "Aarav Gupta", "record_date": date(2024, 1, 15)},
+    {"id": 2, "student_name": "Mia Chen", "record_date": None},
+]
+RESPONSE = {"success": True, "message": "Retrieved 2 records.", "records": RECORDS, "next_cursor": None}
+
+
+def test_rows_format_returns_the_response():
+    assert server.format_records(RESPONSE, "records", "rows") is RESPONSE
+
+
+def test_columnar_format():
+    response = server.format_records(RESPONSE, "records", "columnar")
+    assert response["records"] == {
+        "id": [1, 2],
+        "student_name": ["Aarav Gupta", "Mia Chen"],
+        "record_date": [date(2024, 1, 15), None],
+    }
+    assert response["message"] == RESPONSE["message"]
+    # The original response is left unchanged
+    assert RESPONSE["records"] is RECORDS
+
+
+def test_ndjson_format():
+    chunks = server.format_records(RESPONSE, "records", "ndjson")
+    lines = [json.loads(line) for line in "".join(chunks).splitlines()]
+    assert lines[0] == {"success": True, "message": "Retrieved 2 records.", "next_cursor": None}
+    assert lines[1:] == [
+        {"id": 1, "student_name": "Aarav Gupta", "record_date": "2024-01-15"},
+        {"id": 2, "student_name": "Mia Chen", "record_date": None},
+    ]
+    assert chunks.rows == 2
+
+
+def test_ndjson_format_splits_into_chunks(monkeypatch):
+    monkeypatch.setattr(server, "NDJSON_CHUNK_SIZE", 2)
+    records = [{"id": record_id} for record_id in range(5)]
+    chunks = server.format_records({"success": True, "records": records}, "records", "ndjson")
+    # A header line and 5 records in blocks of 2 lines
+    assert [chunk.count("\n") for chunk in chunks] == [2, 2, 2]
+    assert chunks.rows == 5
+
+
+def test_empty_records():
+    response = {"success": True, "records": []}
+    assert server.format_records(response, "records", "columnar")["records"] == {}
+    chunks = server.format_records(response, "records", "ndjson")
+    assert chunks.rows == 0
+    assert "".join(chunks).count("\n") == 1
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError, match="format must be one of"):
+        server.format_records(RESPONSE, "records", "csv")
+
+
+@pytest.mark.parametrize("response, rows", [
+    (RESPONSE, 2),
+    ({"success": True, "students": [{"id": 1}]}, 1),
+    ({"success": True, "summary": []}, 0),
+    (server.format_records(RESPONSE, "records", "columnar"), 2),
+    (server.format_records(RESPONSE, "records", "ndjson"), 2),
+    ([{"id": 1}, {"id": 2}, {"id": 3}], 3),
+    (server.to_columnar([{"id": 1}, {"id": 2}]), 2),
+    ({"success": False, "message": "Error retrieving records"}, 0),
+    ({"success": True, "message": "Attendance marked.", "attendance_id": 7}, 0),
+    ("plain text", 0),
+    (None, 0),
+])
+def test_count_response_rows(response, rows):
+    assert server.count_response_rows(response) == rows
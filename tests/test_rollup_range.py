@@ -0,0 +1,36 @@
+from datetime import date
+
+import pytest
+
+import server
+
+
+@pytest.mark.parametrize("start, end, months, partial_ranges", [
+    # Whole months only
+    (date(2024, 1, 1), date(2024, 3, 31), (date(2024, 1, 1), date(2024, 4, 1)), []),
+    # Partial days on both sides
+    (date(2024, 1, 15), date(2024, 3, 10), (date(2024, 2, 1), date(2024, 3, 1)),
+     [(date(2024, 1, 15), date(2024, 2, 1)), (date(2024, 3, 1), date(2024, 3, 11))]),
+    # Across a year boundary, ending on the last day of a month
+    (date(2023, 12, 20), date(2024, 1, 31), (date(2024, 1, 1), date(2024, 2, 1)),
+     [(date(2023, 12, 20), date(2024, 1, 1))]),
+    # Leap day as the end of February
+    (date(2024, 2, 1), date(2024, 2, 29), (date(2024, 2, 1), date(2024, 3, 1)), []),
+    # Open-ended ranges
+    (None, date(2024, 3, 10), (None, date(2024, 3, 1)), [(date(2024, 3, 1), date(2024, 3, 11))]),
+    (date(2024, 1, 15), None, (date(2024, 2, 1), None), [(date(2024, 1, 15), date(2024, 2, 1))]),
+    (None, None, (None, None), []),
+])
+def test_split_into_months_and_partial_days(start, end, months, partial_ranges):
+    assert server._split_rollup_range(start, end) == (months, partial_ranges)
+
+
+@pytest.mark.parametrize("start, end", [
+    (date(2024, 1, 10), date(2024, 1, 20)),  # inside one month
+    (date(2024, 1, 10), date(2024, 2, 20)),  # across a month boundary, no whole month
+    (date(2024, 3, 5), date(2024, 3, 5)),    # a single day
+])
+def test_range_without_whole_month_is_counted_from_the_base_table(start, end):
+    months, partial_ranges = server._split_rollup_range(start, end)
+    assert months is None
+    assert partial_ranges == [(start, date.fromordinal(end.toordinal() + 1))]
@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+import server
+
+STUDENTS = [{"name": "student_id", "type": "INTEGER"}]
+
+
+class FakeConnection:
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def reflections(monkeypatch):
+    """Serves the schema cache from a dict of tables; returns it and the reflection count."""
+    database = {"tables": {"students": STUDENTS}, "reflections": 0}
+
+    def refresh_schema_cache(conn):
+        database["reflections"] += 1
+        server._schema_tables = dict(database["tables"])
+        server._schema_loaded_at = time.monotonic()
+        return server._schema_tables
+
+    monkeypatch.setattr(server, "get_db_connection", FakeConnection)
+    monkeypatch.setattr(server, "refresh_schema_cache", refresh_schema_cache)
+    monkeypatch.setattr(server, "SCHEMA_CACHE_TTL", 300)
+    monkeypatch.setattr(server, "SCHEMA_MISS_REFRESH_INTERVAL", 30)
+    monkeypatch.setattr(server, "_schema_tables", {"students": STUDENTS})
+    monkeypatch.setattr(server, "_schema_loaded_at", time.monotonic() - 60)
+    monkeypatch.setattr(server, "_schema_miss_refreshed_at", float("-inf"))
+    return database
+
+
+def test_known_table_is_served_from_the_cache(reflections):
+    assert server.get_table_schema("students") == {"table_name": "students", "columns": STUDENTS}
+    assert reflections["reflections"] == 0
+
+
+def test_unknown_tables_reload_the_schema_once_per_interval(reflections):
+    for name in ("missing", "missing", "other"):
+        with pytest.raises(ValueError, match="not found"):
+            server.get_table_schema(name)
+    assert reflections["reflections"] == 1
+
+
+def test_unknown_table_does_not_reload_a_fresh_schema(reflections, monkeypatch):
+    monkeypatch.setattr(server, "_schema_loaded_at", time.monotonic())
+    with pytest.raises(ValueError):
+        server.get_table_schema("missing")
+    assert reflections["reflections"] == 0
+
+
+def test_new_table_is_found_by_the_reload(reflections):
+    reflections["tables"]["grades"] = [{"name": "grade", "type": "TEXT"}]
+    assert server.get_table_schema("grades")["columns"] == [{"name": "grade", "type": "TEXT"}]
+    assert reflections["reflections"] == 1
+
+
+def test_unknown_table_reloads_again_after_the_interval(reflections, monkeypatch):
+    with pytest.raises(ValueError):
+        server.get_table_schema("missing")
+    later = time.monotonic() + 31
+    monkeypatch.setattr(server.time, "monotonic", lambda: later)
+    with pytest.raises(ValueError):
+        server.get_table_schema("missing")
+    assert reflections["reflections"] == 2
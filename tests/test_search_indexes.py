@@ -0,0 +1,48 @@
+import server
+
+
+class FakeResult:
+    def __init__(self, value=None):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+    def __iter__(self):
+        return iter([])
+
+
+class FakeConnection:
+    """Records every statement; EXPLAIN returns a plan with no index."""
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        self.statements.append((str(statement), params))
+        if str(statement).startswith("EXPLAIN"):
+            return FakeResult([{"Plan": {"Node Type": "Seq Scan"}}])
+        return FakeResult()
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_sample_term_is_bound(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(server, "get_db_connection", lambda: conn)
+    monkeypatch.setattr(server, "_pg_trgm_available", True)
+    term = "o'brien'); DROP TABLE app.students; --"
+
+    response = server.check_search_indexes(term)
+
+    assert response["success"] is True
+    explains = [(sql, params) for sql, params in conn.statements if sql.startswith("EXPLAIN")]
+    # Two plans (chosen, usable) for each of the ILIKE and search predicates
+    assert len(explains) == 4 * len(server.TRIGRAM_INDEXES)
+    for sql, params in explains:
+        assert "brien" not in sql
+        assert params == {"term": term, "pattern": f"%{term}%"}
@@ -0,0 +1,168 @@
+import asyncio
+import contextlib
+from types import SimpleNamespace
+
+import pytest
+from psycopg.pq import TransactionStatus
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+import server
+
+
+class FakeDBAPIConnection:
+    """Counts the cancel requests sent for it; like psycopg 3, it also has the older cancel()."""
+
+    def __init__(self):
+        self.cancels = 0
+
+    def cancel_safe(self):
+        self.cancels += 1
+
+    def cancel(self):
+        raise AssertionError("cancel_safe() should be used")
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """A connection checked out of a pool, keeping the text of the statements it runs."""
+
+    def __init__(self, pooled):
+        self.connection = pooled
+        self.info = pooled.info
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.connection.close()
+
+
+@pytest.fixture
+def pool():
+    pool = QueuePool(FakeDBAPIConnection, pool_size=1, max_overflow=0)
+    event.listen(pool, "checkin", server.release_call_connection)
+    return pool
+
+
+@pytest.fixture
+def call_timeout():
+    token = server._statement_timeout.set(5)
+    yield
+    server._statement_timeout.reset(token)
+
+
+def test_timeout_is_set_once_per_connection(pool, call_timeout):
+    conn = FakeConnection(pool.connect())
+    server.apply_statement_timeout(conn)
+    conn.close()
+    conn = FakeConnection(pool.connect())
+    server.apply_statement_timeout(conn)
+    assert conn.statements == []
+    assert conn.info["statement_timeout"] == 5
+
+
+def test_timeout_is_set_again_after_the_connection_is_recycled(pool, call_timeout):
+    conn = FakeConnection(pool.connect())
+    server.apply_statement_timeout(conn)
+    conn.connection.invalidate(soft=True)
+    conn.close()
+    conn = FakeConnection(pool.connect())
+    server.apply_statement_timeout(conn)
+    assert conn.statements == ["SET statement_timeout = 5000"]
+
+
+def test_different_timeout_is_set_again(pool, call_timeout):
+    conn = FakeConnection(pool.connect())
+    server.apply_statement_timeout(conn)
+    server.apply_statement_timeout(conn, 0)
+    assert conn.statements == ["SET statement_timeout = 5000", "SET statement_timeout = 0"]
+
+
+def test_server_queries_run_under_the_default_timeout(pool, monkeypatch):
+    monkeypatch.setattr(server, "DB_EXECUTION_MODE", "sync")
+    monkeypatch.setattr(server, "DB_STATEMENT_TIMEOUT", 30)
+    engine = SimpleNamespace(connect=lambda: contextlib.closing(FakeConnection(pool.connect())))
+    monkeypatch.setattr(server, "get_engine", lambda: engine)
+    statements = asyncio.run(server.run_with_connection(lambda conn: list(conn.statements)))
+    assert statements == ["SET statement_timeout = 30000"]
+
+
+def test_cancel_reaches_the_driver(pool):
+    call_connections = server.CallConnections()
+    conn = FakeConnection(pool.connect())
+    call_connections.add(conn)
+    call_connections.cancel()
+    assert conn.connection.dbapi_connection.cancels == 1
+
+
+def test_cancel_skips_connections_back_in_the_pool(pool):
+    call_connections = server.CallConnections()
+    conn = FakeConnection(pool.connect())
+    dbapi_connection = conn.connection.dbapi_connection
+    call_connections.add(conn)
+    conn.close()
+    call_connections.cancel()
+    assert dbapi_connection.cancels == 0
+
+
+def test_cancelled_call_cannot_check_out_more_connections(pool):
+    call_connections = server.CallConnections()
+    call_connections.cancel()
+    with pytest.raises(RuntimeError):
+        call_connections.add(FakeConnection(pool.connect()))
+    # The refused connection went back to the pool
+    assert pool.checkedout() == 0
+
+
+class FakeAsyncDriverConnection:
+    def __init__(self, transaction_status):
+        self.info = SimpleNamespace(transaction_status=transaction_status)
+        self.cancels = 0
+
+    async def cancel_safe(self, timeout=None):
+        self.cancels += 1
+
+
+class FakeAsyncConnection:
+    """An async connection whose call is cancelled while its query runs."""
+
+    def __init__(self, transaction_status):
+        self.driver_connection = FakeAsyncDriverConnection(transaction_status)
+        self.closed = False
+
+    async def get_raw_connection(self):
+        return SimpleNamespace(driver_connection=self.driver_connection)
+
+    async def run_sync(self, func, *args):
+        raise asyncio.CancelledError()
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.mark.parametrize("transaction_status, cancels", [
+    (TransactionStatus.ACTIVE, 1),
+    (TransactionStatus.INTRANS, 0),
+])
+def test_cancelled_async_call_cancels_its_running_query(monkeypatch, transaction_status, cancels):
+    async_conn = FakeAsyncConnection(transaction_status)
+
+    async def connect_async_for_call():
+        return async_conn, "async"
+
+    monkeypatch.setattr(server, "connect_async_for_call", connect_async_for_call)
+    tool = server.async_db_tool(lambda: {"success": True})
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(tool())
+    assert async_conn.driver_connection.cancels == cancels
+    assert async_conn.closed
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def manifest_path(tmp_path, monkeypatch):
+    path = tmp_path / "tool_manifest.json"
+    monkeypatch.setattr(server, "TOOL_MANIFEST_PATH", str(path))
+    return path
+
+
+def test_missing_manifest(manifest_path):
+    assert server.load_tool_manifest() is None
+
+
+@pytest.mark.parametrize("content", [
+    '{"fingerprint": "abc", "tools": [',  # truncated
+    "not json at all",
+    "[1, 2, 3]",
+    "",
+])
+def test_corrupt_manifest_falls_back(manifest_path, content):
+    manifest_path.write_text(content)
+    assert server.load_tool_manifest() is None
+
+
+@pytest.mark.parametrize("manifest", [
+    {},  # no tools
+    {"tools": [{"description": "no name or schema"}]},
+    {"tools": None},
+])
+def test_current_but_invalid_manifest_falls_back(manifest_path, manifest):
+    manifest_path.write_text(json.dumps({**manifest, "fingerprint": server.tool_fingerprint()}))
+    assert server.load_tool_manifest() is None
+
+
+def test_valid_manifest_loads(manifest_path):
+    tool = {"name": "get_students", "inputSchema": {"type": "object", "properties": {}}}
+    manifest_path.write_text(json.dumps({"fingerprint": server.tool_fingerprint(), "tools": [tool]}))
+    assert [tool.name for tool in server.load_tool_manifest()] == ["get_students"]
+
+
+def test_waiting_for_registry_lock_does_not_block_event_loop(monkeypatch):
+    monkeypatch.setattr(server, "ADK_DB_TOOLS", None)
+    lock_held = threading.Event()
+
+    def preload():
+        # Stands in for the preload thread importing google.adk under the lock
+        with server._registry_lock:
+            lock_held.set()
+            time.sleep(0.3)
+
+    def load_tool_registries():
+        with server._registry_lock:
+            pass
+
+    monkeypatch.setattr(server, "load_tool_registries", load_tool_registries)
+
+    async def run():
+        preload_thread = threading.Thread(target=preload)
+        preload_thread.start()
+        lock_held.wait()
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker_task = asyncio.create_task(ticker())
+        await server.ensure_tool_registries()
+        ticker_task.cancel()
+        preload_thread.join()
+        return ticks
+
+    assert asyncio.run(run()) >= 10
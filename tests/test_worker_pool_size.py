@@ -0,0 +1,34 @@
+import pytest
+
+import server
+
+
+@pytest.mark.parametrize("budget, workers, mode, replica, pool_size", [
+    (40, 4, "threadpool", None, 10),
+    (40, 4, "async", None, 9),
+    (40, 4, "threadpool", "postgresql://replica/school", 5),
+    (40, 4, "async", "postgresql://replica/school", 4),
+    (9, 2, "async", "postgresql://replica/school", 1),
+])
+def test_budget_covers_every_engine(monkeypatch, budget, workers, mode, replica, pool_size):
+    monkeypatch.setattr(server, "DB_CONNECTION_BUDGET", budget)
+    monkeypatch.setattr(server, "DB_EXECUTION_MODE", mode)
+    monkeypatch.setattr(server, "DATABASE_REPLICA_URI", replica)
+
+    assert server.worker_pool_size(workers) == pool_size
+    # Tool engines, plus the one-connection sync engines in async mode, per database
+    databases = 2 if replica else 1
+    assert workers * databases * (pool_size + (mode == "async")) <= budget
+
+
+@pytest.mark.parametrize("budget, mode, replica", [
+    (4, "async", None),
+    (8, "async", "postgresql://replica/school"),
+    (4, "threadpool", "postgresql://replica/school"),
+])
+def test_budget_too_small(monkeypatch, budget, mode, replica):
+    monkeypatch.setattr(server, "DB_CONNECTION_BUDGET", budget)
+    monkeypatch.setattr(server, "DB_EXECUTION_MODE", mode)
+    monkeypatch.setattr(server, "DATABASE_REPLICA_URI", replica)
+    with pytest.raises(ValueError, match="too small"):
+        server.worker_pool_size(4)